@@ -0,0 +1,236 @@
+"""
+Maintained aggregates over the assets table
+
+AssetAggregates keeps per-column value counts, a row count and per-column
+sums in memory so dashboard rollups are served without scanning the table. Write paths report each change as
+apply(old_row, new_row); a partial row updates only the columns it carries,
+as long as old and new carry the same ones (plus the asset id); a background task rebuilds the counts from the
+database every reconcile interval to correct drift (for example writes made
+by another worker or directly in Supabase).
+
+MaintainedView holds the build/reconcile machinery so other in-memory views
+of the assets table (such as the search index) can share it.
+"""
+
+import abc
+import asyncio
+import logging
+import secrets
+import time
+from collections import Counter
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from database import ASSET_LIST_ORDER, Database
+
+logger = logging.getLogger(__name__)
+
+SCAN_PAGE_SIZE = 5000
+
+
+async def scan_assets(db: Database, columns: Iterable[str], page_size: int = SCAN_PAGE_SIZE) -> AsyncIterator[List[dict]]:
+    """Yield every asset, a keyset page at a time, with at least the given columns."""
+    select = ",".join(dict.fromkeys(ASSET_LIST_ORDER + tuple(columns)))
+    after = None
+    while True:
+        page = await db.list_assets({}, columns=select, limit=page_size, after=after)
+        if page:
+            yield page
+        if len(page) < page_size:
+            break
+        after = [page[-1][key] for key in ASSET_LIST_ORDER]
+
+
+class PendingWrites:
+    """Writes made while a rebuild scans the table, replayed onto the state it builds.
+
+    A write the scan had not reached yet is already in the pages it reads
+    later. For views whose apply() is not idempotent (counters), writes are
+    replayed only for the part the scan missed: the old row is taken back if
+    the asset was scanned before the write, the new row is added unless the
+    asset is scanned after it. This needs the ids scanned so far; a view that
+    can replay every write unconditionally (a keyed index) skips tracking them.
+    """
+
+    def __init__(self, track_scanned: bool):
+        self.writes: List[list] = []
+        self._scanned: Optional[Set[int]] = set() if track_scanned else None
+        # asset id -> writes a later page may still read the asset after
+        self._awaiting: Dict[int, List[list]] = {}
+
+    def record(self, old: Optional[dict], new: Optional[dict]):
+        write = [old, new]
+        if self._scanned is not None:
+            asset_id = (new or old)["id"]
+            scanned_before = asset_id in self._scanned
+            write += [scanned_before, False]
+            self._awaiting.setdefault(asset_id, []).append(write)
+        self.writes.append(write)
+
+    def scanned(self, page: List[dict]):
+        if self._scanned is None:
+            return
+        for row in page:
+            self._scanned.add(row["id"])
+            # The page read the asset after these writes
+            for write in self._awaiting.pop(row["id"], ()):
+                write[3] = True
+
+    def replay(self) -> Iterator[Tuple[Optional[dict], Optional[dict]]]:
+        """The (old, new) pairs the rebuilt state still needs."""
+        for write in self.writes:
+            if self._scanned is None:
+                yield write[0], write[1]
+                continue
+            old, new, scanned_before, scanned_after = write
+            old, new = (old if scanned_before else None), (None if scanned_after else new)
+            if old or new:
+                yield old, new
+
+
+class MaintainedView(abc.ABC):
+    """An in-memory view built from the assets table and rebuilt periodically.
+
+    Subclasses supply the state: an object with add(row) for the scan and
+    apply(old, new) for writes. The generation changes with every write and
+    with every rebuild whose state differs from the one it replaces.
+    """
+
+    # Columns the scan reads besides the sort key
+    scan_columns: Tuple[str, ...] = ()
+    # Whether applying a write the state already reflects is harmless
+    idempotent = False
+
+    def __init__(self, db: Database, reconcile_interval: float):
+        self.db = db
+        self.reconcile_interval = reconcile_interval
+        self.state = self._new_state()
+        self.built_at: Optional[float] = None
+        # Changes whenever what the view serves does; random so it is not reused after a restart
+        self.generation = secrets.randbits(48)
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        # Writes seen while a rebuild is scanning, replayed onto the new state
+        self._pending: Optional[PendingWrites] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.built_at is not None
+
+    @abc.abstractmethod
+    def _new_state(self):
+        """An empty state for a build to fill."""
+
+    def apply(self, old: Optional[dict] = None, new: Optional[dict] = None):
+        """Record a write: old is the row before it (None for inserts), new the row after (None for deletes)."""
+        self.state.apply(old, new)
+        self.generation += 1
+        if self._pending is not None:
+            self._pending.record(old, new)
+
+    async def ensure_built(self):
+        if self.built_at is None:
+            async with self._lock:
+                if self.built_at is None:
+                    await self._rebuild()
+
+    async def rebuild(self):
+        async with self._lock:
+            await self._rebuild()
+
+    async def _rebuild(self):
+        # Build a fresh state while the current one keeps serving reads
+        state = self._new_state()
+        self._pending = pending = PendingWrites(track_scanned=not self.idempotent)
+        try:
+            async for page in scan_assets(self.db, self.scan_columns):
+                for row in page:
+                    state.add(row)
+                pending.scanned(page)
+            for old, new in pending.replay():
+                state.apply(old, new)
+        finally:
+            self._pending = None
+        if state != self.state:
+            self.generation += 1
+        self.state = state
+        self.built_at = time.monotonic()
+
+    async def _maintain_forever(self):
+        try:
+            await self.ensure_built()
+        except Exception:
+            logger.exception("Building %s failed", type(self).__name__)
+        while self.reconcile_interval > 0:
+            await asyncio.sleep(self.reconcile_interval)
+            try:
+                await self.rebuild()
+            except Exception:
+                logger.exception("Reconciling %s failed", type(self).__name__)
+
+    def start(self):
+        """Build in the background now, then rebuild every reconcile interval."""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._maintain_forever())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+class Rollup:
+    """Per-column value counts, per-column sums and a row count."""
+
+    def __init__(self, columns: Tuple[str, ...], sum_columns: Tuple[str, ...]):
+        self.counts: Dict[str, Counter] = {column: Counter() for column in columns}
+        self.sums: Dict[str, float] = {column: 0.0 for column in sum_columns}
+        self.total = 0
+
+    def _add(self, row: dict, sign: int):
+        for column, counts in self.counts.items():
+            value = row.get(column)
+            if value:
+                counts[value] += sign
+                if counts[value] <= 0:
+                    del counts[value]
+        for column in self.sums:
+            value = row.get(column)
+            if value:
+                self.sums[column] += sign * float(value)
+
+    def add(self, row: dict):
+        self._add(row, 1)
+        self.total += 1
+
+    def apply(self, old: Optional[dict], new: Optional[dict]):
+        if old:
+            self._add(old, -1)
+            self.total -= 1
+        if new:
+            self.add(new)
+
+    def __eq__(self, other):
+        return (isinstance(other, Rollup) and self.total == other.total
+                and self.counts == other.counts and self.sums == other.sums)
+
+
+class AssetAggregates(MaintainedView):
+    def __init__(self, db: Database, columns: Iterable[str], reconcile_interval: float,
+                 sum_columns: Iterable[str] = ()):
+        self.columns = tuple(columns)
+        self.sum_columns = tuple(sum_columns)
+        self.scan_columns = self.columns + self.sum_columns
+        super().__init__(db, reconcile_interval)
+
+    def _new_state(self) -> Rollup:
+        return Rollup(self.columns, self.sum_columns)
+
+    def counts(self, column: str) -> Dict[str, int]:
+        return dict(self.state.counts[column])
+
+    def sum(self, column: str) -> float:
+        return self.state.sums[column]
+
+    @property
+    def total(self) -> int:
+        return self.state.total
@@ -0,0 +1,106 @@
+"""
+Append-only audit event log
+
+Every validation is recorded as a row in the `audit_events` table (see
+SETUP.md; the table is range-partitioned by audited_at). Events are buffered
+in memory and written with one bulk insert per batch, either when
+AUDIT_BATCH_SIZE events are waiting or every AUDIT_FLUSH_SECONDS, so a busy
+audit day costs a handful of inserts per second instead of one per scan.
+A failed flush keeps its events for the next attempt, up to
+AUDIT_MAX_BUFFER events; beyond that the oldest are dropped and counted.
+"""
+
+import asyncio
+import logging
+import os
+from typing import Awaitable, Callable, List, Optional
+
+from database import Database
+from metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", "500"))
+AUDIT_FLUSH_SECONDS = float(os.getenv("AUDIT_FLUSH_SECONDS", "1"))
+AUDIT_MAX_BUFFER = int(os.getenv("AUDIT_MAX_BUFFER", "100000"))
+
+audit_events_written = Counter("audit_events_written_total", "Audit events written to the audit log")
+audit_events_dropped = Counter("audit_events_dropped_total", "Audit events dropped because the buffer was full")
+
+
+# Called with each batch of events once it is written
+WriteHook = Callable[[List[dict]], Awaitable[None]]
+
+
+class AuditLog:
+    def __init__(self, db: Database, *, batch_size: int = AUDIT_BATCH_SIZE,
+                 flush_interval: float = AUDIT_FLUSH_SECONDS, max_buffer: int = AUDIT_MAX_BUFFER,
+                 on_write: Optional[WriteHook] = None):
+        self.db = db
+        self.on_write = on_write
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self._buffer: List[dict] = []
+        self._lock = asyncio.Lock()
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self):
+        return len(self._buffer)
+
+    def record(self, *events: dict):
+        self._buffer.extend(events)
+        self._trim()
+        if len(self._buffer) >= self.batch_size:
+            self._wake.set()
+
+    def _trim(self):
+        overflow = len(self._buffer) - self.max_buffer
+        if overflow > 0:
+            del self._buffer[:overflow]
+            audit_events_dropped.inc(overflow)
+            logger.warning("Audit buffer full, dropped %d events", overflow)
+
+    async def flush(self):
+        """Write everything buffered so far; failed batches stay buffered."""
+        async with self._lock:
+            while self._buffer:
+                batch = self._buffer[:self.batch_size]
+                del self._buffer[:len(batch)]
+                try:
+                    await self.db.insert_audit_events(batch)
+                except Exception:
+                    self._buffer[:0] = batch
+                    self._trim()
+                    logger.exception("Writing %d audit events failed", len(batch))
+                    return
+                audit_events_written.inc(len(batch))
+                if self.on_write:
+                    # The events are written; a failing hook must not stop the rest of the flush
+                    try:
+                        await self.on_write(batch)
+                    except Exception:
+                        logger.exception("Audit log write hook failed")
+
+    async def _flush_forever(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Flushing the audit log failed")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._flush_forever())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
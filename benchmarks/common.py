@@ -0,0 +1,43 @@
+"""
+Shared helpers for the benchmark scripts
+"""
+
+import os
+import statistics
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+def setup_environment():
+    """Provide dummy settings so main.py imports without a live Supabase project"""
+    os.environ.setdefault("SUPABASE_URL", "http://supabase.local")
+    os.environ.setdefault("SUPABASE_KEY", "benchmark-key")
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret-key-benchmark-secret-key")
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def summarize(latencies):
+    """Latency summary in milliseconds"""
+    return {
+        "count": len(latencies),
+        "mean_ms": round(statistics.mean(latencies) * 1000, 2) if latencies else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "max_ms": round(max(latencies) * 1000, 2) if latencies else 0.0,
+    }
+
+
+def print_summary(label, summary):
+    print(f"   {label:<40} n={summary['count']:<6} p50={summary['p50_ms']:>8.2f}ms "
+          f"p95={summary['p95_ms']:>8.2f}ms p99={summary['p99_ms']:>8.2f}ms")
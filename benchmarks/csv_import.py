@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Bulk CSV import throughput benchmark
+
+Imports a synthetic asset register into the in-memory PostgREST stand-in and
+reports rows/sec and database round trips. --legacy runs the old row-by-row
+algorithm (existence check + single insert per row) for comparison.
+--from-file writes the CSV to a temporary file and streams it through the
+upload path, reporting peak Python memory; the stand-in discards writes so
+only the importer's own memory is measured. --upsert FRACTION seeds the
+whole register first and re-imports it with mode=upsert, FRACTION of the rows
+changed, reporting how many rows were written.
+
+    python -m benchmarks.csv_import --rows 20000 --latency 0.002
+    python -m benchmarks.csv_import --rows 2000000 --latency 0 --from-file
+    python -m benchmarks.csv_import --rows 50000 --upsert 0.01
+"""
+
+import argparse
+import asyncio
+import csv
+import io
+import os
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.common import setup_environment
+from benchmarks.stand_in import StandInBackend
+
+setup_environment()
+
+from bulk_import import build_asset, import_assets, import_csv_file  # noqa: E402
+from database import create_database  # noqa: E402
+
+CSV_COLUMNS = ["tag", "name", "category", "assigned_to", "location", "purchase_date", "purchase_cost", "status"]
+
+
+def register_row(i, tag):
+    return [tag, f"Asset {i}", f"Category {i % 25}", f"EMP{i % 500:04d}",
+            f"Site {i % 40}", "2024-01-15", f"{100 + i % 900}.00", "Active"]
+
+
+def write_csv(buffer, rows, existing, invalid_every=100):
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    for i in range(rows):
+        row = register_row(i, f"BULK-{i:07d}" if i >= existing else f"SEED-{i:07d}")
+        if i % invalid_every == 7:
+            row[6] = "not-a-number"
+        writer.writerow(row)
+
+
+def make_csv(rows, existing):
+    buffer = io.StringIO()
+    write_csv(buffer, rows, existing)
+    return buffer.getvalue()
+
+
+def make_register(rows, changed_every=0):
+    """The full register as CSV text; every changed_every-th asset has moved site."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    for i in range(rows):
+        row = register_row(i, f"REG-{i:07d}")
+        if changed_every and i % changed_every == 0:
+            row[4] = "Site moved"
+        writer.writerow(row)
+    return buffer.getvalue()
+
+
+async def upsert_reimport(db, backend, args, chunk_sizes):
+    """Seed the register, then re-import it with a fraction of rows changed."""
+    await import_assets(db, csv.DictReader(io.StringIO(make_register(args.rows))), **chunk_sizes)
+    backend.round_trips.clear()
+    changed_every = max(1, round(1 / args.upsert))
+    reader = csv.DictReader(io.StringIO(make_register(args.rows, changed_every)))
+    start = time.perf_counter()
+    report = await import_assets(db, reader, mode="upsert", **chunk_sizes)
+    elapsed = time.perf_counter() - start
+    print(f"   inserted:    {report.inserted_count}")
+    print(f"   updated:     {report.updated_count}")
+    print(f"   unchanged:   {report.unchanged_count}")
+    print(f"   rows written: {report.inserted_count + report.updated_count} of {args.rows}")
+    return report.success_count, report.error_count, elapsed
+
+
+async def legacy_import(db, reader):
+    success_count, errors = 0, []
+    for row_num, row in enumerate(reader, start=2):
+        if await db.get_asset_by_tag(row['tag'].strip()):
+            errors.append({"row": row_num, "error": "exists", "data": row})
+            continue
+        try:
+            await db.insert_asset(build_asset(row))
+            success_count += 1
+        except Exception as e:
+            errors.append({"row": row_num, "error": str(e), "data": row})
+    return success_count, errors
+
+
+async def run(args):
+    backend = StandInBackend(latency=args.latency, discard_writes=args.from_file)
+    backend.seed("assets", [{"tag": f"SEED-{i:07d}", "name": "Seed", "category": "Seed"} for i in range(args.existing)])
+    db = create_database(transport=backend.transport())
+    chunk_sizes = {"lookup_chunk_size": args.lookup_chunk, "insert_chunk_size": args.insert_chunk}
+
+    if args.upsert:
+        success_count, error_count, elapsed = await upsert_reimport(db, backend, args, chunk_sizes)
+    elif args.from_file:
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", newline="", delete=False) as handle:
+            write_csv(handle, args.rows, args.existing)
+        print(f"   csv size:    {os.path.getsize(handle.name) / 1024 / 1024:.1f} MB")
+        tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            with open(handle.name, "rb") as upload:
+                report = await import_csv_file(db, upload, **chunk_sizes)
+        finally:
+            os.unlink(handle.name)
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"   peak memory: {peak / 1024 / 1024:.1f} MB")
+        success_count, error_count = report.success_count, report.error_count
+    else:
+        reader = csv.DictReader(io.StringIO(make_csv(args.rows, args.existing)))
+        start = time.perf_counter()
+        if args.legacy:
+            success_count, errors = await legacy_import(db, reader)
+            error_count = len(errors)
+        else:
+            report = await import_assets(db, reader, **chunk_sizes)
+            success_count, error_count = report.success_count, report.error_count
+        elapsed = time.perf_counter() - start
+
+    await db.aclose()
+    return success_count, error_count, elapsed, sum(backend.round_trips.values())
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--existing", type=int, default=500, help="rows whose tag is already in the database")
+    parser.add_argument("--latency", type=float, default=0.002, help="simulated seconds per round trip")
+    parser.add_argument("--lookup-chunk", type=int, default=200)
+    parser.add_argument("--insert-chunk", type=int, default=500)
+    parser.add_argument("--legacy", action="store_true", help="run the old row-by-row import")
+    parser.add_argument("--from-file", action="store_true", help="stream from a temporary file and report memory")
+    parser.add_argument("--upsert", type=float, metavar="FRACTION",
+                        help="re-import a seeded register in upsert mode with this fraction of rows changed")
+    args = parser.parse_args()
+
+    mode = "row-by-row" if args.legacy else f"upsert, {args.upsert:.0%} changed" if args.upsert else "batched"
+    print(f"📦 Bulk import benchmark ({mode}, {args.rows} rows, {args.latency * 1000:.1f}ms/round trip)")
+    print("=" * 50)
+    success_count, error_count, elapsed, round_trips = asyncio.run(run(args))
+    print(f"   imported:    {success_count}")
+    print(f"   errors:      {error_count}")
+    print(f"   round trips: {round_trips}")
+    print(f"   elapsed:     {elapsed:.2f}s")
+    print(f"\n📊 Throughput: {args.rows / elapsed:,.0f} rows/sec")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Event-loop benchmark for the async data layer
+
+Measures /assets/tag/{tag} latency on its own and again while slow
+/dashboard/assets requests are in flight. The PostgREST backend is simulated
+with an httpx mock transport so the real pooled client is exercised without a
+live Supabase project.
+
+    python -m benchmarks.event_loop [--blocking]
+
+--blocking makes the fake backend sleep synchronously, which reproduces how
+the old synchronous supabase client stalled the whole worker.
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+
+from benchmarks.common import print_summary, setup_environment, summarize
+
+setup_environment()
+
+import main  # noqa: E402
+from database import create_database  # noqa: E402
+
+ASSET = {
+    "id": 1, "tag": "AST-0001", "name": "Laptop", "category": "IT", "status": "Active",
+    "assigned_to": "EMP001", "location": "HQ",
+}
+
+
+def make_backend(tag_latency, slow_latency, blocking):
+    listing = json.dumps([dict(ASSET, id=i, tag=f"AST-{i:04d}") for i in range(1000)]).encode()
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        is_tag_lookup = "tag" in request.url.params
+        delay = tag_latency if is_tag_lookup else slow_latency
+        if blocking:
+            time.sleep(delay)
+        else:
+            await asyncio.sleep(delay)
+        if is_tag_lookup:
+            return httpx.Response(200, json=[ASSET])
+        return httpx.Response(200, content=listing, headers={"Content-Type": "application/json"})
+
+    return httpx.MockTransport(handler)
+
+
+async def scan_loop(client, headers, requests, concurrency):
+    latencies = []
+    queue = asyncio.Queue()
+    for _ in range(requests):
+        queue.put_nowait(None)
+
+    async def worker():
+        while not queue.empty():
+            queue.get_nowait()
+            start = time.perf_counter()
+            response = await client.get("/assets/tag/AST-0001", headers=headers)
+            latencies.append(time.perf_counter() - start)
+            assert response.status_code == 200, response.text
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies
+
+
+async def run(args):
+    main.init_resources(create_database(transport=make_backend(args.tag_latency, args.slow_latency, args.blocking)))
+    token = main.create_access_token(data={"sub": "benchmark"})
+    headers = {"Authorization": f"Bearer {token}"}
+
+    async with httpx.AsyncClient(app=main.app, base_url="http://bench", timeout=None) as client:
+        baseline = await scan_loop(client, headers, args.requests, args.concurrency)
+
+        slow_calls = [
+            asyncio.create_task(client.get("/dashboard/assets", headers=headers))
+            for _ in range(args.slow_requests)
+        ]
+        await asyncio.sleep(0)
+        contended = await scan_loop(client, headers, args.requests, args.concurrency)
+        await asyncio.gather(*slow_calls)
+
+    await main.close_resources()
+    return summarize(baseline), summarize(contended)
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--tag-latency", type=float, default=0.005, help="seconds per tag lookup")
+    parser.add_argument("--slow-latency", type=float, default=2.0, help="seconds per dashboard listing")
+    parser.add_argument("--slow-requests", type=int, default=4)
+    parser.add_argument("--blocking", action="store_true", help="simulate the old synchronous client")
+    args = parser.parse_args()
+
+    print("⏱️  Event-loop benchmark: /assets/tag/{tag} vs slow /dashboard/assets")
+    print("=" * 50)
+    baseline, contended = asyncio.run(run(args))
+    print_summary("tag lookup (idle)", baseline)
+    print_summary(f"tag lookup (+{args.slow_requests} slow dashboard)", contended)
+    ratio = contended["p99_ms"] / baseline["p99_ms"] if baseline["p99_ms"] else 0.0
+    print(f"\n📊 p99 ratio contended/idle: {ratio:.2f}x")
+
+
+if __name__ == "__main__":
+    main_cli()
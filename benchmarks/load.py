@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Load benchmark for the whole API
+
+Drives the FastAPI app in-process against the local SQLite backend (in
+memory by default) seeded with a synthetic asset register, and measures the
+main user paths at each concurrency level:
+
+    tag_lookup   GET  /assets/tag/{tag}           scanner lookup
+    validate     POST /assets/validate            scanner write
+    list         GET  /dashboard/assets           dashboard page, random category
+    search       GET  /dashboard/search           dashboard search box
+    login        POST /auth/login                 bcrypt verify
+    bulk_import  POST /admin/assets/bulk-import   CSV upload
+
+Datasets grow in place (10k, then topped up to 100k, ...). Results are
+printed and can be saved as JSON; --baseline compares against an earlier
+results file and exits non-zero when a scenario's p95 latency or throughput
+regresses by more than --tolerance.
+
+    python -m benchmarks.load --assets 10000 100000 --concurrency 1 10 --output results.json
+    python -m benchmarks.load --assets 10000 --baseline results.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import httpx
+
+from benchmarks.common import print_summary, setup_environment, summarize
+
+setup_environment()
+os.environ.setdefault("DB_BACKEND", "memory")
+
+import main  # noqa: E402
+
+SCENARIOS = ("tag_lookup", "validate", "list", "search", "login", "bulk_import")
+CATEGORIES = [f"Category {i}" for i in range(25)]
+WORDS = ["Dell", "Latitude", "Chair", "Monitor", "Site 7", "EMP0042", "AST-00001", "lap"]
+PASSWORD = "benchmark-password"
+SEED_CHUNK = 5000
+
+
+def make_asset(i):
+    return {
+        "tag": f"AST-{i:07d}",
+        "name": f"{random.choice(['Dell', 'HP', 'Lenovo'])} {random.choice(['Latitude', 'Monitor', 'Chair'])} {i}",
+        "category": CATEGORIES[i % len(CATEGORIES)],
+        "assigned_to": f"EMP{i % 500:04d}",
+        "location": f"Site {i % 40}",
+        "purchase_date": "2024-01-15",
+        "purchase_cost": 100 + i % 900,
+        "status": "Active",
+    }
+
+
+async def seed_users():
+    password_hash = await main.hash_password(PASSWORD)
+    for username, role in (("bench-admin", "admin"), ("bench-auditor", "auditor")):
+        if not await main.db.get_user_by_username(username):
+            await main.db.insert_user({"username": username, "email": f"{username}@example.com",
+                                       "password_hash": password_hash, "role": role})
+
+
+async def seed_assets(start, stop):
+    for first in range(start, stop, SEED_CHUNK):
+        await main.db.insert_assets([make_asset(i) for i in range(first, min(first + SEED_CHUNK, stop))])
+    # Seeding bypasses the write endpoints, so rebuild the in-memory views
+    await main.asset_aggregates.rebuild()
+    await main.search_index.rebuild()
+
+
+async def login(client, username):
+    response = await client.post("/auth/login", json={"username": username, "password": PASSWORD})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+class Scenarios:
+    def __init__(self, client, admin, auditor, assets, import_rows):
+        self.client = client
+        self.admin = admin
+        self.auditor = auditor
+        self.assets = assets
+        self.import_rows = import_rows
+        self.imports = 0
+
+    def asset_number(self):
+        return random.randrange(self.assets)
+
+    async def tag_lookup(self):
+        return await self.client.get(f"/assets/tag/AST-{self.asset_number():07d}", headers=self.auditor)
+
+    async def validate(self):
+        return await self.client.post("/assets/validate", headers=self.auditor, json={
+            "assetcode": self.asset_number() + 1, "empcode": "EMP0001", "auditby": "bench-auditor", "auditstatus": "Valid",
+        })
+
+    async def list(self):
+        return await self.client.get("/dashboard/assets", headers=self.auditor,
+                                     params={"category": random.choice(CATEGORIES), "limit": 100})
+
+    async def search(self):
+        return await self.client.get("/dashboard/search", headers=self.auditor, params={"q": random.choice(WORDS)})
+
+    async def login(self):
+        return await self.client.post("/auth/login", json={"username": "bench-auditor", "password": PASSWORD})
+
+    async def bulk_import(self):
+        self.imports += 1
+        lines = ["tag,name,category,location,purchase_cost"]
+        lines += [f"IMP-{self.imports:05d}-{i:06d},Imported {i},Imported,Dock {i % 5},{i % 700}"
+                  for i in range(self.import_rows)]
+        files = {"file": ("assets.csv", "\n".join(lines) + "\n", "text/csv")}
+        return await self.client.post("/admin/assets/bulk-import", headers=self.admin, files=files)
+
+
+async def drive(call, requests, concurrency):
+    latencies, errors = [], 0
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            started = time.perf_counter()
+            response = await call()
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    result = summarize(latencies)
+    result["errors"] = errors
+    result["rps"] = round(len(latencies) / elapsed, 1) if elapsed else 0.0
+    return result
+
+
+async def run(args):
+    results = {}
+    random.seed(args.seed)
+    async with main.app.router.lifespan_context(main.app):
+        await seed_users()
+        seeded = 0
+        async with httpx.AsyncClient(app=main.app, base_url="http://bench", timeout=None) as client:
+            for assets in sorted(args.assets):
+                started = time.perf_counter()
+                await seed_assets(seeded, assets)
+                seeded = assets
+                print(f"\n🏋️  {assets:,} assets (seeded in {time.perf_counter() - started:.1f}s)")
+                print("=" * 50)
+                admin, auditor = await login(client, "bench-admin"), await login(client, "bench-auditor")
+                scenarios = Scenarios(client, admin, auditor, assets, args.import_rows)
+                for concurrency in args.concurrency:
+                    for name in args.scenarios:
+                        requests = {"login": args.login_requests, "bulk_import": args.import_requests}.get(
+                            name, args.requests)
+                        result = await drive(getattr(scenarios, name), requests, concurrency)
+                        results.setdefault(str(assets), {}).setdefault(f"c{concurrency}", {})[name] = result
+                        print_summary(f"{name} (c={concurrency})", result)
+                        print(f"   {'':<40} {result['rps']:>8.1f} req/s, {result['errors']} errors")
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Scenarios whose p95 or throughput got worse than baseline by more than tolerance."""
+    regressions = []
+    for assets, by_concurrency in results.items():
+        for concurrency, scenarios in by_concurrency.items():
+            for name, result in scenarios.items():
+                before = baseline.get(assets, {}).get(concurrency, {}).get(name)
+                if not before:
+                    continue
+                label = f"{name} @ {assets} assets, {concurrency}"
+                if before["p95_ms"] and result["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+                    regressions.append(f"{label}: p95 {before['p95_ms']:.2f}ms -> {result['p95_ms']:.2f}ms")
+                if before["rps"] and result["rps"] < before["rps"] * (1 - tolerance):
+                    regressions.append(f"{label}: {before['rps']:.1f} -> {result['rps']:.1f} req/s")
+    return regressions
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--assets", type=int, nargs="+", default=[10000], help="dataset sizes, e.g. 10000 100000 1000000")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[10])
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=500, help="requests per scenario")
+    parser.add_argument("--login-requests", type=int, default=50)
+    parser.add_argument("--import-requests", type=int, default=5)
+    parser.add_argument("--import-rows", type=int, default=1000, help="rows per bulk import upload")
+    parser.add_argument("--backend", choices=["memory", "sqlite"], default=None,
+                        help="local backend (default: DB_BACKEND or memory); sqlite uses a temporary file")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--baseline", help="compare against a results JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed regression, as a fraction")
+    args = parser.parse_args()
+
+    if args.backend == "sqlite" or (args.backend is None and os.environ["DB_BACKEND"] == "sqlite"):
+        # main already opened the database it was configured with; use a fresh file for this run
+        from database import InstrumentedDatabase
+        from sqlite_database import SQLiteDatabase
+        path = os.path.join(tempfile.mkdtemp(prefix="asset-bench-"), "bench.db")
+        main.init_resources(InstrumentedDatabase(SQLiteDatabase(path)))
+
+    results = asyncio.run(run(args))
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "backend": args.backend or os.environ["DB_BACKEND"],
+            "args": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Results written to {args.output}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        print(f"\n📊 Compared with {args.baseline} (tolerance {args.tolerance:.0%})")
+        for regression in regressions:
+            print(f"   ❌ {regression}")
+        if regressions:
+            sys.exit(1)
+        print("   ✅ No regressions")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Search index benchmark
+
+Builds the in-memory search index over a synthetic asset register and times
+typical search-box queries against it, next to a sequential scan that does
+what the ilike fallback does (case-insensitive substring match on name, tag
+and category for every row). The scan runs in Python, so it is slower per
+row than Postgres, but it grows with the table the same way.
+
+    python -m benchmarks.search --assets 100000 1000000
+"""
+
+import argparse
+import random
+import resource
+import time
+
+from benchmarks.common import print_summary, setup_environment, summarize
+
+setup_environment()
+
+from search import SearchIndex  # noqa: E402
+
+MAKES = ["Dell", "HP", "Lenovo", "Apple", "Cisco", "Logitech", "Herman Miller", "Steelcase", "Toyota", "Samsung"]
+MODELS = ["Latitude", "Elitebook", "Thinkpad", "Macbook", "Catalyst", "Aeron", "Leap", "Corolla", "Galaxy", "Optiplex"]
+KINDS = [("Laptop", "IT"), ("Monitor", "IT"), ("Switch", "Network"), ("Chair", "Furniture"),
+         ("Desk", "Furniture"), ("Sedan", "Vehicles"), ("Phone", "Mobile"), ("Dock", "IT")]
+QUERIES = ["AST-0004242", "4242", "latitude", "la", "dell laptop", "emp0042", "site 17", "steelcase chair", "zzzz"]
+
+
+def make_assets(count, seed=7):
+    rng = random.Random(seed)
+    for i in range(1, count + 1):
+        kind, category = rng.choice(KINDS)
+        yield {
+            "id": i,
+            "tag": f"AST-{i:07d}",
+            "name": f"{rng.choice(MAKES)} {rng.choice(MODELS)} {kind} {rng.randint(100, 9999)}",
+            "category": category,
+            "location": f"Site {rng.randint(1, 60)}",
+            "assigned_to": f"EMP{rng.randint(1, 5000):04d}",
+        }
+
+
+def ilike_scan(assets, q):
+    """What name/tag/category ilike '%q%' does without an index."""
+    needle = q.lower()
+    return [asset for asset in assets
+            if needle in asset["name"].lower() or needle in asset["tag"].lower() or needle in asset["category"].lower()]
+
+
+def max_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run(count, repeats, scan_repeats):
+    assets = list(make_assets(count))
+    rss_before = max_rss_mb()
+    index = SearchIndex(None, reconcile_interval=0)
+    started = time.perf_counter()
+    for asset in assets:
+        index.terms.add(asset)
+    index.built_at = time.monotonic()
+    build_seconds = time.perf_counter() - started
+
+    print(f"\n🔎 Search benchmark ({count:,} assets)")
+    print("=" * 50)
+    print(f"   index build:  {build_seconds:.1f}s, {len(index.terms):,} words, "
+          f"~{max_rss_mb() - rss_before:.0f} MB")
+
+    for q in QUERIES:
+        latencies = []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            page, total = index.search(q, limit=50)
+            latencies.append(time.perf_counter() - started)
+        print_summary(f"index {q!r} ({total:,} hits)", summarize(latencies))
+
+    for q in QUERIES[:3]:
+        latencies = []
+        for _ in range(scan_repeats):
+            started = time.perf_counter()
+            hits = ilike_scan(assets, q)
+            latencies.append(time.perf_counter() - started)
+        print_summary(f"scan  {q!r} ({len(hits):,} hits)", summarize(latencies))
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--assets", type=int, nargs="+", default=[100000, 1000000])
+    parser.add_argument("--repeats", type=int, default=50, help="Index queries per search term")
+    parser.add_argument("--scan-repeats", type=int, default=3, help="Sequential scans per search term")
+    args = parser.parse_args()
+    for count in args.assets:
+        run(count, args.repeats, args.scan_repeats)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Response encoding benchmark
+
+Times how long it takes to turn a /dashboard/assets page into bytes (the
+default FastAPI path through jsonable_encoder, stdlib json alone, and orjson)
+and how many bytes each compression setting puts on the wire.
+
+    python -m benchmarks.serialization --assets 10000
+"""
+
+import argparse
+import gzip
+import json
+import time
+from datetime import datetime, timedelta, timezone
+
+from benchmarks.common import print_summary, setup_environment, summarize
+
+setup_environment()
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+
+from compression import brotli  # noqa: E402
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def make_assets(count):
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    return [
+        {
+            "id": i, "tag": f"AST-{i:07d}", "name": f"Dell Latitude 5420 #{i}", "category": f"Category {i % 25}",
+            "assigned_to": f"EMP{i % 500:04d}", "location": f"Site {i % 40}", "purchase_date": "2024-01-15",
+            "purchase_cost": 1299.0 + i % 900, "status": "Active",
+            "last_audit": (start + timedelta(minutes=i)).isoformat(), "last_auditor": "auditor1",
+            "audit_status": "Valid", "audit_notes": None,
+            "created_at": start.isoformat(), "updated_at": start.isoformat(),
+        }
+        for i in range(1, count + 1)
+    ]
+
+
+def fastapi_default(payload):
+    # What JSONResponse does for a plain dict returned by a handler
+    return json.dumps(jsonable_encoder(payload), ensure_ascii=False, allow_nan=False,
+                      indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def stdlib_direct(payload):
+    return json.dumps(payload, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def timed(function, payload, repeats):
+    latencies = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = function(payload)
+        latencies.append(time.perf_counter() - started)
+    return result, latencies
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--assets", type=int, default=10000)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    payload = {"assets": make_assets(args.assets), "next_cursor": None}
+    encoders = [("jsonable_encoder + json (default)", fastapi_default), ("json, no jsonable_encoder", stdlib_direct)]
+    if orjson is not None:
+        encoders.append(("orjson, no jsonable_encoder", orjson.dumps))
+
+    print(f"\n🧾 Response encoding ({args.assets:,} assets)")
+    print("=" * 50)
+    body = b""
+    for label, function in encoders:
+        body, latencies = timed(function, payload, args.repeats)
+        print_summary(label, summarize(latencies))
+
+    print(f"\n📦 Bytes on the wire ({args.assets:,} assets)")
+    print("=" * 50)
+    print(f"   {'identity':<24} {len(body):>10,} bytes")
+    compressors = [(f"gzip level {level}", lambda data, level=level: gzip.compress(data, compresslevel=level))
+                   for level in (1, 6, 9)]
+    if brotli is not None:
+        compressors += [(f"brotli quality {quality}", lambda data, quality=quality: brotli.compress(data, quality=quality))
+                        for quality in (4, 11)]
+    else:
+        print("   (install 'brotli' to include brotli)")
+    for label, function in compressors:
+        compressed, latencies = timed(function, body, max(1, args.repeats // 4))
+        print(f"   {label:<24} {len(compressed):>10,} bytes  {summarize(latencies)['p50_ms']:>8.2f}ms")
+
+
+if __name__ == "__main__":
+    main_cli()
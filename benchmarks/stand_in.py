@@ -0,0 +1,304 @@
+"""
+In-memory stand-in for the Supabase PostgREST endpoint
+
+Serves the subset of PostgREST the API uses (select/insert/upsert/update/
+delete with eq/in filters, order and limit, and the update_assets RPC) from
+Python lists through an httpx mock transport. Each request can be delayed to simulate network round
+trips, and round trips are counted per table and method.
+"""
+
+import asyncio
+import json
+import operator as operators
+from collections import Counter
+from typing import Dict, List, Optional
+
+import httpx
+
+UNIQUE_COLUMNS = {"assets": ("id", "tag"), "users": ("id", "username", "email"), "audit_events": ("id",)}
+
+
+def _split_top_level(value: str) -> List[str]:
+    # a,b,"c,d",and(e,f) -> ["a", "b", '"c,d"', "and(e,f)"]
+    items, current, quoted, depth, escaped = [], [], False, 0, False
+    for char in value:
+        if escaped:
+            escaped = False
+        elif char == "\\":
+            escaped = True
+        elif char == '"':
+            quoted = not quoted
+        elif not quoted and char == "(":
+            depth += 1
+        elif not quoted and char == ")":
+            depth -= 1
+        elif char == "," and not quoted and depth == 0:
+            items.append("".join(current))
+            current = []
+            continue
+        current.append(char)
+    items.append("".join(current))
+    return items
+
+
+def _unquote(value: str) -> str:
+    if len(value) >= 2 and value[0] == value[-1] == '"':
+        value = value[1:-1].replace('\\"', '"').replace("\\\\", "\\")
+    return value
+
+
+def _split_list(value: str) -> List[str]:
+    # in.(a,b,"c,d") -> ["a", "b", "c,d"]
+    return [_unquote(item) for item in _split_top_level(value)]
+
+
+def _tree_predicate(operator: str, value: str):
+    # or=(name.gt.x,and(name.eq.x,id.gt.5))
+    predicates = []
+    for item in _split_top_level(value[1:-1]):
+        if item.startswith(("and(", "or(")):
+            nested, _, rest = item.partition("(")
+            predicates.append(_tree_predicate(nested, "(" + rest))
+        else:
+            column, _, expression = item.partition(".")
+            predicates.append(_predicate(column, expression))
+    combine = any if operator == "or" else all
+    return lambda row: combine(predicate(row) for predicate in predicates)
+
+
+def _predicate(column: str, expression: str):
+    operator, _, operand = expression.partition(".")
+
+    def text(row):
+        value = row.get(column)
+        return "" if value is None else str(value)
+
+    def compare(row, expected, op):
+        value = row.get(column)
+        if value is None:
+            return False
+        if isinstance(value, (int, float)):
+            expected = type(value)(expected)
+        return op(value, expected)
+
+    if operator == "eq":
+        expected = _unquote(operand)
+        return lambda row: text(row) == expected
+    if operator == "neq":
+        expected = _unquote(operand)
+        return lambda row: text(row) != expected
+    if operator in ("gt", "gte", "lt", "lte"):
+        op = getattr(operators, {"gt": "gt", "gte": "ge", "lt": "lt", "lte": "le"}[operator])
+        expected = _unquote(operand)
+        return lambda row: compare(row, expected, op)
+    if operator == "in":
+        values = set(_split_list(operand[1:-1]))
+        return lambda row: text(row) in values
+    if operator == "is":
+        if operand == "null":
+            return lambda row: row.get(column) is None
+        return lambda row: text(row).lower() == operand
+    if operator == "ilike":
+        needle = _unquote(operand).replace("*", "").replace("%", "").lower()
+        return lambda row: needle in text(row).lower()
+    raise ValueError(f"Unsupported filter operator: {operator}")
+
+
+def _sort_key(value):
+    return (value is None, "" if value is None else value)
+
+
+class StandInBackend:
+    def __init__(self, latency: float = 0.0, discard_writes: bool = False):
+        self.latency = latency
+        self.discard_writes = discard_writes
+        self.tables: Dict[str, List[dict]] = {"assets": [], "users": []}
+        self.unique: Dict[str, Dict[str, Dict[object, dict]]] = {}
+        self.next_id: Dict[str, int] = {}
+        self.round_trips = Counter()
+
+    def transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self.handle)
+
+    def seed(self, table: str, rows: List[dict]):
+        for row in rows:
+            self._insert_row(table, dict(row))
+
+    def _index(self, table: str) -> Dict[str, Dict[object, dict]]:
+        if table not in self.unique:
+            self.unique[table] = {column: {} for column in UNIQUE_COLUMNS.get(table, ())}
+        return self.unique[table]
+
+    def _insert_row(self, table: str, row: dict) -> dict:
+        if "id" not in row:
+            self.next_id[table] = self.next_id.get(table, 0) + 1
+            row["id"] = self.next_id[table]
+        self.tables.setdefault(table, []).append(row)
+        for column, index in self._index(table).items():
+            if row.get(column) is not None:
+                index[str(row[column])] = row
+        return row
+
+    def _update_row(self, table: str, row: dict, changes: dict):
+        for column, index in self._index(table).items():
+            if column in changes and row.get(column) is not None:
+                index.pop(str(row[column]), None)
+        row.update(changes)
+        for column, index in self._index(table).items():
+            if row.get(column) is not None:
+                index[str(row[column])] = row
+
+    def _conflict(self, table: str, row: dict, ignore=None, columns=None):
+        found = self._conflicting_column(table, row, ignore, columns)
+        return found[1] if found else None
+
+    def _conflicting_column(self, table: str, row: dict, ignore=None, columns=None):
+        for column, index in self._index(table).items():
+            if columns and column not in columns:
+                continue
+            existing = index.get(str(row.get(column))) if row.get(column) is not None else None
+            if existing is not None and existing is not ignore:
+                return column, existing
+        return None
+
+    def _duplicate(self, table: str, column: str, value) -> httpx.Response:
+        # Shaped like PostgreSQL's unique_violation as PostgREST reports it
+        return self._error(409, "23505", f'duplicate key value violates unique constraint "{table}_{column}_key"',
+                           f"Key ({column})=({value}) already exists.")
+
+    def _filtered(self, table: str, params: httpx.QueryParams) -> List[dict]:
+        rows = self.tables.get(table, [])
+        index = self._index(table)
+        for column, expression in params.multi_items():
+            if column in ("select", "order", "limit", "offset", "on_conflict"):
+                continue
+            if column in ("or", "and"):
+                matches = _tree_predicate(column, expression)
+                rows = [row for row in rows if matches(row)]
+                continue
+            if column in index and expression.startswith(("eq.", "in.")) and rows is self.tables.get(table):
+                # Unique-index lookup instead of a scan
+                if expression.startswith("eq."):
+                    values = [_unquote(expression[3:])]
+                else:
+                    values = _split_list(expression[4:-1])
+                candidates = (index[column].get(value) for value in values)
+                rows = [row for row in candidates if row is not None]
+                continue
+            matches = _predicate(column, expression)
+            rows = [row for row in rows if matches(row)]
+        return rows
+
+    @staticmethod
+    def _project(rows: List[dict], select: str) -> List[dict]:
+        if not select or select == "*":
+            return [dict(row) for row in rows]
+        columns = [column.strip() for column in select.split(",")]
+        return [{column: row.get(column) for column in columns} for row in rows]
+
+    @staticmethod
+    def _error(status: int, code: str, message: str, details: Optional[str] = None) -> httpx.Response:
+        return httpx.Response(status, json={"code": code, "message": message, "details": details, "hint": None})
+
+    def _rpc(self, function: str, params: dict) -> httpx.Response:
+        if function == "update_asset_audit":
+            return self._update_asset_audit(params["asset_id"], params["audit"])
+        if function != "update_assets":
+            return self._error(404, "PGRST202", f"Could not find the function public.{function}")
+        # Like the SQL function in SETUP.md: update by id, set only the keys each row has
+        by_id = {row["id"]: row for row in self.tables.get("assets", [])}
+        matched = [(by_id[changes["id"]], changes) for changes in params["rows"] if changes["id"] in by_id]
+        # One statement: a unique violation updates nothing
+        for row, changes in matched:
+            found = self._conflicting_column("assets", changes, ignore=row)
+            if found:
+                return self._duplicate("assets", found[0], changes[found[0]])
+        for row, changes in matched:
+            self._update_row("assets", row, changes)
+        return httpx.Response(200, json=[dict(row) for row, _ in matched])
+
+    def _update_asset_audit(self, asset_id: int, audit: dict) -> httpx.Response:
+        # Like the SQL function in SETUP.md: the updated row plus the audit status it replaced
+        for row in self.tables.get("assets", []):
+            if row["id"] == asset_id:
+                previous = row.get("audit_status")
+                self._update_row("assets", row, audit)
+                return httpx.Response(200, json=[{**row, "previous_audit_status": previous}])
+        return httpx.Response(200, json=[])
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        table = request.url.path.rsplit("/", 1)[-1]
+        self.round_trips[(table, request.method)] += 1
+        params = request.url.params
+
+        if "/rpc/" in request.url.path:
+            return self._rpc(table, json.loads(request.content))
+
+        if request.method == "GET":
+            rows = self._filtered(table, params)
+            for order in reversed(params.get_list("order")):
+                for term in reversed(order.split(",")):
+                    column, _, direction = term.partition(".")
+                    rows = sorted(rows, key=lambda r, c=column: _sort_key(r.get(c)),
+                                  reverse=direction.startswith("desc"))
+            if "offset" in params:
+                rows = rows[int(params["offset"]):]
+            if "limit" in params:
+                rows = rows[:int(params["limit"])]
+            return httpx.Response(200, json=self._project(rows, params.get("select", "*")))
+
+        if request.method == "POST":
+            payload = json.loads(request.content)
+            payload = payload if isinstance(payload, list) else [payload]
+            merge = "merge-duplicates" in request.headers.get("Prefer", "")
+            if self.discard_writes:
+                # Memory benchmarks only care about the client side
+                return httpx.Response(201, json=[])
+            if not merge:
+                # A statement either inserts every row or none of them
+                seen = {column: set() for column in UNIQUE_COLUMNS.get(table, ())}
+                for row in payload:
+                    found = self._conflicting_column(table, row)
+                    if found:
+                        return self._duplicate(table, found[0], row[found[0]])
+                    for column, values in seen.items():
+                        if row.get(column) is not None and str(row.get(column)) in values:
+                            return self._duplicate(table, column, row[column])
+                    for column, values in seen.items():
+                        values.add(str(row.get(column)))
+            conflict_columns = params["on_conflict"].split(",") if "on_conflict" in params else None
+            written = []
+            for row in payload:
+                existing = self._conflict(table, row, columns=conflict_columns)
+                if existing is not None:
+                    self._update_row(table, existing, row)
+                    written.append(existing)
+                else:
+                    written.append(self._insert_row(table, dict(row)))
+            if "return=minimal" in request.headers.get("Prefer", ""):
+                return httpx.Response(201)
+            return httpx.Response(201, json=[dict(row) for row in written])
+
+        if request.method == "PATCH":
+            changes = json.loads(request.content)
+            rows = self._filtered(table, params)
+            for row in rows:
+                found = self._conflicting_column(table, changes, ignore=row)
+                if found:
+                    return self._duplicate(table, found[0], changes[found[0]])
+            for row in rows:
+                self._update_row(table, row, changes)
+            return httpx.Response(200, json=[dict(row) for row in rows])
+
+        if request.method == "DELETE":
+            rows = self._filtered(table, params)
+            ids = {id(row) for row in rows}
+            self.tables[table] = [row for row in self.tables.get(table, []) if id(row) not in ids]
+            for row in rows:
+                for column, index in self._index(table).items():
+                    index.pop(str(row.get(column)), None)
+            return httpx.Response(200, json=[dict(row) for row in rows])
+
+        return self._error(405, "PGRST000", f"Unsupported method {request.method}")
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark
+
+Starts the API in a fresh uvicorn process several times and measures how
+long it takes from spawning the process until the first request is answered
+(/health) and until warm-up has finished (/ready), next to the import,
+startup and warm-up times the app reports about itself on /ready. Runs
+against the in-memory SQLite backend, optionally seeded with assets so the
+warm-up has indexes to build.
+
+    python -m benchmarks.startup --runs 5 --assets 10000
+"""
+
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.common import ROOT, print_summary, setup_environment, summarize
+
+setup_environment()
+
+SEED_SCRIPT = """
+import asyncio, sys
+from benchmarks.load import make_asset
+from sqlite_database import SQLiteDatabase
+async def seed(path, count):
+    db = SQLiteDatabase(path)
+    for first in range(0, count, 5000):
+        await db.insert_assets([make_asset(i) for i in range(first, min(first + 5000, count))])
+    await db.aclose()
+asyncio.run(seed(sys.argv[1], int(sys.argv[2])))
+"""
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(client: httpx.Client, path: str, deadline: float) -> float:
+    while time.perf_counter() < deadline:
+        try:
+            if client.get(path).status_code == 200:
+                return time.perf_counter()
+        except httpx.TransportError:
+            pass
+        time.sleep(0.005)
+    raise TimeoutError(f"{path} did not answer 200 in time")
+
+
+def measure(env: dict, timeout: float) -> dict:
+    port = free_port()
+    spawned = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=env,
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=1) as client:
+            first_request = wait_for(client, "/health", spawned + timeout)
+            ready = wait_for(client, "/ready", spawned + timeout)
+            reported = client.get("/ready").json()
+    finally:
+        process.terminate()
+        process.wait()
+    return {
+        "first_request": first_request - spawned,
+        "ready": ready - spawned,
+        "import": reported["import_seconds"],
+        "warmup": reported["warmup_seconds"],
+    }
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--assets", type=int, default=0, help="assets seeded before each start")
+    parser.add_argument("--timeout", type=float, default=120)
+    args = parser.parse_args()
+
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    if args.assets:
+        # A SQLite file seeded once, so every run starts against the same data
+        path = os.path.join(tempfile.mkdtemp(prefix="asset-bench-"), "bench.db")
+        subprocess.run([sys.executable, "-c", SEED_SCRIPT, path, str(args.assets)], cwd=ROOT, env=env, check=True)
+        env.update(DB_BACKEND="sqlite", SQLITE_PATH=path)
+    else:
+        env.setdefault("DB_BACKEND", "memory")
+
+    runs = [measure(env, args.timeout) for _ in range(args.runs)]
+    print(f"\n⏱️  Process start to serving ({args.runs} runs, {args.assets:,} assets)")
+    print("=" * 50)
+    print_summary("spawn -> first request (/health)", summarize([run["first_request"] for run in runs]))
+    print_summary("spawn -> ready (/ready)", summarize([run["ready"] for run in runs]))
+    print_summary("import main (reported)", summarize([run["import"] for run in runs]))
+    print_summary("warm-up (reported)", summarize([run["warmup"] for run in runs]))
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,319 @@
+"""
+Set-based, streaming CSV import for /admin/assets/bulk-import
+
+The upload is read from its spool in fixed-size chunks, decoded
+incrementally and parsed into batches of rows. Each batch is validated,
+deduplicated, checked against existing tags with chunked `in` queries and
+written with chunked bulk inserts before the next batch is read, so memory
+stays bounded by the batch size no matter how large the file is. Tags
+repeated across batches are caught by the existence lookup because earlier
+batches are already in the database.
+
+In upsert mode (`?mode=upsert`) rows whose tag already exists update that
+asset instead of failing. Each batch fetches the stored rows by tag with the
+same chunked lookups and diffs them against the CSV in memory, comparing
+only the columns the file has; unchanged rows are counted and skipped, and
+changed rows are written back with chunked bulk updates of just the changed
+columns. Re-importing a register where 1% of rows changed writes only that
+1%.
+"""
+
+import asyncio
+import codecs
+import csv
+import os
+from datetime import datetime, timezone
+from typing import Any, Awaitable, BinaryIO, Callable, Collection, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from database import Database
+
+# Expected CSV columns: tag, name, category, assigned_to, location, purchase_date, purchase_cost, status
+REQUIRED_FIELDS = ['tag', 'name', 'category']
+
+LOOKUP_CHUNK_SIZE = int(os.getenv("BULK_IMPORT_LOOKUP_CHUNK", "200"))
+INSERT_CHUNK_SIZE = int(os.getenv("BULK_IMPORT_INSERT_CHUNK", "500"))
+READ_CHUNK_SIZE = int(os.getenv("BULK_IMPORT_READ_CHUNK", str(64 * 1024)))
+BATCH_ROWS = int(os.getenv("BULK_IMPORT_BATCH_ROWS", "2000"))
+MAX_ERRORS = int(os.getenv("BULK_IMPORT_MAX_ERRORS", "1000"))
+
+# Columns an upsert compares and updates; tag identifies the asset
+UPSERT_FIELDS = ['name', 'category', 'assigned_to', 'location', 'purchase_date', 'purchase_cost', 'status']
+
+# Called with the inserted asset rows after every successful write
+InsertHook = Callable[[List[dict]], Awaitable[None]]
+# Called with (old row, new row) pairs after every successful update
+UpdateHook = Callable[[List[Tuple[dict, dict]]], Awaitable[None]]
+# Called with the report so far before each batch is read; returning False stops the import
+BatchHook = Callable[["ImportReport"], Awaitable[bool]]
+
+
+class ImportReport:
+    """Running totals for an import; keeps at most max_errors error rows."""
+
+    def __init__(self, max_errors: int = MAX_ERRORS):
+        self.max_errors = max_errors
+        self.success_count = 0
+        self.error_count = 0
+        # success_count split by what happened to the row
+        self.inserted_count = 0
+        self.updated_count = 0
+        self.unchanged_count = 0
+        self.errors: List[dict] = []
+
+    @property
+    def errors_truncated(self) -> bool:
+        return self.error_count > len(self.errors)
+
+    def add_errors(self, errors: List[dict]):
+        self.error_count += len(errors)
+        room = self.max_errors - len(self.errors)
+        if room > 0:
+            self.errors.extend(errors[:room])
+
+
+def chunked(items: list, size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def iter_lines(fileobj: BinaryIO, chunk_size: int = READ_CHUNK_SIZE) -> Iterator[str]:
+    """Decode a binary file as UTF-8 lines, reading chunk_size bytes at a time."""
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    pending = ''
+    while True:
+        chunk = fileobj.read(chunk_size)
+        pending += decoder.decode(chunk, final=not chunk)
+        lines = pending.split('\n')
+        pending = lines.pop()
+        for line in lines:
+            yield line + '\n'
+        if not chunk:
+            break
+    if pending:
+        yield pending
+
+
+def iter_batches(rows: Iterable[dict], size: int) -> Iterator[List[Tuple[int, dict]]]:
+    batch = []
+    for row_num, row in enumerate(rows, start=2):  # Start at 2 because row 1 is headers
+        batch.append((row_num, row))
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def build_asset(row: dict) -> dict:
+    return {
+        "tag": row['tag'].strip(),
+        "name": row['name'].strip(),
+        "category": row['category'].strip(),
+        "assigned_to": row.get('assigned_to', '').strip() or None,
+        "location": row.get('location', '').strip() or None,
+        "purchase_date": row.get('purchase_date', '').strip() or None,
+        "purchase_cost": float(row['purchase_cost']) if row.get('purchase_cost', '').strip() else None,
+        "status": row.get('status', 'Active').strip() or 'Active',
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "updated_at": datetime.now(timezone.utc).isoformat()
+    }
+
+
+def row_error(row_num: int, message: str, row: dict) -> dict:
+    return {"row": row_num, "error": message, "data": row}
+
+
+def same_value(stored: Any, new: Any) -> bool:
+    if stored is None or new is None:
+        return stored is None and new is None
+    if isinstance(new, float):
+        try:
+            return float(stored) == new
+        except (TypeError, ValueError):
+            return False
+    return str(stored) == str(new)
+
+
+def changed_fields(stored: dict, asset: dict, columns: Collection[str]) -> Dict[str, Any]:
+    """Fields of a built asset that differ from the stored row, for the columns the CSV has."""
+    return {field: asset[field] for field in UPSERT_FIELDS
+            if field in columns and not same_value(stored.get(field), asset[field])}
+
+
+def check_required(batch: List[Tuple[int, dict]], errors: List[dict]) -> List[Tuple[int, dict, str]]:
+    """(row number, row, tag) for rows that have every required field."""
+    candidates = []
+    for row_num, row in batch:
+        missing_fields = [field for field in REQUIRED_FIELDS if not (row.get(field) or '').strip()]
+        if missing_fields:
+            errors.append(row_error(row_num, f"Missing required fields: {', '.join(missing_fields)}", row))
+            continue
+        candidates.append((row_num, row, row['tag'].strip()))
+    return candidates
+
+
+async def insert_pending(db: Database, pending: List[Tuple[int, dict, dict]], report: ImportReport,
+                         errors: List[dict], insert_chunk_size: int, on_insert: Optional[InsertHook]):
+    """Insert in bulk; a failed chunk is retried row by row so errors stay per row."""
+    for chunk in chunked(pending, insert_chunk_size):
+        try:
+            inserted = await db.insert_assets([asset_data for _, _, asset_data in chunk])
+            report.success_count += len(chunk)
+            report.inserted_count += len(chunk)
+        except Exception:
+            inserted = []
+            for row_num, row, asset_data in chunk:
+                try:
+                    inserted.append(await db.insert_asset(asset_data))
+                    report.success_count += 1
+                    report.inserted_count += 1
+                except Exception as e:
+                    errors.append(row_error(row_num, f"Database error: {str(e)}", row))
+        if on_insert and inserted:
+            await on_insert(inserted)
+
+
+async def import_batch(db: Database, batch: List[Tuple[int, dict]], report: ImportReport, *,
+                       lookup_chunk_size: int = LOOKUP_CHUNK_SIZE, insert_chunk_size: int = INSERT_CHUNK_SIZE,
+                       on_insert: Optional[InsertHook] = None, on_update: Optional[UpdateHook] = None):
+    errors = []
+
+    # Validate required fields
+    candidates = check_required(batch, errors)
+
+    # Look up tags that already exist, a chunk at a time
+    existing_tags = set()
+    unique_tags = list(dict.fromkeys(tag for _, _, tag in candidates))
+    for chunk in chunked(unique_tags, lookup_chunk_size):
+        existing_tags |= await db.find_existing_asset_tags(chunk)
+
+    # Repeated tags within the batch are reported like tags already in the database
+    pending = []
+    for row_num, row, tag in candidates:
+        if tag in existing_tags:
+            errors.append(row_error(row_num, f"Asset tag '{tag}' already exists", row))
+            continue
+        try:
+            asset_data = build_asset(row)
+        except ValueError as ve:
+            errors.append(row_error(row_num, f"Invalid data format: {str(ve)}", row))
+            continue
+        except Exception as e:
+            errors.append(row_error(row_num, f"Database error: {str(e)}", row))
+            continue
+        existing_tags.add(tag)
+        pending.append((row_num, row, asset_data))
+
+    await insert_pending(db, pending, report, errors, insert_chunk_size, on_insert)
+
+    errors.sort(key=lambda error: error["row"])
+    report.add_errors(errors)
+
+
+async def upsert_batch(db: Database, batch: List[Tuple[int, dict]], report: ImportReport, *,
+                       lookup_chunk_size: int = LOOKUP_CHUNK_SIZE, insert_chunk_size: int = INSERT_CHUNK_SIZE,
+                       on_insert: Optional[InsertHook] = None, on_update: Optional[UpdateHook] = None):
+    errors = []
+    candidates = check_required(batch, errors)
+
+    # Fetch the stored rows for these tags, a chunk at a time
+    stored = {}
+    unique_tags = list(dict.fromkeys(tag for _, _, tag in candidates))
+    for chunk in chunked(unique_tags, lookup_chunk_size):
+        stored.update((row["tag"], row) for row in await db.get_assets_by_tags(chunk))
+
+    # Diff each row against the stored asset; new tags are inserted, changed assets updated
+    pending, changed, seen = [], [], set()
+    for row_num, row, tag in candidates:
+        if tag in seen:
+            errors.append(row_error(row_num, f"Asset tag '{tag}' appears more than once in the file", row))
+            continue
+        seen.add(tag)
+        try:
+            asset_data = build_asset(row)
+        except ValueError as ve:
+            errors.append(row_error(row_num, f"Invalid data format: {str(ve)}", row))
+            continue
+        except Exception as e:
+            errors.append(row_error(row_num, f"Database error: {str(e)}", row))
+            continue
+        if tag not in stored:
+            pending.append((row_num, row, asset_data))
+            continue
+        changes = changed_fields(stored[tag], asset_data, row.keys())
+        if not changes:
+            report.success_count += 1
+            report.unchanged_count += 1
+            continue
+        changed.append((row_num, row, stored[tag], {**changes, "updated_at": asset_data["updated_at"]}))
+
+    await insert_pending(db, pending, report, errors, insert_chunk_size, on_insert)
+
+    # Write changed assets in bulk, sending only the changed columns so concurrent writes to the others
+    # (such as a validation) survive; a failed chunk is retried row by row so errors stay per row
+    for chunk in chunked(changed, insert_chunk_size):
+        try:
+            new_rows = await db.update_assets([{"id": old["id"], **update} for _, _, old, update in chunk])
+            by_id = {new["id"]: new for new in new_rows}
+            results = [(row_num, row, old, by_id.get(old["id"])) for row_num, row, old, _ in chunk]
+        except Exception:
+            results = []
+            for row_num, row, old, update in chunk:
+                try:
+                    results.append((row_num, row, old, await db.update_asset(old["id"], update)))
+                except Exception as e:
+                    errors.append(row_error(row_num, f"Database error: {str(e)}", row))
+        updated = []
+        for row_num, row, old, new in results:
+            if new is None:
+                errors.append(row_error(row_num, f"Asset tag '{old['tag']}' was deleted during the import", row))
+            else:
+                updated.append((old, new))
+        report.success_count += len(updated)
+        report.updated_count += len(updated)
+        if on_update and updated:
+            await on_update(updated)
+
+    errors.sort(key=lambda error: error["row"])
+    report.add_errors(errors)
+
+
+BATCH_IMPORTERS = {"insert": import_batch, "upsert": upsert_batch}
+
+
+async def import_assets(db: Database, rows: Iterable[dict], *, mode: str = "insert", batch_rows: int = BATCH_ROWS,
+                        max_errors: int = MAX_ERRORS, **options) -> ImportReport:
+    """Import already-parsed CSV rows."""
+    report = ImportReport(max_errors)
+    for batch in iter_batches(rows, batch_rows):
+        await BATCH_IMPORTERS[mode](db, batch, report, **options)
+    return report
+
+
+def iter_csv_batches(fileobj: BinaryIO, *, read_chunk_size: int = READ_CHUNK_SIZE,
+                     batch_rows: int = BATCH_ROWS) -> Iterator[List[Tuple[int, dict]]]:
+    """Numbered CSV rows from a binary file, batch_rows at a time."""
+    return iter_batches(csv.DictReader(iter_lines(fileobj, read_chunk_size)), batch_rows)
+
+
+async def import_csv_file(db: Database, fileobj: BinaryIO, *, mode: str = "insert",
+                          read_chunk_size: int = READ_CHUNK_SIZE, batch_rows: int = BATCH_ROWS,
+                          max_errors: int = MAX_ERRORS, report: Optional[ImportReport] = None,
+                          on_batch: Optional[BatchHook] = None, **options) -> ImportReport:
+    """Stream a binary CSV file (e.g. an UploadFile spool) into the assets table.
+
+    Totals go to report (a new one by default) as each batch is written, so
+    on_batch can publish progress or stop the import between batches.
+    """
+    if report is None:
+        report = ImportReport(max_errors)
+    batches = iter_csv_batches(fileobj, read_chunk_size=read_chunk_size, batch_rows=batch_rows)
+    while True:
+        if on_batch is not None and not await on_batch(report):
+            break
+        # Reading and parsing happen off the event loop, one batch at a time
+        batch = await asyncio.to_thread(next, batches, None)
+        if batch is None:
+            break
+        await BATCH_IMPORTERS[mode](db, batch, report, **options)
+    return report
@@ -0,0 +1,216 @@
+"""
+Lookup caches for hot read paths
+
+LocalCache is a per-process LRU with a TTL; it also remembers misses (None)
+for a shorter negative TTL. SharedCache keeps entries in a key-value store
+shared by every worker so invalidations are seen everywhere: Redis in
+production, or MemoryKV, an in-process stand-in with the same interface.
+Pick one with CACHE_BACKEND=local|redis|memory.
+
+Both skip a fill whose load raced an invalidation. LocalCache counts
+invalidations; SharedCache gives every deleted key a fresh random version
+and stores the version that was current before the load alongside the
+value, so an entry filled from a read older than the delete never matches
+and is treated as a miss.
+"""
+
+import json
+import os
+import secrets
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from metrics import Counter
+
+cache_hits = Counter("cache_hits_total", "Cache lookups answered from the cache", ["cache"])
+cache_misses = Counter("cache_misses_total", "Cache lookups that went to the database", ["cache"])
+cache_evictions = Counter("cache_evictions_total", "Entries evicted to stay within the size limit", ["cache"])
+
+
+class LocalCache:
+    def __init__(self, name: str, maxsize: int, ttl: float, negative_ttl: float):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._invalidations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    async def get(self, key: str) -> Tuple[bool, Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return False, None
+        self._entries.move_to_end(key)
+        return True, value
+
+    async def set(self, key: str, value: Any):
+        ttl = self.ttl if value is not None else self.negative_ttl
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            cache_evictions.inc(cache=self.name)
+
+    async def delete(self, *keys: str):
+        self._invalidations += 1
+        for key in keys:
+            self._entries.pop(key, None)
+
+    async def get_or_load(self, key: str, loader: Callable[[str], Awaitable[Any]]) -> Any:
+        hit, value = await self.get(key)
+        if hit:
+            cache_hits.inc(cache=self.name)
+            return value
+        cache_misses.inc(cache=self.name)
+        generation = self._invalidations
+        value = await loader(key)
+        # Skip the fill if a write invalidated entries while we were loading
+        if generation == self._invalidations:
+            await self.set(key, value)
+        return value
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "local", "size": len(self._entries), "maxsize": self.maxsize, "ttl": self.ttl}
+
+
+class MemoryKV:
+    """In-process stand-in for the subset of the Redis API SharedCache uses."""
+
+    def __init__(self):
+        self._data: Dict[str, Tuple[Optional[float], str]] = {}
+
+    async def get(self, key: str) -> Optional[str]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at is not None and expires_at < time.monotonic():
+            del self._data[key]
+            return None
+        return value
+
+    async def mget(self, *keys: str) -> List[Optional[str]]:
+        return [await self.get(key) for key in keys]
+
+    async def set(self, key: str, value: str, ex: Optional[float] = None, nx: bool = False) -> bool:
+        if nx and await self.get(key) is not None:
+            return False
+        self._data[key] = (time.monotonic() + ex if ex else None, value)
+        return True
+
+    async def incr(self, key: str) -> int:
+        value = int(await self.get(key) or 0) + 1
+        self._data[key] = (None, str(value))
+        return value
+
+    async def delete(self, *keys: str) -> int:
+        return sum(1 for key in keys if self._data.pop(key, None) is not None)
+
+    async def aclose(self):
+        pass
+
+
+class SharedCache:
+    def __init__(self, name: str, client, ttl: float, negative_ttl: float):
+        self.name = name
+        self.client = client
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.prefix = f"cache:{name}:"
+        self.version_prefix = f"cache-version:{name}:"
+        # Versions outlive every entry stored under the one they replaced
+        self.version_ttl = max(1, int(2 * max(ttl, negative_ttl)))
+
+    async def _get(self, key: str) -> Tuple[bool, Any, Optional[str]]:
+        # One round trip for the entry and the key's current version
+        raw, version = await self.client.mget(self.prefix + key, self.version_prefix + key)
+        if raw is None:
+            return False, None, version
+        entry = json.loads(raw)
+        if entry["version"] != version:
+            return False, None, version
+        return True, entry["value"], version
+
+    async def _set(self, key: str, value: Any, version: Optional[str]):
+        ttl = self.ttl if value is not None else self.negative_ttl
+        await self.client.set(self.prefix + key, json.dumps({"version": version, "value": value}),
+                              ex=max(1, int(ttl)))
+
+    async def get(self, key: str) -> Tuple[bool, Any]:
+        hit, value, _ = await self._get(key)
+        return hit, value
+
+    async def set(self, key: str, value: Any):
+        await self._set(key, value, await self.client.get(self.version_prefix + key))
+
+    async def delete(self, *keys: str):
+        if keys:
+            for key in keys:
+                await self.client.set(self.version_prefix + key, secrets.token_hex(8), ex=self.version_ttl)
+            await self.client.delete(*(self.prefix + key for key in keys))
+
+    async def get_or_load(self, key: str, loader: Callable[[str], Awaitable[Any]]) -> Any:
+        hit, value, version = await self._get(key)
+        if hit:
+            cache_hits.inc(cache=self.name)
+            return value
+        cache_misses.inc(cache=self.name)
+        value = await loader(key)
+        # Stored under the version read before the load: if a write invalidated the key
+        # meanwhile, the entry no longer matches and the next lookup loads again
+        await self._set(key, value, version)
+        return value
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": type(self.client).__name__, "ttl": self.ttl}
+
+
+_shared_clients: Dict[str, Any] = {}
+
+
+def shared_client(backend: str):
+    # One connection pool (or stand-in store) per process, shared by every cache
+    if backend not in _shared_clients:
+        if backend == "redis":
+            try:
+                import redis.asyncio as redis
+            except ImportError:
+                raise ValueError("CACHE_BACKEND=redis requires the 'redis' package")
+            _shared_clients[backend] = redis.from_url(
+                os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0"), decode_responses=True
+            )
+        else:
+            _shared_clients[backend] = MemoryKV()
+    return _shared_clients[backend]
+
+
+def cache_backend() -> Tuple[str, Any]:
+    """The CACHE_BACKEND setting and its shared client (None for local), for every factory that follows it."""
+    backend = os.getenv("CACHE_BACKEND", "local")
+    if backend == "local":
+        return backend, None
+    if backend in ("redis", "memory"):
+        return backend, shared_client(backend)
+    raise ValueError("CACHE_BACKEND must be 'local', 'redis' or 'memory'")
+
+
+def create_cache(name: str, *, maxsize: int, ttl: float, negative_ttl: float):
+    _, client = cache_backend()
+    if client is None:
+        return LocalCache(name, maxsize, ttl, negative_ttl)
+    return SharedCache(name, client, ttl, negative_ttl)
+
+
+async def close_shared_clients():
+    while _shared_clients:
+        _, client = _shared_clients.popitem()
+        close = getattr(client, "aclose", None) or client.close
+        await close()
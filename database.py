@@ -0,0 +1,471 @@
+"""
+Async data-access layer for the Asset Validation API
+
+Every query the API makes goes through the Database interface below.
+SupabaseDatabase talks to Supabase's PostgREST endpoint over a single pooled,
+keep-alive HTTP client; SQLiteDatabase (sqlite_database.py) keeps the same
+tables in a local SQLite file or in memory so the API can run and be
+benchmarked offline. DB_BACKEND=supabase|sqlite|memory picks one, wrapped in
+InstrumentedDatabase so every call is counted and timed for /metrics.
+Handlers await these methods, so a slow query never blocks the event loop.
+"""
+
+import abc
+import functools
+import os
+import re
+import time
+from typing import Any, Dict, List, Optional, Set
+
+import httpx
+from postgrest import AsyncPostgrestClient
+from postgrest.exceptions import APIError
+from postgrest.types import ReturnMethod
+
+import metrics
+
+USER_PUBLIC_COLUMNS = "id, username, email, role, created_at"
+USER_PRINCIPAL_COLUMNS = "id, username, email, role"
+ASSET_COLUMNS = (
+    "id", "tag", "name", "category", "assigned_to", "location", "purchase_date", "purchase_cost", "status",
+    "last_audit", "last_auditor", "audit_status", "audit_notes", "created_at", "updated_at",
+)
+ASSET_LIST_ORDER = ("name", "id")
+AUDIT_EVENT_ORDER = ("audited_at", "id")  # newest first
+
+UNIQUE_VIOLATION = "23505"  # PostgreSQL error code
+
+
+class UniqueViolation(Exception):
+    """A write hit a unique constraint; `column` names the duplicated column when the backend says."""
+
+    def __init__(self, column: Optional[str] = None):
+        super().__init__(f"Duplicate value for {column or 'a unique column'}")
+        self.column = column
+
+
+def quote(value: Any) -> str:
+    """Quote a value for use inside a PostgREST logic tree such as or=(...)."""
+    text = str(value).replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{text}"'
+
+
+def where_any(query, *conditions: str):
+    # postgrest-py has no or_(); add the raw or=(...) parameter instead
+    query.params = query.params.add("or", f"({','.join(conditions)})")
+    return query
+
+
+def keyset_after(columns, values, descending: bool = False) -> List[str]:
+    """Conditions for rows sorting strictly after values on ascending (or descending) columns."""
+    operator = "lt" if descending else "gt"
+    conditions = []
+    for i, column in enumerate(columns):
+        equal = [f"{previous}.eq.{quote(value)}" for previous, value in zip(columns[:i], values)]
+        after = f"{column}.{operator}.{quote(values[i])}"
+        conditions.append(f"and({','.join(equal + [after])})" if equal else after)
+    return conditions
+
+
+class _PooledPostgrestClient(AsyncPostgrestClient):
+    """AsyncPostgrestClient whose httpx session uses our pool limits."""
+
+    def __init__(self, base_url: str, *, headers: Dict[str, str], timeout: float,
+                 limits: httpx.Limits, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self._limits = limits
+        self._transport = transport
+        super().__init__(base_url, headers=headers, timeout=timeout)
+
+    def create_session(self, base_url, headers, timeout):
+        return httpx.AsyncClient(
+            base_url=base_url,
+            headers=headers,
+            timeout=timeout,
+            limits=self._limits,
+            transport=self._transport,
+        )
+
+
+class Database(abc.ABC):
+    """Async queries against the `users`, `assets` and `audit_events` tables.
+
+    Inserts and updates raise UniqueViolation when they would duplicate a
+    username, email or asset tag; updates return None for a missing row and
+    deletes return the rows they removed. Every query is abstract, so a
+    backend that misses one fails when it is created, not on first use.
+    """
+
+    async def aclose(self):
+        pass
+
+    # Users
+    @abc.abstractmethod
+    async def get_user_by_username(self, username: str) -> Optional[dict]:
+        ...
+
+    @abc.abstractmethod
+    async def get_principal(self, username: str) -> Optional[dict]:
+        """The USER_PRINCIPAL_COLUMNS of a user."""
+
+    @abc.abstractmethod
+    async def get_user_by_email(self, email: str) -> Optional[dict]:
+        ...
+
+    @abc.abstractmethod
+    async def get_user_by_id(self, user_id: int) -> Optional[dict]:
+        ...
+
+    @abc.abstractmethod
+    async def list_users(self) -> List[dict]:
+        """The USER_PUBLIC_COLUMNS of every user."""
+
+    @abc.abstractmethod
+    async def insert_user(self, data: Dict[str, Any]) -> Optional[dict]:
+        ...
+
+    @abc.abstractmethod
+    async def update_user(self, user_id: int, data: Dict[str, Any]) -> Optional[dict]:
+        ...
+
+    @abc.abstractmethod
+    async def delete_user(self, user_id: int) -> List[dict]:
+        ...
+
+    # Assets
+    @abc.abstractmethod
+    async def get_active_asset_by_tag(self, tag: str) -> Optional[dict]:
+        ...
+
+    @abc.abstractmethod
+    async def get_asset_by_tag(self, tag: str) -> Optional[dict]:
+        ...
+
+    @abc.abstractmethod
+    async def get_asset_by_id(self, asset_id: int) -> Optional[dict]:
+        ...
+
+    @abc.abstractmethod
+    async def get_assets_by_ids(self, asset_ids: List[int], columns: str = "*") -> List[dict]:
+        ...
+
+    @abc.abstractmethod
+    async def get_assets_by_tags(self, tags: List[str], columns: str = "*") -> List[dict]:
+        ...
+
+    @abc.abstractmethod
+    async def list_assets(self, filters: Dict[str, Any], *, columns: str = "*", limit: Optional[int] = None,
+                          after: Optional[List[Any]] = None) -> List[dict]:
+        """Assets matching every non-None filter, ordered by (name, id), starting after the `after` sort key."""
+
+    @abc.abstractmethod
+    async def search_assets(self, q: str) -> List[dict]:
+        """Assets whose name, tag or category contains q, ignoring case."""
+
+    @abc.abstractmethod
+    async def insert_asset(self, data: Dict[str, Any]) -> Optional[dict]:
+        ...
+
+    @abc.abstractmethod
+    async def find_existing_asset_tags(self, tags: List[str]) -> Set[str]:
+        ...
+
+    @abc.abstractmethod
+    async def insert_assets(self, rows: List[Dict[str, Any]]) -> List[dict]:
+        """Insert every row or, on any error, none of them."""
+
+    @abc.abstractmethod
+    async def update_assets(self, rows: List[Dict[str, Any]]) -> List[dict]:
+        """Update each asset by `id`, setting only the other keys of its row, in one statement.
+
+        Returns the updated rows; ids that no longer exist are skipped, never inserted.
+        """
+
+    @abc.abstractmethod
+    async def update_asset(self, asset_id: int, data: Dict[str, Any]) -> Optional[dict]:
+        ...
+
+    @abc.abstractmethod
+    async def update_asset_audit(self, asset_id: int, data: Dict[str, Any]) -> Optional[dict]:
+        """Set an asset's audit columns; the updated row also carries the `previous_audit_status`."""
+
+    @abc.abstractmethod
+    async def delete_asset(self, asset_id: int) -> List[dict]:
+        ...
+
+    # Audit events
+    @abc.abstractmethod
+    async def insert_audit_events(self, rows: List[Dict[str, Any]]):
+        ...
+
+    @abc.abstractmethod
+    async def list_audit_events(self, *, asset_id: Optional[int] = None, auditor: Optional[str] = None,
+                                since: Optional[str] = None, until: Optional[str] = None,
+                                limit: Optional[int] = None, after: Optional[List[Any]] = None) -> List[dict]:
+        """Audit events newest first, in [since, until), starting after the `after` sort key."""
+
+
+class SupabaseDatabase(Database):
+    """The tables behind Supabase's PostgREST API."""
+
+    def __init__(self, url: str, key: str, *, max_connections: int = 20,
+                 max_keepalive: int = 10, keepalive_expiry: float = 30.0,
+                 timeout: float = 30.0, transport: Optional[httpx.AsyncBaseTransport] = None):
+        headers = {
+            "apiKey": key,
+            "Authorization": f"Bearer {key}",
+        }
+        limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.client = _PooledPostgrestClient(
+            f"{url}/rest/v1", headers=headers, timeout=timeout, limits=limits, transport=transport
+        )
+
+    def table(self, name: str):
+        return self.client.table(name)
+
+    @staticmethod
+    async def _write(query):
+        """Execute a write, turning a unique_violation into UniqueViolation."""
+        try:
+            return await query.execute()
+        except APIError as e:
+            if e.code != UNIQUE_VIOLATION:
+                raise
+            # details reads "Key (tag)=(AST-1) already exists."
+            match = re.search(r"Key \((\w+)\)=", e.details or "")
+            raise UniqueViolation(match.group(1) if match else None) from e
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    # Users
+    async def get_user_by_username(self, username: str) -> Optional[dict]:
+        result = await self.table("users").select("*").eq("username", username).execute()
+        return result.data[0] if result.data else None
+
+    async def get_principal(self, username: str) -> Optional[dict]:
+        result = await self.table("users").select(USER_PRINCIPAL_COLUMNS).eq("username", username).execute()
+        return result.data[0] if result.data else None
+
+    async def get_user_by_email(self, email: str) -> Optional[dict]:
+        result = await self.table("users").select("*").eq("email", email).execute()
+        return result.data[0] if result.data else None
+
+    async def get_user_by_id(self, user_id: int) -> Optional[dict]:
+        result = await self.table("users").select("*").eq("id", user_id).execute()
+        return result.data[0] if result.data else None
+
+    async def list_users(self) -> List[dict]:
+        result = await self.table("users").select(USER_PUBLIC_COLUMNS).execute()
+        return result.data
+
+    async def insert_user(self, data: Dict[str, Any]) -> Optional[dict]:
+        result = await self._write(self.table("users").insert(data))
+        return result.data[0] if result.data else None
+
+    async def update_user(self, user_id: int, data: Dict[str, Any]) -> Optional[dict]:
+        result = await self._write(self.table("users").update(data).eq("id", user_id))
+        return result.data[0] if result.data else None
+
+    async def delete_user(self, user_id: int) -> List[dict]:
+        result = await self.table("users").delete().eq("id", user_id).execute()
+        return result.data
+
+    # Assets
+    async def get_active_asset_by_tag(self, tag: str) -> Optional[dict]:
+        result = await self.table("assets").select("*").eq("tag", tag).eq("status", "Active").execute()
+        return result.data[0] if result.data else None
+
+    async def get_asset_by_tag(self, tag: str) -> Optional[dict]:
+        result = await self.table("assets").select("*").eq("tag", tag).execute()
+        return result.data[0] if result.data else None
+
+    async def get_asset_by_id(self, asset_id: int) -> Optional[dict]:
+        result = await self.table("assets").select("*").eq("id", asset_id).execute()
+        return result.data[0] if result.data else None
+
+    async def get_assets_by_ids(self, asset_ids: List[int], columns: str = "*") -> List[dict]:
+        result = await self.table("assets").select(columns).in_("id", asset_ids).execute()
+        return result.data
+
+    async def get_assets_by_tags(self, tags: List[str], columns: str = "*") -> List[dict]:
+        result = await self.table("assets").select(columns).in_("tag", tags).execute()
+        return result.data
+
+    async def list_assets(self, filters: Dict[str, Any], *, columns: str = "*", limit: Optional[int] = None,
+                          after: Optional[List[Any]] = None) -> List[dict]:
+        query = self.table("assets").select(columns)
+        for column, value in filters.items():
+            if value is not None:
+                query = query.eq(column, value)
+        if after:
+            query = where_any(query, *keyset_after(ASSET_LIST_ORDER, after))
+        # One order parameter listing both columns
+        query = query.order(",".join(ASSET_LIST_ORDER))
+        if limit:
+            query = query.limit(limit)
+        result = await query.execute()
+        return result.data
+
+    # Audit events
+    async def insert_audit_events(self, rows: List[Dict[str, Any]]):
+        await self.table("audit_events").insert(rows, returning=ReturnMethod.minimal).execute()
+
+    async def list_audit_events(self, *, asset_id: Optional[int] = None, auditor: Optional[str] = None,
+                                since: Optional[str] = None, until: Optional[str] = None,
+                                limit: Optional[int] = None, after: Optional[List[Any]] = None) -> List[dict]:
+        query = self.table("audit_events").select("*")
+        if asset_id is not None:
+            query = query.eq("asset_id", asset_id)
+        if auditor is not None:
+            query = query.eq("auditor", auditor)
+        if since is not None:
+            query = query.gte("audited_at", since)
+        if until is not None:
+            query = query.lt("audited_at", until)
+        if after:
+            query = where_any(query, *keyset_after(AUDIT_EVENT_ORDER, after, descending=True))
+        # One order parameter, every column descending
+        query.params = query.params.add("order", ",".join(f"{column}.desc" for column in AUDIT_EVENT_ORDER))
+        if limit:
+            query = query.limit(limit)
+        result = await query.execute()
+        return result.data
+
+    async def search_assets(self, q: str) -> List[dict]:
+        # Try full-text search first, fallback to basic search
+        try:
+            result = await self.table("assets").select("*").text_search("search_vector", q).execute()
+        except Exception:
+            # Fallback to basic search using ilike
+            pattern = quote(f"*{q}*")
+            result = await where_any(
+                self.table("assets").select("*"),
+                f"name.ilike.{pattern}", f"tag.ilike.{pattern}", f"category.ilike.{pattern}",
+            ).execute()
+        return result.data
+
+    async def insert_asset(self, data: Dict[str, Any]) -> Optional[dict]:
+        result = await self._write(self.table("assets").insert(data))
+        return result.data[0] if result.data else None
+
+    async def find_existing_asset_tags(self, tags: List[str]) -> Set[str]:
+        result = await self.table("assets").select("tag").in_("tag", tags).execute()
+        return {row["tag"] for row in result.data}
+
+    async def insert_assets(self, rows: List[Dict[str, Any]]) -> List[dict]:
+        result = await self._write(self.table("assets").insert(rows))
+        return result.data
+
+    async def update_assets(self, rows: List[Dict[str, Any]]) -> List[dict]:
+        # The update_assets function from SETUP.md: one UPDATE ... FROM jsonb_array_elements(rows)
+        result = await self._write(self.client.rpc("update_assets", {"rows": rows}))
+        return result.data
+
+    async def update_asset(self, asset_id: int, data: Dict[str, Any]) -> Optional[dict]:
+        result = await self._write(self.table("assets").update(data).eq("id", asset_id))
+        return result.data[0] if result.data else None
+
+    async def update_asset_audit(self, asset_id: int, data: Dict[str, Any]) -> Optional[dict]:
+        # The update_asset_audit function from SETUP.md: the update and the old status in one call
+        result = await self._write(self.client.rpc("update_asset_audit", {"asset_id": asset_id, "audit": data}))
+        return result.data[0] if result.data else None
+
+    async def delete_asset(self, asset_id: int) -> List[dict]:
+        result = await self.table("assets").delete().eq("id", asset_id).execute()
+        return result.data
+
+
+# (table, operation) each Database method is reported under in the metrics
+DB_OPERATIONS = {
+    "get_user_by_username": ("users", "select"),
+    "get_principal": ("users", "select"),
+    "get_user_by_email": ("users", "select"),
+    "get_user_by_id": ("users", "select"),
+    "list_users": ("users", "select"),
+    "insert_user": ("users", "insert"),
+    "update_user": ("users", "update"),
+    "delete_user": ("users", "delete"),
+    "get_active_asset_by_tag": ("assets", "select"),
+    "get_asset_by_tag": ("assets", "select"),
+    "get_asset_by_id": ("assets", "select"),
+    "get_assets_by_ids": ("assets", "select"),
+    "get_assets_by_tags": ("assets", "select"),
+    "list_assets": ("assets", "select"),
+    "search_assets": ("assets", "search"),
+    "insert_asset": ("assets", "insert"),
+    "find_existing_asset_tags": ("assets", "select"),
+    "insert_assets": ("assets", "insert"),
+    "update_assets": ("assets", "update"),
+    "update_asset": ("assets", "update"),
+    "update_asset_audit": ("assets", "update"),
+    "delete_asset": ("assets", "delete"),
+    "insert_audit_events": ("audit_events", "insert"),
+    "list_audit_events": ("audit_events", "select"),
+}
+
+
+def _timed(name: str, table: str, operation: str):
+    # updated=() leaves out the abstract marker of the Database method
+    @functools.wraps(getattr(Database, name), updated=())
+    async def timed(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            result = await getattr(self.inner, name)(*args, **kwargs)
+        except Exception:
+            metrics.db_call(table, operation, time.perf_counter() - started, failed=True)
+            raise
+        metrics.db_call(table, operation, time.perf_counter() - started)
+        return result
+    return timed
+
+
+def _instrumented(cls):
+    """Give cls a timed method, calling the same one on self.inner, for every entry of DB_OPERATIONS."""
+    for name, (table, operation) in DB_OPERATIONS.items():
+        setattr(cls, name, _timed(name, table, operation))
+    return abc.update_abstractmethods(cls)
+
+
+@_instrumented
+class InstrumentedDatabase(Database):
+    """Records the latency, errors and per-request count of every call to the wrapped database."""
+
+    def __init__(self, inner: Database):
+        self.inner = inner
+
+    def __getattr__(self, name: str):
+        # Backend-specific attributes (such as SupabaseDatabase.table) pass through untimed
+        return getattr(self.inner, name)
+
+    async def aclose(self):
+        await self.inner.aclose()
+
+
+def create_database(transport: Optional[httpx.AsyncBaseTransport] = None) -> Database:
+    backend = os.getenv("DB_BACKEND", "supabase")
+    if backend in ("sqlite", "memory"):
+        from sqlite_database import SQLiteDatabase
+        path = os.getenv("SQLITE_PATH", "assets.db") if backend == "sqlite" else ":memory:"
+        return InstrumentedDatabase(SQLiteDatabase(path))
+    if backend != "supabase":
+        raise ValueError("DB_BACKEND must be 'supabase', 'sqlite' or 'memory'")
+
+    supabase_url = os.getenv("SUPABASE_URL")
+    supabase_key = os.getenv("SUPABASE_KEY")
+
+    if not supabase_url or not supabase_key:
+        raise ValueError("SUPABASE_URL and SUPABASE_KEY environment variables are required")
+
+    return InstrumentedDatabase(SupabaseDatabase(
+        supabase_url,
+        supabase_key,
+        max_connections=int(os.getenv("DB_MAX_CONNECTIONS", "20")),
+        max_keepalive=int(os.getenv("DB_MAX_KEEPALIVE", "10")),
+        keepalive_expiry=float(os.getenv("DB_KEEPALIVE_EXPIRY", "30")),
+        timeout=float(os.getenv("DB_TIMEOUT", "30")),
+        transport=transport,
+    ))
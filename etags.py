@@ -0,0 +1,115 @@
+"""
+Conditional GETs for polled read endpoints
+
+Each table has a change version that the write endpoints bump. A response's
+ETag is a hash of the version of every table it reads plus the request path
+and query, so an unchanged table means an unchanged ETag and a matching
+If-None-Match is answered with 304 before the database is queried.
+
+Versions live with the caches: per process with CACHE_BACKEND=local, or in
+the shared store otherwise so a write on one worker changes the ETags served
+by all of them. Per-process versions cannot see another worker's writes, so
+unless CACHE_BACKEND=redis no ETags are sent with WEB_CONCURRENCY above 1. Every version starts from a random
+value so ETags issued before a restart (or a flush of the shared store) are
+not reused.
+
+Responses served from a worker's in-memory view (the dashboard aggregates)
+also hash the view's generation: the view can lag the table version until
+its next rebuild, and the ETag has to change when the view catches up.
+"""
+
+import hashlib
+import os
+import secrets
+from typing import Dict, Iterable, Optional
+
+from fastapi import Request, Response
+
+from cache import cache_backend
+
+CONTENT_ENCODINGS = ("gzip", "br")
+
+
+def _random_start() -> int:
+    return secrets.randbits(48)
+
+
+class LocalVersions:
+    def __init__(self, etags: bool = True):
+        # False when other workers write too, so these versions would miss their changes
+        self.etags = etags
+        self._versions: Dict[str, int] = {}
+
+    async def get(self, table: str) -> int:
+        return self._versions.setdefault(table, _random_start())
+
+    async def bump(self, *tables: str):
+        for table in tables:
+            self._versions[table] = await self.get(table) + 1
+
+
+class SharedVersions:
+    def __init__(self, client, etags: bool = True):
+        self.client = client
+        self.etags = etags
+
+    async def get(self, table: str) -> int:
+        key = f"version:{table}"
+        value = await self.client.get(key)
+        if value is None:
+            await self.client.set(key, str(_random_start()), nx=True)
+            value = await self.client.get(key)
+        return int(value)
+
+    async def bump(self, *tables: str):
+        for table in tables:
+            # Seed first so a bump never restarts the count from 1
+            await self.get(table)
+            await self.client.incr(f"version:{table}")
+
+
+def create_versions():
+    backend, client = cache_backend()
+    # Only redis is shared between workers; the memory stand-in is per process like local
+    single_worker = int(os.getenv("WEB_CONCURRENCY", "1")) <= 1
+    if client is None:
+        return LocalVersions(etags=single_worker)
+    return SharedVersions(client, etags=backend == "redis" or single_worker)
+
+
+def compute_etag(request: Request, versions) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    for version in versions:
+        digest.update(f"{version}:".encode())
+    digest.update(request.url.path.encode())
+    digest.update(b"?")
+    digest.update(str(request.query_params).encode())
+    return f'"{digest.hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    # If-None-Match uses weak comparison, so W/"x" matches "x"; compressed
+    # representations carry the encoding as a suffix ("x-gzip")
+    candidates = [candidate.strip().removeprefix("W/") for candidate in if_none_match.split(",")]
+    return "*" in candidates or any(
+        candidate == etag or candidate in (f'{etag[:-1]}-{encoding}"' for encoding in CONTENT_ENCODINGS)
+        for candidate in candidates
+    )
+
+
+async def conditional(request: Request, response: Response, table_versions, *tables: str,
+                      generations: Iterable[int] = ()) -> Optional[Response]:
+    """Set the ETag on response; return a 304 response when the client already has it.
+
+    generations are the generations of the in-memory views the response is served from.
+    """
+    if not table_versions.etags:
+        return None
+    etag = compute_etag(request, [*[await table_versions.get(table) for table in tables], *generations])
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
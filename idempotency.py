@@ -0,0 +1,310 @@
+"""
+Idempotency keys for retried writes
+
+A client that may retry a POST (a scanner on flaky Wi-Fi, a re-sent CSV
+upload) sends an `Idempotency-Key` header. The first request with a key runs
+normally and its response is stored for IDEMPOTENCY_TTL seconds; a retry with
+the same key gets that response back (`Idempotent-Replayed: true`) without
+touching the database, and a retry that arrives while the first is still
+running waits for it instead of running twice. Keys are scoped to the
+caller (the `sub` claim of their token) and path, and reusing a key with a
+different request body is refused with 422. Server errors (5xx) and
+responses that depend on the moment rather than the request (401, 403, 409,
+429) are not stored, so the retry runs again.
+
+The request body is hashed as it arrives and spooled to a temporary file
+(in memory up to IDEMPOTENCY_SPOOL_BYTES) for the app to read, so a large
+CSV upload is never held in memory whole.
+
+LocalIdempotencyStore keeps responses in a per-process LRU of at most
+IDEMPOTENCY_MAX_KEYS entries; SharedIdempotencyStore keeps them in the
+shared key-value store (Redis, or the in-process stand-in) so retries that
+land on another worker are replayed too. The backend follows CACHE_BACKEND.
+"""
+
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import tempfile
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from cache import cache_backend
+from metrics import Counter
+
+IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL", "86400"))
+IDEMPOTENCY_MAX_KEYS = int(os.getenv("IDEMPOTENCY_MAX_KEYS", "10000"))
+IDEMPOTENCY_LOCK_SECONDS = float(os.getenv("IDEMPOTENCY_LOCK_SECONDS", "300"))
+IDEMPOTENCY_SPOOL_BYTES = int(os.getenv("IDEMPOTENCY_SPOOL_BYTES", str(1024 * 1024)))
+
+IDEMPOTENCY_HEADER = "idempotency-key"
+MAX_KEY_LENGTH = 255
+POLL_SECONDS = 0.05
+REPLAY_CHUNK_SIZE = 64 * 1024
+# Refusals a retry may get past: expired or missing credentials, a conflict, a rate limit
+UNSTORED_STATUSES = frozenset({401, 403, 409, 429})
+
+idempotent_requests = Counter(
+    "idempotent_requests_total", "Requests carrying an Idempotency-Key, by outcome", ["outcome"]
+)
+
+
+class IdempotencyTimeout(Exception):
+    """The request holding the key did not finish within the lock time."""
+
+
+class LocalIdempotencyStore:
+    def __init__(self, maxsize: int = IDEMPOTENCY_MAX_KEYS, ttl: float = IDEMPOTENCY_TTL,
+                 lock_seconds: float = IDEMPOTENCY_LOCK_SECONDS):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.lock_seconds = lock_seconds
+        self._records: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()
+        self._in_flight: Dict[str, asyncio.Future] = {}
+
+    def _get(self, key: str) -> Optional[dict]:
+        entry = self._records.get(key)
+        if entry is None:
+            return None
+        expires_at, record = entry
+        if expires_at < time.monotonic():
+            del self._records[key]
+            return None
+        self._records.move_to_end(key)
+        return record
+
+    async def begin(self, key: str) -> Optional[dict]:
+        """The stored response for key, or None when the caller now holds the key and must call finish()."""
+        deadline = time.monotonic() + self.lock_seconds
+        while True:
+            record = self._get(key)
+            if record is not None:
+                return record
+            in_flight = self._in_flight.get(key)
+            if in_flight is None:
+                self._in_flight[key] = asyncio.get_running_loop().create_future()
+                return None
+            try:
+                await asyncio.wait_for(asyncio.shield(in_flight), deadline - time.monotonic())
+            except asyncio.TimeoutError:
+                raise IdempotencyTimeout(key)
+
+    async def finish(self, key: str, record: Optional[dict]):
+        """Store the response (None: nothing worth replaying) and wake requests waiting on the key."""
+        if record is not None:
+            self._records[key] = (time.monotonic() + self.ttl, record)
+            self._records.move_to_end(key)
+            while len(self._records) > self.maxsize:
+                self._records.popitem(last=False)
+        in_flight = self._in_flight.pop(key, None)
+        if in_flight is not None and not in_flight.done():
+            in_flight.set_result(None)
+
+    def stats(self) -> dict:
+        return {"backend": "local", "size": len(self._records), "maxsize": self.maxsize,
+                "in_flight": len(self._in_flight), "ttl": self.ttl}
+
+
+class SharedIdempotencyStore:
+    def __init__(self, client, ttl: float = IDEMPOTENCY_TTL, lock_seconds: float = IDEMPOTENCY_LOCK_SECONDS):
+        self.client = client
+        self.ttl = ttl
+        self.lock_seconds = lock_seconds
+        self.prefix = "idempotency:"
+
+    async def _get(self, key: str) -> Optional[dict]:
+        raw = await self.client.get(self.prefix + key)
+        if raw is None:
+            return None
+        record = json.loads(raw)
+        record["body"] = base64.b64decode(record["body"])
+        return record
+
+    async def begin(self, key: str) -> Optional[dict]:
+        """The stored response for key, or None when the caller now holds the key and must call finish()."""
+        deadline = time.monotonic() + self.lock_seconds
+        lock = self.prefix + key + ":lock"
+        while True:
+            record = await self._get(key)
+            if record is not None:
+                return record
+            # The lock expires on its own if the worker holding it dies
+            if await self.client.set(lock, "1", ex=max(1, int(self.lock_seconds)), nx=True):
+                # The holder may have stored its response and released the lock since the read above
+                record = await self._get(key)
+                if record is not None:
+                    await self.client.delete(lock)
+                return record
+            if time.monotonic() >= deadline:
+                raise IdempotencyTimeout(key)
+            await asyncio.sleep(POLL_SECONDS)
+
+    async def finish(self, key: str, record: Optional[dict]):
+        """Store the response (None: nothing worth replaying) and release the key to waiting requests."""
+        if record is not None:
+            stored = dict(record, body=base64.b64encode(record["body"]).decode("ascii"))
+            await self.client.set(self.prefix + key, json.dumps(stored), ex=max(1, int(self.ttl)))
+        await self.client.delete(self.prefix + key + ":lock")
+
+    def stats(self) -> dict:
+        return {"backend": type(self.client).__name__, "ttl": self.ttl}
+
+
+def create_idempotency_store():
+    _, client = cache_backend()
+    if client is None:
+        return LocalIdempotencyStore()
+    return SharedIdempotencyStore(client)
+
+
+class Fingerprint:
+    """Identifies the request a key was first used with, hashed a body chunk at a time.
+
+    Multipart boundaries differ between retries, so they are left out of the hash.
+    """
+
+    def __init__(self, scope: Scope):
+        content_type = Headers(scope=scope).get("content-type", "")
+        _, _, boundary = content_type.partition("boundary=")
+        self.boundary = boundary.strip('"').encode("latin-1")
+        self.digest = hashlib.sha256()
+        for part in (scope["method"].encode(), scope["path"].encode(), scope.get("query_string", b"")):
+            self.digest.update(hashlib.sha256(part).digest())
+        self.body = hashlib.sha256()
+        # Tail of the body that may hold the start of a boundary split across chunks
+        self.pending = b""
+
+    def update(self, chunk: bytes):
+        if not self.boundary:
+            self.body.update(chunk)
+            return
+        data = self.pending + chunk
+        # Anything from here on could still be the start of a boundary
+        cut = len(data) - len(self.boundary) + 1
+        start = 0
+        while True:
+            found = data.find(self.boundary, start)
+            if found == -1:
+                break
+            self.body.update(data[start:found])
+            start = found + len(self.boundary)
+        if start < cut:
+            self.body.update(data[start:cut])
+        self.pending = data[max(start, cut):]
+
+    def hexdigest(self) -> str:
+        body = self.body.copy()
+        body.update(self.pending)
+        digest = self.digest.copy()
+        digest.update(body.digest())
+        return digest.hexdigest()
+
+
+class IdempotencyMiddleware:
+    """Applies Idempotency-Key to POST requests for the given paths.
+
+    get_caller returns the verified subject of the request's credentials, or None
+    when there are none; such requests pass through and are refused by the app.
+    """
+
+    def __init__(self, app: ASGIApp, paths: Iterable[str], get_store: Callable[[], object],
+                 get_caller: Callable[[Scope], Optional[str]]):
+        self.app = app
+        self.paths = set(paths)
+        self.get_store = get_store
+        self.get_caller = get_caller
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        key = caller = None
+        if scope["type"] == "http" and scope["method"] == "POST" and scope["path"] in self.paths:
+            key = Headers(scope=scope).get(IDEMPOTENCY_HEADER)
+            if key:
+                caller = self.get_caller(scope)
+        if not key or caller is None:
+            await self.app(scope, receive, send)
+            return
+        if len(key) > MAX_KEY_LENGTH:
+            await JSONResponse({"detail": f"Idempotency-Key must be at most {MAX_KEY_LENGTH} characters"},
+                               status_code=400)(scope, receive, send)
+            return
+
+        # Hash the body as it arrives and spool it for the app to read back
+        spool = tempfile.SpooledTemporaryFile(max_size=IDEMPOTENCY_SPOOL_BYTES)
+        try:
+            request_fingerprint = Fingerprint(scope)
+            while True:
+                message = await receive()
+                if message["type"] != "http.request":
+                    return
+                chunk = message.get("body", b"")
+                request_fingerprint.update(chunk)
+                spool.write(chunk)
+                if not message.get("more_body", False):
+                    break
+            spool.seek(0)
+            await self._handle(scope, receive, send, f"{caller}:{scope['path']}:{key}",
+                               request_fingerprint.hexdigest(), spool)
+        finally:
+            spool.close()
+
+    async def _handle(self, scope: Scope, receive: Receive, send: Send, store_key: str,
+                      request_fingerprint: str, spool):
+        store = self.get_store()
+        try:
+            record = await store.begin(store_key)
+        except IdempotencyTimeout:
+            idempotent_requests.inc(outcome="in_progress")
+            await JSONResponse({"detail": "A request with this Idempotency-Key is still in progress"},
+                               status_code=409)(scope, receive, send)
+            return
+
+        if record is not None:
+            if record["fingerprint"] != request_fingerprint:
+                idempotent_requests.inc(outcome="mismatch")
+                await JSONResponse({"detail": "Idempotency-Key was already used for a different request"},
+                                   status_code=422)(scope, receive, send)
+                return
+            idempotent_requests.inc(outcome="replayed")
+            headers = [(name.encode("latin-1"), value.encode("latin-1")) for name, value in record["headers"]]
+            await send({"type": "http.response.start", "status": record["status"],
+                        "headers": headers + [(b"idempotent-replayed", b"true")]})
+            await send({"type": "http.response.body", "body": record["body"]})
+            return
+
+        idempotent_requests.inc(outcome="executed")
+        body_sent = False
+
+        async def receive_spooled() -> Message:
+            nonlocal body_sent
+            if not body_sent:
+                chunk = spool.read(REPLAY_CHUNK_SIZE)
+                body_sent = len(chunk) < REPLAY_CHUNK_SIZE
+                return {"type": "http.request", "body": chunk, "more_body": not body_sent}
+            return await receive()
+
+        response = {"status": 500, "headers": [], "body": []}
+
+        async def send_and_capture(message: Message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["headers"] = [(name.decode("latin-1"), value.decode("latin-1"))
+                                       for name, value in message.get("headers", [])]
+            elif message["type"] == "http.response.body":
+                response["body"].append(message.get("body", b""))
+            await send(message)
+
+        record = None
+        try:
+            await self.app(scope, receive_spooled, send_and_capture)
+            if response["status"] < 500 and response["status"] not in UNSTORED_STATUSES:
+                record = {"fingerprint": request_fingerprint, "status": response["status"],
+                          "headers": response["headers"], "body": b"".join(response["body"])}
+        finally:
+            await store.finish(store_key, record)
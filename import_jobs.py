@@ -0,0 +1,292 @@
+"""
+Background CSV imports
+
+POST /admin/imports copies the upload to a temporary file and answers with
+a job id straight away; ImportJobs then streams the file through bulk_import
+a batch at a time. At most IMPORT_JOBS_MAX_RUNNING jobs run at once (later
+ones wait queued), at most IMPORT_JOBS_MAX_QUEUED are queued or running in
+total, and each admin may have IMPORT_JOBS_PER_ADMIN of them. After every
+batch a job updates its progress: rows processed out of the lines counted
+while copying the upload, rate, ETA and the error rows so far. Cancelling a
+queued job drops it; a running job stops before its next batch and keeps the
+rows it already imported. Finished jobs are kept for IMPORT_JOB_RETENTION
+seconds.
+
+The limits apply per worker. With a shared CACHE_BACKEND every job's latest
+snapshot and any cancel request also go to the shared store, so a status,
+event stream or cancel request can land on any worker.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import BinaryIO, Dict, Optional, Tuple
+
+from bulk_import import ImportReport, InsertHook, UpdateHook, import_csv_file
+from cache import cache_backend
+from database import Database
+from metrics import Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+IMPORT_JOBS_MAX_RUNNING = int(os.getenv("IMPORT_JOBS_MAX_RUNNING", "2"))
+IMPORT_JOBS_MAX_QUEUED = int(os.getenv("IMPORT_JOBS_MAX_QUEUED", "20"))
+IMPORT_JOBS_PER_ADMIN = int(os.getenv("IMPORT_JOBS_PER_ADMIN", "2"))
+IMPORT_JOB_RETENTION = float(os.getenv("IMPORT_JOB_RETENTION", "3600"))
+
+FINISHED = ("completed", "failed", "cancelled")
+
+import_jobs_active = Gauge("import_jobs_active", "Background imports queued or running", ["status"])
+import_jobs_finished = Counter("import_jobs_finished_total", "Background imports finished, by outcome", ["status"])
+
+
+class ImportLimitExceeded(Exception):
+    """Accepting the job would go over a per-admin or global limit."""
+
+
+def copy_counting_rows(source: BinaryIO, target: BinaryIO, chunk_size: int = 1024 * 1024) -> Tuple[int, int]:
+    """Copy a CSV file; returns its size and the number of lines after the header."""
+    size = lines = 0
+    last = b"\n"
+    while True:
+        chunk = source.read(chunk_size)
+        if not chunk:
+            break
+        target.write(chunk)
+        size += len(chunk)
+        lines += chunk.count(b"\n")
+        last = chunk[-1:]
+    if last != b"\n":
+        lines += 1
+    # Quoted fields with line breaks make this an estimate; progress is capped at 1
+    return size, max(lines - 1, 0)
+
+
+class ImportJob:
+    def __init__(self, filename: str, created_by: str, mode: str = "insert"):
+        self.id = uuid.uuid4().hex
+        self.filename = filename
+        self.mode = mode
+        self.created_by = created_by
+        self.status = "queued"
+        self.created_at = datetime.now(timezone.utc).isoformat()
+        self.started_at: Optional[str] = None
+        self.finished_at: Optional[str] = None
+        self.error: Optional[str] = None
+        self.cancel_requested = False
+        self.report = ImportReport()
+        self.total_bytes = 0
+        self.total_rows = 0
+        self.task: Optional[asyncio.Task] = None
+        self._started = 0.0
+        self._elapsed: Optional[float] = None
+        self._finished = 0.0
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED
+
+    def start(self):
+        self.status = "running"
+        self.started_at = datetime.now(timezone.utc).isoformat()
+        self._started = time.monotonic()
+
+    def finish(self, status: str, error: Optional[str] = None):
+        if self.status == "running":
+            self._elapsed = time.monotonic() - self._started
+        self.status = status
+        self.error = error
+        self.finished_at = datetime.now(timezone.utc).isoformat()
+        self._finished = time.monotonic()
+
+    def snapshot(self, include_errors: bool = True) -> dict:
+        processed = self.report.success_count + self.report.error_count
+        if self.status == "completed" or not self.total_rows:
+            progress = 1.0 if self.status == "completed" else 0.0
+        else:
+            progress = min(processed / self.total_rows, 1.0)
+        elapsed = self._elapsed if self._elapsed is not None else (
+            time.monotonic() - self._started if self.status == "running" else 0.0)
+        eta = None
+        if self.status == "running" and 0 < progress < 1:
+            eta = round(elapsed * (1 - progress) / progress, 1)
+        snapshot = {
+            "id": self.id,
+            "status": self.status,
+            "filename": self.filename,
+            "mode": self.mode,
+            "created_by": self.created_by,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "cancel_requested": self.cancel_requested,
+            "total_bytes": self.total_bytes,
+            "total_rows": self.total_rows,
+            "rows_processed": processed,
+            "progress": round(progress, 4),
+            "success_count": self.report.success_count,
+            "error_count": self.report.error_count,
+            "inserted_count": self.report.inserted_count,
+            "updated_count": self.report.updated_count,
+            "unchanged_count": self.report.unchanged_count,
+            "rows_per_second": round(processed / elapsed, 1) if elapsed else 0.0,
+            "elapsed_seconds": round(elapsed, 3),
+            "eta_seconds": eta,
+            "error": self.error,
+        }
+        if include_errors:
+            snapshot["errors"] = self.report.errors
+            snapshot["errors_truncated"] = self.report.errors_truncated
+        return snapshot
+
+
+class ImportJobs:
+    def __init__(self, db: Database, *, on_insert: Optional[InsertHook] = None,
+                 on_update: Optional[UpdateHook] = None, client=None,
+                 max_running: int = IMPORT_JOBS_MAX_RUNNING, max_queued: int = IMPORT_JOBS_MAX_QUEUED,
+                 per_admin: int = IMPORT_JOBS_PER_ADMIN, retention: float = IMPORT_JOB_RETENTION):
+        self.db = db
+        self.on_insert = on_insert
+        self.on_update = on_update
+        # Shared key-value store (see cache.shared_client) that job snapshots are published to, if any
+        self.client = client
+        self.max_running = max_running
+        self.max_queued = max_queued
+        self.per_admin = per_admin
+        self.retention = retention
+        self.jobs: Dict[str, ImportJob] = {}
+        self._slots = asyncio.Semaphore(max_running)
+
+    def _active(self):
+        return [job for job in self.jobs.values() if not job.finished]
+
+    def _prune(self):
+        cutoff = time.monotonic() - self.retention
+        for job_id in [job.id for job in self.jobs.values() if job.finished and job._finished < cutoff]:
+            del self.jobs[job_id]
+
+    async def submit(self, fileobj: BinaryIO, filename: str, created_by: str, mode: str = "insert") -> ImportJob:
+        """Copy the upload aside and queue it; raises ImportLimitExceeded when a limit is reached."""
+        self._prune()
+        active = self._active()
+        if len(active) >= self.max_queued:
+            raise ImportLimitExceeded(f"{self.max_queued} imports are already queued or running")
+        if sum(1 for job in active if job.created_by == created_by) >= self.per_admin:
+            raise ImportLimitExceeded(f"You already have {self.per_admin} imports queued or running")
+
+        # Registered before the copy so it counts towards the limits meanwhile
+        job = ImportJob(filename, created_by, mode)
+        self.jobs[job.id] = job
+        spool = tempfile.TemporaryFile()
+        try:
+            job.total_bytes, job.total_rows = await asyncio.to_thread(copy_counting_rows, fileobj, spool)
+            spool.seek(0)
+        except BaseException:
+            spool.close()
+            del self.jobs[job.id]
+            raise
+        import_jobs_active.inc(status="queued")
+        await self._publish(job)
+        job.task = asyncio.create_task(self._run(job, spool))
+        return job
+
+    async def _run(self, job: ImportJob, spool: BinaryIO):
+        try:
+            async with self._slots:
+                import_jobs_active.dec(status="queued")
+                import_jobs_active.inc(status="running")
+                job.start()
+                stopped = False
+
+                async def before_batch(report: ImportReport) -> bool:
+                    nonlocal stopped
+                    await self._publish(job)
+                    stopped = await self._cancel_requested(job)
+                    return not stopped
+
+                await import_csv_file(self.db, spool, mode=job.mode, report=job.report, on_batch=before_batch,
+                                      on_insert=self.on_insert, on_update=self.on_update)
+                job.finish("cancelled" if stopped else "completed")
+        except asyncio.CancelledError:
+            # Cancelled while queued, or the server is shutting down
+            job.finish("cancelled", None if job.cancel_requested else "Server shut down")
+            if not job.cancel_requested:
+                raise
+        except Exception as e:
+            logger.exception("Import job %s failed", job.id)
+            job.finish("failed", str(e))
+        finally:
+            spool.close()
+            import_jobs_active.dec(status="running" if job.started_at else "queued")
+            import_jobs_finished.inc(status=job.status)
+            try:
+                await self._publish(job)
+            except Exception:
+                logger.warning("Publishing the final state of import job %s failed", job.id, exc_info=True)
+
+    async def _publish(self, job: ImportJob):
+        if self.client is not None:
+            await self.client.set(f"import-job:{job.id}", json.dumps(job.snapshot()),
+                                  ex=max(1, int(self.retention)))
+
+    async def _cancel_requested(self, job: ImportJob) -> bool:
+        if not job.cancel_requested and self.client is not None:
+            job.cancel_requested = await self.client.get(f"import-job:{job.id}:cancel") is not None
+        return job.cancel_requested
+
+    async def get(self, job_id: str, include_errors: bool = True) -> Optional[dict]:
+        job = self.jobs.get(job_id)
+        if job is not None:
+            return job.snapshot(include_errors)
+        if self.client is None:
+            return None
+        raw = await self.client.get(f"import-job:{job_id}")
+        if raw is None:
+            return None
+        snapshot = json.loads(raw)
+        if not include_errors:
+            snapshot.pop("errors", None)
+            snapshot.pop("errors_truncated", None)
+        return snapshot
+
+    async def cancel(self, job_id: str) -> Optional[dict]:
+        """Request cancellation; returns the job's snapshot, or None for an unknown job."""
+        job = self.jobs.get(job_id)
+        if job is None:
+            snapshot = await self.get(job_id)
+            if snapshot is not None and snapshot["status"] not in FINISHED:
+                # Running on another worker, which checks for this before each batch
+                await self.client.set(f"import-job:{job_id}:cancel", "1", ex=max(1, int(self.retention)))
+                snapshot["cancel_requested"] = True
+            return snapshot
+        if not job.finished:
+            job.cancel_requested = True
+            if job.status == "queued" and job.task is not None:
+                job.task.cancel()
+                await asyncio.gather(job.task, return_exceptions=True)
+        return job.snapshot()
+
+    async def stop(self):
+        tasks = [job.task for job in self._active() if job.task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        active = self._active()
+        return {"running": sum(1 for job in active if job.status == "running"),
+                "queued": sum(1 for job in active if job.status == "queued"),
+                "max_running": self.max_running, "max_queued": self.max_queued, "per_admin": self.per_admin,
+                "retained": len(self.jobs)}
+
+
+def create_import_jobs(db: Database, *, on_insert: Optional[InsertHook] = None,
+                       on_update: Optional[UpdateHook] = None) -> ImportJobs:
+    # Local: no shared client, so snapshots and cancels stay in this worker
+    _, client = cache_backend()
+    return ImportJobs(db, on_insert=on_insert, on_update=on_update, client=client)
@@ -1,45 +1,182 @@
-from fastapi import FastAPI, HTTPException, Depends, status, File, UploadFile
+# Taken before the heavy imports so /ready can report the whole import time
+import time
+IMPORT_STARTED = time.perf_counter()
+
+from fastapi import APIRouter, FastAPI, HTTPException, Depends, status, File, UploadFile, Query, Request, Response
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.datastructures import Headers
 from pydantic import BaseModel
 from typing import Optional, List
+import asyncio
+import logging
 import os
+import csv
+import io
+import json
 from datetime import datetime, timedelta, timezone
-import bcrypt
+from contextlib import asynccontextmanager
 from jose import jwt
-from supabase import create_client, Client
+from database import ASSET_COLUMNS, ASSET_LIST_ORDER, AUDIT_EVENT_ORDER, Database, UniqueViolation, create_database
+from pagination import InvalidCursor, decode_cursor, next_cursor
+from passwords import PasswordPool, PasswordPoolBusy, create_password_pool
+from bulk_import import import_csv_file
+from import_jobs import FINISHED, ImportJobs, ImportLimitExceeded, create_import_jobs
+from cache import close_shared_clients, create_cache
+from aggregates import AssetAggregates
+from search import SearchIndex
+from audit_log import AuditLog
+from etags import conditional, create_versions
+from compression import CompressionMiddleware
+from responses import ResponseClass, json_response
+from profiling import ProfileStore, ProfilingMiddleware
+from idempotency import IdempotencyMiddleware, create_idempotency_store
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Shared resources. init_resources() creates them when the app starts (see lifespan), so importing this
+# module needs no configuration and opens no connections.
+db: Optional[Database] = None
+password_pool: Optional[PasswordPool] = None
+asset_aggregates: Optional[AssetAggregates] = None
+search_index: Optional[SearchIndex] = None
+table_versions = None
+audit_log: Optional[AuditLog] = None
+principal_cache = None
+tag_cache = None
+idempotency_store = None
+import_jobs: Optional[ImportJobs] = None
+SECRET_KEY: Optional[str] = None
+
+SUMMARY_COLUMNS = ["status", "category", "location", "audit_status"]
+
+def init_resources(database: Optional[Database] = None):
+    """Create the shared clients, caches and views; pass `database` to use an existing data layer."""
+    global db, password_pool, asset_aggregates, search_index, table_versions, audit_log
+    global principal_cache, tag_cache, idempotency_store, import_jobs, SECRET_KEY
+
+    # JWT settings
+    SECRET_KEY = os.getenv("SECRET_KEY")
+    if not SECRET_KEY:
+        raise ValueError("SECRET_KEY environment variable is required")
+
+    # Supabase data layer (pooled async PostgREST client)
+    db = database or create_database()
+
+    # Bounded worker pool for bcrypt
+    password_pool = create_password_pool()
+
+    # Dashboard rollups maintained by the write endpoints and reconciled in the background
+    asset_aggregates = AssetAggregates(
+        db, SUMMARY_COLUMNS, reconcile_interval=float(os.getenv("AGGREGATE_RECONCILE_SECONDS", "300")),
+        sum_columns=["purchase_cost"],
+    )
 
-app = FastAPI(title="Asset Validation API", version="1.0.0")
+    # Word index for /dashboard/search, maintained the same way
+    search_index = SearchIndex(db, reconcile_interval=float(os.getenv("SEARCH_RECONCILE_SECONDS", "300")))
 
-# CORS middleware
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # Configure this properly in production
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+    # Change versions behind the ETags of polled reads, bumped by every write
+    table_versions = create_versions()
 
-# Supabase client
-supabase_url = os.getenv("SUPABASE_URL")
-supabase_key = os.getenv("SUPABASE_KEY")
+    # Every validation is appended here; writes are batched in the background
+    audit_log = AuditLog(db, on_write=lambda events: table_versions.bump("audit_events"))
 
-if not supabase_url or not supabase_key:
-    raise ValueError("SUPABASE_URL and SUPABASE_KEY environment variables are required")
+    # Authenticated users (id, username, email, role) by username
+    principal_cache = create_cache(
+        "principal",
+        maxsize=int(os.getenv("PRINCIPAL_CACHE_SIZE", "1000")),
+        ttl=float(os.getenv("PRINCIPAL_CACHE_TTL", "60")),
+        negative_ttl=float(os.getenv("PRINCIPAL_CACHE_NEGATIVE_TTL", "5")),
+    )
 
-supabase: Client = create_client(supabase_url, supabase_key)
+    # Scanner hot path: active assets by tag, including misses
+    tag_cache = create_cache(
+        "asset_tag",
+        maxsize=int(os.getenv("TAG_CACHE_SIZE", "10000")),
+        ttl=float(os.getenv("TAG_CACHE_TTL", "30")),
+        negative_ttl=float(os.getenv("TAG_CACHE_NEGATIVE_TTL", "5")),
+    )
+
+    # Stored responses of requests sent with an Idempotency-Key, replayed to retries
+    idempotency_store = create_idempotency_store()
+
+    # CSV imports running in the background, a batch at a time
+    import_jobs = create_import_jobs(db, on_insert=assets_inserted, on_update=assets_updated)
+
+async def close_resources():
+    global db
+    await import_jobs.stop()
+    await asset_aggregates.stop()
+    await search_index.stop()
+    await audit_log.stop()
+    await db.aclose()
+    password_pool.shutdown()
+    await close_shared_clients()
+    db = None
 
-# JWT settings
-SECRET_KEY = os.getenv("SECRET_KEY")
-if not SECRET_KEY:
-    raise ValueError("SECRET_KEY environment variable is required")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
 
+# Bearer token Prometheus must send to /metrics; unset leaves the endpoint open
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+# Batch validation limits
+VALIDATE_BATCH_MAX_ITEMS = int(os.getenv("VALIDATE_BATCH_MAX_ITEMS", "5000"))
+VALIDATE_BATCH_CHUNK = int(os.getenv("VALIDATE_BATCH_CHUNK", "500"))
+
+# Dashboard listing page sizes
+DASHBOARD_PAGE_SIZE = int(os.getenv("DASHBOARD_PAGE_SIZE", "100"))
+DASHBOARD_MAX_PAGE_SIZE = int(os.getenv("DASHBOARD_MAX_PAGE_SIZE", "1000"))
+EXPORT_PAGE_SIZE = int(os.getenv("EXPORT_PAGE_SIZE", "1000"))
+SEARCH_PAGE_SIZE = int(os.getenv("SEARCH_PAGE_SIZE", "50"))
+SEARCH_MAX_PAGE_SIZE = int(os.getenv("SEARCH_MAX_PAGE_SIZE", "500"))
+
+# Seconds between progress events on /admin/imports/{id}/events
+IMPORT_JOB_EVENT_SECONDS = float(os.getenv("IMPORT_JOB_EVENT_SECONDS", "1"))
+
 security = HTTPBearer()
 
+# Startup timings and readiness; /ready answers 503 until warm_up() has finished
+startup = {"ready": False, "import_seconds": None, "startup_seconds": None, "warmup_seconds": None}
+
+async def warm_up():
+    """Build the in-memory views and start the password workers before reporting ready."""
+    started = time.perf_counter()
+    results = await asyncio.gather(asset_aggregates.ensure_built(), search_index.ensure_built(),
+                                   password_pool.warm_up(), return_exceptions=True)
+    for result in results:
+        if isinstance(result, Exception):
+            # Requests still work without a warm view; they fall back to the database
+            logger.warning("Warm-up step failed: %r", result)
+    startup["warmup_seconds"] = round(time.perf_counter() - started, 3)
+    startup["ready"] = True
+    metrics.app_startup_seconds.set(startup["warmup_seconds"], phase="warmup")
+    metrics.app_ready.set(1)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if db is None:
+        init_resources()
+    asset_aggregates.start()
+    search_index.start()
+    audit_log.start()
+    warm_up_task = asyncio.create_task(warm_up())
+    startup["startup_seconds"] = round(time.perf_counter() - IMPORT_STARTED, 3)
+    metrics.app_startup_seconds.set(startup["startup_seconds"], phase="startup")
+    try:
+        yield
+    finally:
+        warm_up_task.cancel()
+        startup["ready"] = False
+        metrics.app_ready.set(0)
+        await close_resources()
+
+router = APIRouter()
+
 # Root endpoint
-@app.get("/")
+@router.get("/")
 async def root():
     return {
         "message": "Asset Validation API",
@@ -50,10 +187,25 @@ async def root():
     }
 
 # Health check endpoint
-@app.get("/health")
+@router.get("/health")
 async def health_check():
     return {"status": "healthy", "timestamp": datetime.now(timezone.utc).isoformat()}
 
+# Readiness probe: 200 once warm-up has finished
+@router.get("/ready")
+async def readiness():
+    return JSONResponse(
+        {"status": "ready" if startup["ready"] else "warming_up", **startup},
+        status_code=200 if startup["ready"] else 503,
+    )
+
+# Prometheus scrape endpoint
+@router.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics(request: Request):
+    if METRICS_TOKEN and request.headers.get("authorization") != f"Bearer {METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 # Pydantic models
 class UserCreate(BaseModel):
     username: str
@@ -103,17 +255,95 @@ class AssetValidation(BaseModel):
     auditstatus: str
     invalidreason: Optional[str] = None
 
+class QueuedAssetValidation(AssetValidation):
+    scanned_at: Optional[datetime] = None  # When the device recorded an offline scan
+
+class AssetValidationBatch(BaseModel):
+    validations: List[QueuedAssetValidation]
+
 class BulkImportResponse(BaseModel):
     success_count: int
     error_count: int
     errors: List[dict]
+    errors_truncated: bool = False
+    inserted_count: int = 0
+    updated_count: int = 0
+    unchanged_count: int = 0
 
 # Helper functions
-def hash_password(password: str) -> str:
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+async def hash_password(password: str) -> str:
+    try:
+        return await password_pool.hash(password)
+    except PasswordPoolBusy as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+
+async def verify_password(password: str, hashed: str) -> bool:
+    try:
+        return await password_pool.verify(password, hashed)
+    except PasswordPoolBusy as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+
+def as_utc(value: datetime) -> datetime:
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+def audit_update(validation: AssetValidation, audited_at: Optional[datetime] = None) -> dict:
+    now = datetime.now(timezone.utc)
+    return {
+        "last_audit": (audited_at or now).isoformat(),
+        "last_auditor": validation.auditby,
+        "audit_status": validation.auditstatus,
+        "audit_notes": validation.invalidreason,
+        "updated_at": now.isoformat()
+    }
+
+def audit_event(validation: AssetValidation, tag: str, audited_at: datetime) -> dict:
+    return {
+        "asset_id": validation.assetcode,
+        "tag": tag,
+        "auditor": validation.auditby,
+        "empcode": validation.empcode,
+        "audit_status": validation.auditstatus,
+        "audit_notes": validation.invalidreason,
+        "audited_at": audited_at.isoformat(),
+    }
+
+async def invalidate_principals(*usernames: Optional[str]):
+    await principal_cache.delete(*[username for username in usernames if username])
 
-def verify_password(password: str, hashed: str) -> bool:
-    return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+async def invalidate_tags(*tags: Optional[str]):
+    await tag_cache.delete(*[tag for tag in tags if tag])
+
+async def asset_changed(old: Optional[dict], new: Optional[dict]):
+    """Keep caches and aggregates in step with a write to one asset row."""
+    await invalidate_tags(old and old.get("tag"), new and new.get("tag"))
+    await table_versions.bump("assets")
+    asset_aggregates.apply(old, new)
+    search_index.apply(old, new)
+
+# Columns whose old values asset_changed() needs: the tag cache key and everything the aggregates count or sum
+TRACKED_ASSET_COLUMNS = {"tag", "purchase_cost", *SUMMARY_COLUMNS}
+
+# Responses for a write rejected by a unique index, by column
+DUPLICATE_MESSAGES = {"tag": "Asset tag already exists", "username": "Username already exists",
+                      "email": "Email already exists"}
+
+def duplicate(error: UniqueViolation) -> HTTPException:
+    return HTTPException(status_code=400, detail=DUPLICATE_MESSAGES.get(error.column, "Duplicate value"))
+
+async def assets_inserted(assets: List[dict]):
+    await invalidate_tags(*[asset["tag"] for asset in assets])
+    await table_versions.bump("assets")
+    for asset in assets:
+        asset_aggregates.apply(None, asset)
+        search_index.apply(None, asset)
+
+async def assets_updated(changes: List[tuple]):
+    """Like asset_changed() for a batch of (old, new) asset rows."""
+    await invalidate_tags(*[tag for old, new in changes for tag in (old["tag"], new and new["tag"]) if tag])
+    await table_versions.bump("assets")
+    for old, new in changes:
+        asset_aggregates.apply(old, new)
+        search_index.apply(old, new)
 
 def create_access_token(data: dict):
     to_encode = data.copy()
@@ -122,41 +352,79 @@ def create_access_token(data: dict):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
+def requested_fields(fields: Optional[str]) -> List[str]:
+    """Validate a fields= projection; its columns in order, or every column when it is empty."""
+    requested = list(dict.fromkeys(field.strip() for field in (fields or "").split(",") if field.strip()))
+    unknown = [field for field in requested if field not in ASSET_COLUMNS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return requested or list(ASSET_COLUMNS)
+
+def asset_columns(fields: Optional[str]) -> str:
+    """The select list for a fields= projection; the sort key columns are always included."""
+    if not fields:
+        return "*"
+    return ",".join(dict.fromkeys(list(ASSET_LIST_ORDER) + requested_fields(fields)))
+
+def create_user_token(user: dict) -> str:
+    # User id and role travel as signed claims alongside the username
+    return create_access_token(data={"sub": user["username"], "uid": user["id"], "role": user["role"]})
+
+def principal(user: dict) -> dict:
+    return {field: user.get(field) for field in ("id", "username", "email", "role")}
+
+def decode_token(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
     try:
         payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
+        if payload.get("sub") is None:
             raise HTTPException(status_code=401, detail="Invalid token")
-        return username
+        return payload
     except jwt.JWTError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
-def get_current_user(current_user: str = Depends(verify_token)):
+def token_subject(scope) -> Optional[str]:
+    """The `sub` claim of the request's bearer token, or None when it has no valid one."""
+    scheme, _, token = Headers(scope=scope).get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]).get("sub")
+    except jwt.JWTError:
+        return None
+
+def verify_token(claims: dict = Depends(decode_token)) -> str:
+    return claims["sub"]
+
+async def get_current_user(claims: dict = Depends(decode_token)):
     try:
-        user = supabase.table("users").select("*").eq("username", current_user).execute()
-        if not user.data:
+        user = await principal_cache.get_or_load(claims["sub"], db.get_principal)
+        if not user:
             raise HTTPException(status_code=404, detail="User not found")
-        return user.data[0]
+        # A token issued to a deleted account must not carry over to a new user with the same name
+        if "uid" in claims and claims["uid"] != user["id"]:
+            raise HTTPException(status_code=401, detail="Invalid token")
+        return user
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-def require_admin(current_user: dict = Depends(get_current_user)):
+async def require_admin(current_user: dict = Depends(get_current_user)):
     if current_user["role"] != "admin":
         raise HTTPException(status_code=403, detail="Admin access required")
     return current_user
 
 # Auth endpoints
-@app.post("/auth/register", response_model=Token)
+@router.post("/auth/register", response_model=Token)
 async def register(user: UserCreate):
     try:
         # Check if user exists
-        existing_user = supabase.table("users").select("*").eq("username", user.username).execute()
-        if existing_user.data:
+        existing_user = await db.get_user_by_username(user.username)
+        if existing_user:
             raise HTTPException(status_code=400, detail="Username already exists")
         
         # Hash password and create user
-        hashed_password = hash_password(user.password)
+        hashed_password = await hash_password(user.password)
         new_user = {
             "username": user.username,
             "email": user.email,
@@ -165,10 +433,11 @@ async def register(user: UserCreate):
             "created_at": datetime.now(timezone.utc).isoformat()
         }
         
-        result = supabase.table("users").insert(new_user).execute()
+        created_user = await db.insert_user(new_user)
+        await invalidate_principals(user.username)
         
         # Create token
-        access_token = create_access_token(data={"sub": user.username})
+        access_token = create_user_token(created_user)
         
         return {
             "access_token": access_token,
@@ -179,20 +448,24 @@ async def register(user: UserCreate):
                 "role": user.role
             }
         }
+    except HTTPException:
+        raise
+    except UniqueViolation as e:
+        raise duplicate(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/auth/login", response_model=Token)
+@router.post("/auth/login", response_model=Token)
 async def login(user: UserLogin):
     try:
         # Get user from database
-        db_user = supabase.table("users").select("*").eq("username", user.username).execute()
+        user_data = await db.get_user_by_username(user.username)
         
-        if not db_user.data or not verify_password(user.password, db_user.data[0]["password_hash"]):
+        if not user_data or not await verify_password(user.password, user_data["password_hash"]):
             raise HTTPException(status_code=401, detail="Invalid credentials")
         
-        user_data = db_user.data[0]
-        access_token = create_access_token(data={"sub": user.username})
+        access_token = create_user_token(user_data)
+        await principal_cache.set(user_data["username"], principal(user_data))
         
         return {
             "access_token": access_token,
@@ -209,94 +482,301 @@ async def login(user: UserLogin):
         raise HTTPException(status_code=500, detail=str(e))
 
 # Asset endpoints
-@app.get("/assets/tag/{tag}")
-async def get_asset_by_tag(tag: str, current_user: str = Depends(verify_token)):
+@router.get("/assets/tag/{tag}")
+async def get_asset_by_tag(tag: str, request: Request, response: Response, current_user: str = Depends(verify_token)):
     try:
+        not_modified = await conditional(request, response, table_versions, "assets")
+        if not_modified:
+            return not_modified
         # Get asset from unified table
-        asset = supabase.table("assets").select("*").eq("tag", tag).eq("status", "Active").execute()
-        if not asset.data:
+        asset = await tag_cache.get_or_load(tag, db.get_active_asset_by_tag)
+        if not asset:
             raise HTTPException(status_code=404, detail="Asset not found")
         
-        return {"asset": asset.data[0]}
+        return {"asset": asset}
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/assets/validate")
+@router.post("/assets/validate")
 async def validate_asset(validation: AssetValidation, current_user: str = Depends(verify_token)):
     try:
         # Update asset with audit information
-        update_data = {
-            "last_audit": datetime.now(timezone.utc).isoformat(),
-            "last_auditor": validation.auditby,
-            "audit_status": validation.auditstatus,
-            "audit_notes": validation.invalidreason,
-            "updated_at": datetime.now(timezone.utc).isoformat()
-        }
+        audited_at = datetime.now(timezone.utc)
+        update_data = audit_update(validation, audited_at)
         
-        result = supabase.table("assets").update(update_data).eq("id", validation.assetcode).execute()
-        return {"message": "Validation recorded successfully", "data": result.data[0] if result.data else None}
+        # One round trip: the update also returns the audit status it replaced for the summary counts
+        result = await db.update_asset_audit(validation.assetcode, update_data)
+        if result:
+            previous_status = result.pop("previous_audit_status")
+            asset_aggregates.apply({"id": result["id"], "audit_status": previous_status},
+                                   {"id": result["id"], "audit_status": result["audit_status"]})
+            await invalidate_tags(result["tag"])
+            await table_versions.bump("assets")
+            audit_log.record(audit_event(validation, result["tag"], audited_at))
+        return {"message": "Validation recorded successfully", "data": result}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-# Dashboard endpoints
-@app.get("/dashboard/assets")
-async def get_all_assets(category: Optional[str] = None, current_user: str = Depends(verify_token)):
+@router.post("/assets/validate/batch")
+async def validate_assets_batch(batch: AssetValidationBatch, current_user: str = Depends(verify_token)):
+    if len(batch.validations) > VALIDATE_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Batch exceeds {VALIDATE_BATCH_MAX_ITEMS} validations")
     try:
-        query = supabase.table("assets").select("*")
-        if category:
-            query = query.eq("category", category)
+        received_at = datetime.now(timezone.utc)
+        results = [{"index": i, "assetcode": v.assetcode, "status": "superseded"} for i, v in enumerate(batch.validations)]
+        
+        # Keep the latest scan per asset; offline scans are dated by the device, the rest by arrival
+        latest = {}
+        scan_times = []
+        for i, validation in enumerate(batch.validations):
+            scanned_at = min(as_utc(validation.scanned_at or received_at), received_at)
+            scan_times.append(scanned_at)
+            current = latest.get(validation.assetcode)
+            if current is None or scanned_at >= current[1]:
+                latest[validation.assetcode] = (i, scanned_at)
+        
+        # One lookup and one bulk update per chunk of assets
+        asset_ids = list(latest)
+        previous_status = {}
+        tags, failed = {}, set()
+        for start in range(0, len(asset_ids), VALIDATE_BATCH_CHUNK):
+            chunk = asset_ids[start:start + VALIDATE_BATCH_CHUNK]
+            existing = {
+                row["id"]: row for row in await db.get_assets_by_ids(chunk, "id, tag, last_audit, audit_status")
+            }
+            rows = []
+            for asset_id in chunk:
+                i, scanned_at = latest[asset_id]
+                if asset_id not in existing:
+                    results[i]["status"] = "not_found"
+                    continue
+                # An offline scan never overwrites a newer audit already on record
+                tags[asset_id] = existing[asset_id]["tag"]
+                last_audit = existing[asset_id].pop("last_audit")
+                audit_status = existing[asset_id].pop("audit_status")
+                if last_audit and as_utc(datetime.fromisoformat(last_audit)) > scanned_at:
+                    results[i]["status"] = "stale"
+                    continue
+                # Only the audit columns are written, so a concurrent admin edit of the asset survives
+                rows.append({"id": asset_id, **audit_update(batch.validations[i], scanned_at)})
+                previous_status[asset_id] = audit_status
+            if not rows:
+                continue
+            try:
+                updated = {row["id"] for row in await db.update_assets(rows)}
+                # Assets deleted since the lookup are not re-created
+                for row in rows:
+                    if row["id"] not in updated:
+                        results[latest[row["id"]][0]]["status"] = "not_found"
+                        tags.pop(row["id"], None)
+                rows = [row for row in rows if row["id"] in updated]
+                await invalidate_tags(*[tags[row["id"]] for row in rows])
+                await table_versions.bump("assets")
+                for row in rows:
+                    asset_aggregates.apply({"id": row["id"], "audit_status": previous_status[row["id"]]},
+                                           {"id": row["id"], "audit_status": row["audit_status"]})
+                status_value, detail = "recorded", None
+            except Exception as e:
+                status_value, detail = "failed", str(e)
+                failed.update(row["id"] for row in rows)
+            for row in rows:
+                i, _ = latest[row["id"]]
+                results[i]["status"] = status_value
+                results[i]["last_audit"] = row["last_audit"]
+                if detail:
+                    results[i]["detail"] = detail
+        
+        # Every scan of a known asset goes to the audit log, including superseded and stale ones
+        audit_log.record(*[
+            audit_event(validation, tags[validation.assetcode], scan_times[i])
+            for i, validation in enumerate(batch.validations)
+            if validation.assetcode in tags and validation.assetcode not in failed
+        ])
         
-        assets = query.order("name").execute()
-        return {"assets": assets.data}
+        recorded = sum(1 for result in results if result["status"] == "recorded")
+        return {"message": f"{recorded} validations recorded", "recorded": recorded, "results": results}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/dashboard/categories")
-async def get_asset_categories(current_user: str = Depends(verify_token)):
+# Dashboard endpoints
+@router.get("/dashboard/assets")
+async def get_all_assets(
+    request: Request,
+    response: Response,
+    category: Optional[str] = None,
+    asset_status: Optional[str] = Query(None, alias="status"),
+    location: Optional[str] = None,
+    assigned_to: Optional[str] = None,
+    fields: Optional[str] = None,
+    limit: int = Query(DASHBOARD_PAGE_SIZE, ge=1, le=DASHBOARD_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_user: str = Depends(verify_token)
+):
+    columns = asset_columns(fields)
+    try:
+        after = decode_cursor(cursor, len(ASSET_LIST_ORDER))
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     try:
-        # Get unique categories
-        categories = supabase.table("assets").select("category").execute()
-        unique_categories = list(set([item["category"] for item in categories.data if item["category"]]))
-        return {"categories": sorted(unique_categories)}
+        not_modified = await conditional(request, response, table_versions, "assets")
+        if not_modified:
+            return not_modified
+        filters = {"category": category, "status": asset_status, "location": location, "assigned_to": assigned_to}
+        # One extra row tells us whether there is a next page
+        assets = await db.list_assets(filters, columns=columns, limit=limit + 1, after=after)
+        return json_response({"assets": assets[:limit], "next_cursor": next_cursor(assets, limit, list(ASSET_LIST_ORDER))},
+                             response)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/dashboard/audit-history")
-async def get_audit_history(asset_id: Optional[int] = None, current_user: str = Depends(verify_token)):
+async def iter_asset_pages(filters: dict, columns: str):
+    after = None
+    while True:
+        page = await db.list_assets(filters, columns=columns, limit=EXPORT_PAGE_SIZE, after=after)
+        if not page:
+            return
+        yield page
+        if len(page) < EXPORT_PAGE_SIZE:
+            return
+        after = [page[-1][key] for key in ASSET_LIST_ORDER]
+
+async def export_csv(pages, columns: List[str]):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction="ignore")
+    writer.writeheader()
+    async for page in pages:
+        writer.writerows(page)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+async def export_ndjson(pages, columns: List[str]):
+    async for page in pages:
+        yield "".join(json.dumps({column: row.get(column) for column in columns}, default=str) + "\n"
+                      for row in page)
+
+@router.get("/dashboard/assets/export")
+async def export_assets(
+    export_format: str = Query("csv", alias="format", pattern="^(csv|ndjson)$"),
+    category: Optional[str] = None,
+    asset_status: Optional[str] = Query(None, alias="status"),
+    location: Optional[str] = None,
+    assigned_to: Optional[str] = None,
+    fields: Optional[str] = None,
+    current_user: str = Depends(verify_token)
+):
+    # The query also selects the sort key for paging; the export holds only the requested fields
+    output_columns = requested_fields(fields)
+    filters = {"category": category, "status": asset_status, "location": location, "assigned_to": assigned_to}
+    # Rows are fetched a page at a time and written out as each page arrives
+    pages = iter_asset_pages(filters, asset_columns(fields))
+    if export_format == "ndjson":
+        return StreamingResponse(export_ndjson(pages, output_columns), media_type="application/x-ndjson",
+                                 headers={"Content-Disposition": "attachment; filename=assets.ndjson"})
+    return StreamingResponse(export_csv(pages, output_columns), media_type="text/csv",
+                             headers={"Content-Disposition": "attachment; filename=assets.csv"})
+
+@router.get("/dashboard/categories")
+async def get_asset_categories(request: Request, response: Response, counts: bool = False,
+                               current_user: str = Depends(verify_token)):
     try:
-        query = supabase.table("assets").select("id, tag, name, category, assigned_to, last_audit, last_auditor, audit_status, audit_notes")
-        if asset_id:
-            query = query.eq("id", asset_id)
-        
-        assets = query.order("last_audit", desc=True).execute()
-        return {"audit_history": assets.data}
+        # Served from the maintained category counts, not a table scan
+        await asset_aggregates.ensure_built()
+        not_modified = await conditional(request, response, table_versions, "assets",
+                                         generations=[asset_aggregates.generation])
+        if not_modified:
+            return not_modified
+        category_counts = asset_aggregates.counts("category")
+        categories = sorted(category_counts)
+        if counts:
+            return {"categories": categories, "counts": {category: category_counts[category] for category in categories}}
+        return {"categories": categories}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/dashboard/summary")
+async def get_dashboard_summary(request: Request, response: Response, current_user: str = Depends(verify_token)):
+    try:
+        # Rollups come from the maintained aggregates, so this never touches the assets table
+        await asset_aggregates.ensure_built()
+        not_modified = await conditional(request, response, table_versions, "assets",
+                                         generations=[asset_aggregates.generation])
+        if not_modified:
+            return not_modified
+        summary = {"total_assets": asset_aggregates.total,
+                   "total_purchase_cost": round(asset_aggregates.sum("purchase_cost"), 2)}
+        for column in SUMMARY_COLUMNS:
+            summary[f"by_{column}"] = dict(sorted(asset_aggregates.counts(column).items()))
+        return summary
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/dashboard/audit-history")
+async def get_audit_history(
+    request: Request,
+    response: Response,
+    asset_id: Optional[int] = None,
+    auditor: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: int = Query(DASHBOARD_PAGE_SIZE, ge=1, le=DASHBOARD_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_user: str = Depends(verify_token),
+):
+    try:
+        after = decode_cursor(cursor, len(AUDIT_EVENT_ORDER))
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        # A matching ETag is answered without writing anything; otherwise make
+        # this worker's buffered events visible before reading
+        not_modified = await conditional(request, response, table_versions, "audit_events")
+        if not_modified:
+            return not_modified
+        await audit_log.flush()
+        events = await db.list_audit_events(
+            asset_id=asset_id,
+            auditor=auditor,
+            since=as_utc(since).isoformat() if since else None,
+            until=as_utc(until).isoformat() if until else None,
+            limit=limit + 1,
+            after=after,
+        )
+        return json_response({"audit_history": events[:limit], "next_cursor": next_cursor(events, limit, AUDIT_EVENT_ORDER)},
+                             response)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/dashboard/search")
-async def search_assets(q: str, current_user: str = Depends(verify_token)):
+@router.get("/dashboard/search")
+async def search_assets(
+    q: str,
+    limit: int = Query(SEARCH_PAGE_SIZE, ge=1, le=SEARCH_MAX_PAGE_SIZE),
+    offset: int = Query(0, ge=0),
+    current_user: str = Depends(verify_token),
+):
     try:
-        # Try full-text search first, fallback to basic search
-        try:
-            assets = supabase.table("assets").select("*").text_search("search_vector", q).execute()
-        except:
-            # Fallback to basic search using ilike
-            assets = supabase.table("assets").select("*").or_(f"name.ilike.%{q}%,tag.ilike.%{q}%,category.ilike.%{q}%").execute()
-        return {"assets": assets.data}
+        if search_index.ready:
+            # Rank in memory, then fetch just this page of rows
+            asset_ids, total = search_index.search(q, limit, offset)
+            rows = {row["id"]: row for row in await db.get_assets_by_ids(asset_ids)} if asset_ids else {}
+            assets = [rows[asset_id] for asset_id in asset_ids if asset_id in rows]
+        else:
+            # Index still building: fall back to the database
+            matches = await db.search_assets(q)
+            total, assets = len(matches), matches[offset:offset + limit]
+        next_offset = offset + limit if offset + limit < total else None
+        return json_response({"assets": assets, "total": total, "next_offset": next_offset})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 # Admin Asset Management Endpoints
-@app.post("/admin/assets")
+@router.post("/admin/assets")
 async def create_asset(asset: AssetCreate, admin_user: dict = Depends(require_admin)):
     try:
-        # Check if asset tag already exists
-        existing_asset = supabase.table("assets").select("*").eq("tag", asset.tag).execute()
-        if existing_asset.data:
-            raise HTTPException(status_code=400, detail="Asset tag already exists")
-        
         new_asset = {
             "tag": asset.tag,
             "name": asset.name,
@@ -310,49 +790,55 @@ async def create_asset(asset: AssetCreate, admin_user: dict = Depends(require_ad
             "updated_at": datetime.now(timezone.utc).isoformat()
         }
         
-        result = supabase.table("assets").insert(new_asset).execute()
-        return {"message": "Asset created successfully", "asset": result.data[0]}
+        # The unique index on tag rejects duplicates; no pre-check round trip
+        result = await db.insert_asset(new_asset)
+        await asset_changed(None, result)
+        return {"message": "Asset created successfully", "asset": result}
     except HTTPException:
         raise
+    except UniqueViolation as e:
+        raise duplicate(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.put("/admin/assets/{asset_id}")
+@router.put("/admin/assets/{asset_id}")
 async def update_asset(asset_id: int, asset: AssetUpdate, admin_user: dict = Depends(require_admin)):
     try:
-        # Check if asset exists
-        existing_asset = supabase.table("assets").select("*").eq("id", asset_id).execute()
-        if not existing_asset.data:
-            raise HTTPException(status_code=404, detail="Asset not found")
-        
-        # Check if new tag already exists (if tag is being updated)
-        if asset.tag and asset.tag != existing_asset.data[0]["tag"]:
-            tag_check = supabase.table("assets").select("*").eq("tag", asset.tag).execute()
-            if tag_check.data:
-                raise HTTPException(status_code=400, detail="Asset tag already exists")
-        
         # Build update data
         update_data = {"updated_at": datetime.now(timezone.utc).isoformat()}
         for field, value in asset.dict(exclude_unset=True).items():
             if value is not None:
                 update_data[field] = value
         
-        result = supabase.table("assets").update(update_data).eq("id", asset_id).execute()
-        return {"message": "Asset updated successfully", "asset": result.data[0]}
+        # The aggregates and tag cache need the old values of the columns they track; other
+        # edits are a single write, and the unique index on tag rejects duplicates
+        existing_asset = None
+        if TRACKED_ASSET_COLUMNS & update_data.keys():
+            existing_asset = await db.get_asset_by_id(asset_id)
+            if not existing_asset:
+                raise HTTPException(status_code=404, detail="Asset not found")
+        
+        result = await db.update_asset(asset_id, update_data)
+        if not result:
+            raise HTTPException(status_code=404, detail="Asset not found")
+        # Untracked columns only: the new row stands in for the old one
+        await asset_changed(existing_asset or result, result)
+        return {"message": "Asset updated successfully", "asset": result}
     except HTTPException:
         raise
+    except UniqueViolation as e:
+        raise duplicate(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.delete("/admin/assets/{asset_id}")
+@router.delete("/admin/assets/{asset_id}")
 async def delete_asset(asset_id: int, admin_user: dict = Depends(require_admin)):
     try:
-        # Check if asset exists
-        existing_asset = supabase.table("assets").select("*").eq("id", asset_id).execute()
-        if not existing_asset.data:
+        # The delete returns the removed row, if there was one
+        deleted = await db.delete_asset(asset_id)
+        if not deleted:
             raise HTTPException(status_code=404, detail="Asset not found")
-        
-        result = supabase.table("assets").delete().eq("id", asset_id).execute()
+        await asset_changed(deleted[0], None)
         return {"message": "Asset deleted successfully"}
     except HTTPException:
         raise
@@ -360,29 +846,19 @@ async def delete_asset(asset_id: int, admin_user: dict = Depends(require_admin))
         raise HTTPException(status_code=500, detail=str(e))
 
 # Admin User Management Endpoints
-@app.get("/admin/users")
+@router.get("/admin/users")
 async def list_users(admin_user: dict = Depends(require_admin)):
     try:
-        users = supabase.table("users").select("id, username, email, role, created_at").execute()
-        return {"users": users.data}
+        users = await db.list_users()
+        return {"users": users}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/admin/users")
+@router.post("/admin/users")
 async def create_user(user: UserCreate, admin_user: dict = Depends(require_admin)):
     try:
-        # Check if user exists
-        existing_user = supabase.table("users").select("*").eq("username", user.username).execute()
-        if existing_user.data:
-            raise HTTPException(status_code=400, detail="Username already exists")
-        
-        # Check if email exists
-        existing_email = supabase.table("users").select("*").eq("email", user.email).execute()
-        if existing_email.data:
-            raise HTTPException(status_code=400, detail="Email already exists")
-        
-        # Hash password and create user
-        hashed_password = hash_password(user.password)
+        # Hash password and create user; unique indexes reject a taken username or email
+        hashed_password = await hash_password(user.password)
         new_user = {
             "username": user.username,
             "email": user.email,
@@ -391,161 +867,119 @@ async def create_user(user: UserCreate, admin_user: dict = Depends(require_admin
             "created_at": datetime.now(timezone.utc).isoformat()
         }
         
-        result = supabase.table("users").insert(new_user).execute()
+        user_data = await db.insert_user(new_user)
+        await invalidate_principals(user.username)
         
         # Return user without password hash
-        user_data = result.data[0]
         user_data.pop("password_hash", None)
         
         return {"message": "User created successfully", "user": user_data}
     except HTTPException:
         raise
+    except UniqueViolation as e:
+        raise duplicate(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.put("/admin/users/{user_id}")
+@router.put("/admin/users/{user_id}")
 async def update_user(user_id: int, user: UserUpdate, admin_user: dict = Depends(require_admin)):
     try:
-        # Check if user exists
-        existing_user = supabase.table("users").select("*").eq("id", user_id).execute()
-        if not existing_user.data:
-            raise HTTPException(status_code=404, detail="User not found")
-        
-        # Check if new username already exists (if username is being updated)
-        if user.username and user.username != existing_user.data[0]["username"]:
-            username_check = supabase.table("users").select("*").eq("username", user.username).execute()
-            if username_check.data:
-                raise HTTPException(status_code=400, detail="Username already exists")
-        
-        # Check if new email already exists (if email is being updated)
-        if user.email and user.email != existing_user.data[0]["email"]:
-            email_check = supabase.table("users").select("*").eq("email", user.email).execute()
-            if email_check.data:
-                raise HTTPException(status_code=400, detail="Email already exists")
+        # A rename must also drop the cached principal under the old username
+        existing_user = None
+        if user.username:
+            existing_user = await db.get_user_by_id(user_id)
+            if not existing_user:
+                raise HTTPException(status_code=404, detail="User not found")
         
-        # Build update data
+        # Build update data; unique indexes reject a taken username or email
         update_data = {"updated_at": datetime.now(timezone.utc).isoformat()}
         for field, value in user.dict(exclude_unset=True).items():
             if value is not None:
                 if field == "password":
-                    update_data["password_hash"] = hash_password(value)
+                    update_data["password_hash"] = await hash_password(value)
                 else:
                     update_data[field] = value
         
-        result = supabase.table("users").update(update_data).eq("id", user_id).execute()
+        user_data = await db.update_user(user_id, update_data)
+        if not user_data:
+            raise HTTPException(status_code=404, detail="User not found")
+        await invalidate_principals(existing_user and existing_user["username"], user_data["username"])
         
         # Return user without password hash
-        user_data = result.data[0]
         user_data.pop("password_hash", None)
         
         return {"message": "User updated successfully", "user": user_data}
     except HTTPException:
         raise
+    except UniqueViolation as e:
+        raise duplicate(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.delete("/admin/users/{user_id}")
+@router.delete("/admin/users/{user_id}")
 async def delete_user(user_id: int, admin_user: dict = Depends(require_admin)):
     try:
-        # Check if user exists
-        existing_user = supabase.table("users").select("*").eq("id", user_id).execute()
-        if not existing_user.data:
-            raise HTTPException(status_code=404, detail="User not found")
-        
         # Prevent admin from deleting themselves
-        if existing_user.data[0]["username"] == admin_user["username"]:
+        if user_id == admin_user["id"]:
             raise HTTPException(status_code=400, detail="Cannot delete your own account")
         
-        result = supabase.table("users").delete().eq("id", user_id).execute()
+        # The delete returns the removed row, if there was one
+        deleted = await db.delete_user(user_id)
+        if not deleted:
+            raise HTTPException(status_code=404, detail="User not found")
+        await invalidate_principals(deleted[0]["username"])
         return {"message": "User deleted successfully"}
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# Admin Metrics Endpoint
+@router.get("/admin/stats")
+async def get_stats(admin_user: dict = Depends(require_admin)):
+    return {"password_pool": {"workers": password_pool.workers, "queue_limit": password_pool.queue_limit,
+                              "pending": password_pool.pending},
+            "tag_cache": tag_cache.stats(),
+            "principal_cache": principal_cache.stats(),
+            "idempotency": idempotency_store.stats(),
+            "import_jobs": import_jobs.stats(),
+            "metrics": metrics.snapshot()}
+
+# Admin Profiling Endpoints
+@router.get("/admin/profiles")
+async def list_profiles(limit: int = Query(50, ge=1, le=1000), admin_user: dict = Depends(require_admin)):
+    return {"profiles": profile_store.ids()[:limit]}
+
+@router.get("/admin/profiles/{profile_id}")
+async def get_profile(profile_id: str, format: str = Query("json", pattern="^(json|folded)$"),
+                      admin_user: dict = Depends(require_admin)):
+    profile = await asyncio.to_thread(profile_store.load, profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "folded":
+        return PlainTextResponse("\n".join(profile["folded"]) + "\n")
+    return profile
+
 # Admin Bulk Import Endpoint
-@app.post("/admin/assets/bulk-import", response_model=BulkImportResponse)
-async def bulk_import_assets(file: UploadFile = File(...), admin_user: dict = Depends(require_admin)):
+@router.post("/admin/assets/bulk-import", response_model=BulkImportResponse)
+async def bulk_import_assets(file: UploadFile = File(...), mode: str = Query("insert", pattern="^(insert|upsert)$"),
+                             admin_user: dict = Depends(require_admin)):
     try:
-        import csv
-        import io
-        
         if not file.filename.endswith('.csv'):
             raise HTTPException(status_code=400, detail="File must be a CSV")
         
-        # Read CSV content
-        content = await file.read()
-        csv_content = content.decode('utf-8')
-        csv_reader = csv.DictReader(io.StringIO(csv_content))
-        
-        success_count = 0
-        error_count = 0
-        errors = []
-        
-        # Expected CSV columns: tag, name, category, assigned_to, location, purchase_date, purchase_cost, status
-        required_fields = ['tag', 'name', 'category']
-        
-        for row_num, row in enumerate(csv_reader, start=2):  # Start at 2 because row 1 is headers
-            try:
-                # Validate required fields
-                missing_fields = [field for field in required_fields if not row.get(field, '').strip()]
-                if missing_fields:
-                    errors.append({
-                        "row": row_num,
-                        "error": f"Missing required fields: {', '.join(missing_fields)}",
-                        "data": row
-                    })
-                    error_count += 1
-                    continue
-                
-                # Check if asset tag already exists
-                existing_asset = supabase.table("assets").select("*").eq("tag", row['tag'].strip()).execute()
-                if existing_asset.data:
-                    errors.append({
-                        "row": row_num,
-                        "error": f"Asset tag '{row['tag'].strip()}' already exists",
-                        "data": row
-                    })
-                    error_count += 1
-                    continue
-                
-                # Prepare asset data
-                asset_data = {
-                    "tag": row['tag'].strip(),
-                    "name": row['name'].strip(),
-                    "category": row['category'].strip(),
-                    "assigned_to": row.get('assigned_to', '').strip() or None,
-                    "location": row.get('location', '').strip() or None,
-                    "purchase_date": row.get('purchase_date', '').strip() or None,
-                    "purchase_cost": float(row['purchase_cost']) if row.get('purchase_cost', '').strip() else None,
-                    "status": row.get('status', 'Active').strip() or 'Active',
-                    "created_at": datetime.now(timezone.utc).isoformat(),
-                    "updated_at": datetime.now(timezone.utc).isoformat()
-                }
-                
-                # Insert asset
-                result = supabase.table("assets").insert(asset_data).execute()
-                success_count += 1
-                
-            except ValueError as ve:
-                errors.append({
-                    "row": row_num,
-                    "error": f"Invalid data format: {str(ve)}",
-                    "data": row
-                })
-                error_count += 1
-            except Exception as e:
-                errors.append({
-                    "row": row_num,
-                    "error": f"Database error: {str(e)}",
-                    "data": row
-                })
-                error_count += 1
+        # Stream the CSV from the upload spool in batches; upsert updates assets whose tag exists
+        report = await import_csv_file(db, file.file, mode=mode, on_insert=assets_inserted,
+                                       on_update=assets_updated)
         
         return BulkImportResponse(
-            success_count=success_count,
-            error_count=error_count,
-            errors=errors
+            success_count=report.success_count,
+            error_count=report.error_count,
+            errors=report.errors,
+            errors_truncated=report.errors_truncated,
+            inserted_count=report.inserted_count,
+            updated_count=report.updated_count,
+            unchanged_count=report.unchanged_count
         )
         
     except HTTPException:
@@ -553,6 +987,109 @@ async def bulk_import_assets(file: UploadFile = File(...), admin_user: dict = De
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# Admin Background Import Endpoints
+@router.post("/admin/imports", status_code=202)
+async def start_import(file: UploadFile = File(...), mode: str = Query("insert", pattern="^(insert|upsert)$"),
+                       admin_user: dict = Depends(require_admin)):
+    try:
+        if not file.filename.endswith('.csv'):
+            raise HTTPException(status_code=400, detail="File must be a CSV")
+        
+        job = await import_jobs.submit(file.file, file.filename, admin_user["username"], mode)
+        return {"job_id": job.id, "status": job.status, "status_url": f"/admin/imports/{job.id}",
+                "events_url": f"/admin/imports/{job.id}/events"}
+    except HTTPException:
+        raise
+    except ImportLimitExceeded as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "30"})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/admin/imports/{job_id}")
+async def get_import(job_id: str, admin_user: dict = Depends(require_admin)):
+    job = await import_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Import not found")
+    return job
+
+def server_sent_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+async def import_events(job_id: str):
+    """A progress event every IMPORT_JOB_EVENT_SECONDS, then one `done` event with the error rows."""
+    while True:
+        job = await import_jobs.get(job_id, include_errors=False)
+        if job is None:
+            return
+        if job["status"] in FINISHED:
+            yield server_sent_event("done", await import_jobs.get(job_id))
+            return
+        yield server_sent_event("progress", job)
+        await asyncio.sleep(IMPORT_JOB_EVENT_SECONDS)
+
+@router.get("/admin/imports/{job_id}/events")
+async def stream_import(job_id: str, admin_user: dict = Depends(require_admin)):
+    if await import_jobs.get(job_id, include_errors=False) is None:
+        raise HTTPException(status_code=404, detail="Import not found")
+    return StreamingResponse(import_events(job_id), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@router.post("/admin/imports/{job_id}/cancel")
+async def cancel_import(job_id: str, admin_user: dict = Depends(require_admin)):
+    job = await import_jobs.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Import not found")
+    if job["status"] in ("completed", "failed"):
+        raise HTTPException(status_code=409, detail=f"Import has already {job['status']}")
+    return job
+
+# Sampling profiler for requests sent with `X-Profile: 1` by an admin, or PROFILE_SAMPLE_RATE of all requests
+profile_store = ProfileStore()
+
+async def profiling_allowed(scope) -> bool:
+    try:
+        request = Request(scope)
+        claims = decode_token(await security(request))
+        await require_admin(await get_current_user(claims))
+        return True
+    except HTTPException:
+        return False
+
+IDEMPOTENT_PATHS = ("/assets/validate", "/assets/validate/batch", "/admin/assets/bulk-import", "/admin/imports")
+
+def create_app() -> FastAPI:
+    """Build the application; shared resources are created by its lifespan on startup."""
+    app = FastAPI(title="Asset Validation API", version="1.0.0", default_response_class=ResponseClass,
+                  lifespan=lifespan)
+
+    # Retried scanner writes and CSV uploads carrying an Idempotency-Key get the first response back
+    app.add_middleware(IdempotencyMiddleware, paths=IDEMPOTENT_PATHS, get_store=lambda: idempotency_store,
+                       get_caller=token_subject)
+
+    # CORS middleware
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],  # Configure this properly in production
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    # gzip/brotli for responses above COMPRESSION_MIN_SIZE
+    app.add_middleware(CompressionMiddleware)
+
+    app.add_middleware(ProfilingMiddleware, authorize=profiling_allowed, store=profile_store)
+
+    # Request count, latency and database calls per route template, served at /metrics
+    app.add_middleware(metrics.MetricsMiddleware)
+
+    app.include_router(router)
+    return app
+
+app = create_app()
+startup["import_seconds"] = round(time.perf_counter() - IMPORT_STARTED, 3)
+metrics.app_startup_seconds.set(startup["import_seconds"], phase="import")
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
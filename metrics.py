@@ -0,0 +1,232 @@
+"""
+In-process metrics for the Asset Validation API
+
+Minimal counters, gauges and histograms keyed by label values. Everything is
+kept in memory per worker; snapshot() returns a JSON-friendly view of every
+metric and render() the Prometheus text format served at /metrics.
+MetricsMiddleware times every request by route template, and db_call() is
+how the instrumented data layer records each database call.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_registry: List["_Metric"] = []
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(dict(zip(self.labelnames, key)), value) for key, value in self._values.items()]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def samples(self):
+        with self._lock:
+            return [(dict(zip(self.labelnames, key)), value) for key, value in self._values.items()]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket counts, with a last slot for values above every bound
+                state = self._values[key] = [0, 0.0, [0] * (len(self.buckets) + 1)]
+            state[0] += 1
+            state[1] += value
+            state[2][bisect_left(self.buckets, value)] += 1
+
+    def samples(self):
+        with self._lock:
+            values = [(key, count, total, list(buckets)) for key, (count, total, buckets) in self._values.items()]
+        samples = []
+        for key, count, total, buckets in values:
+            cumulative, running = {}, 0
+            for bound, bucket_count in zip(self.buckets, buckets):
+                running += bucket_count
+                cumulative[bound] = running
+            samples.append((dict(zip(self.labelnames, key)), {"count": count, "sum": total, "buckets": cumulative}))
+        return samples
+
+
+def snapshot() -> dict:
+    result = {}
+    for metric in _registry:
+        result[metric.name] = [
+            {"labels": labels, "value": value} for labels, value in metric.samples()
+        ]
+    return result
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels: Dict[str, str], extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(labels.items()) + ([extra] if extra else [])
+    if not items:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in items) + "}"
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+def render() -> str:
+    """Every metric in the Prometheus text exposition format (version 0.0.4)."""
+    lines = []
+    for metric in _registry:
+        help_text = metric.documentation.replace("\\", "\\\\").replace("\n", "\\n")
+        lines.append(f"# HELP {metric.name} {help_text}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for labels, value in metric.samples():
+            if metric.kind != "histogram":
+                lines.append(f"{metric.name}{_labels(labels)} {_number(value)}")
+                continue
+            for bound, count in value["buckets"].items():
+                lines.append(f"{metric.name}_bucket{_labels(labels, ('le', _number(bound)))} {count}")
+            lines.append(f"{metric.name}_bucket{_labels(labels, ('le', '+Inf'))} {value['count']}")
+            lines.append(f"{metric.name}_sum{_labels(labels)} {_number(value['sum'])}")
+            lines.append(f"{metric.name}_count{_labels(labels)} {value['count']}")
+    return "\n".join(lines) + "\n"
+
+
+# Request and data layer metrics
+DB_CALL_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100, 250, 1000)
+
+http_request_seconds = Histogram(
+    "http_request_duration_seconds", "Time to serve a request, by route template", ["method", "route", "status"]
+)
+http_in_flight = Gauge("http_requests_in_flight", "Requests currently being served", ["method"])
+http_request_db_calls = Histogram(
+    "http_request_db_calls", "Database calls made while serving a request", ["method", "route"],
+    buckets=DB_CALL_BUCKETS,
+)
+db_call_seconds = Histogram(
+    "db_call_duration_seconds", "Time spent in database calls", ["table", "operation"]
+)
+db_call_errors = Counter("db_call_errors_total", "Database calls that raised", ["table", "operation"])
+
+# Application lifecycle
+app_ready = Gauge("app_ready", "1 once startup warm-up has finished, 0 before and during shutdown")
+app_startup_seconds = Gauge(
+    "app_startup_seconds", "Seconds from import to the end of each startup phase (warmup: its own duration)", ["phase"]
+)
+
+# [calls, seconds] spent in the database by the current request; a list so tasks spawned by the request share it
+_request_db_usage: ContextVar[Optional[list]] = ContextVar("request_db_usage", default=None)
+
+
+def request_db_usage() -> Tuple[int, float]:
+    """Database calls made, and seconds spent in them, by the current request so far."""
+    usage = _request_db_usage.get()
+    return (usage[0], usage[1]) if usage is not None else (0, 0.0)
+
+
+def db_call(table: str, operation: str, seconds: float, failed: bool = False):
+    db_call_seconds.observe(seconds, table=table, operation=operation)
+    if failed:
+        db_call_errors.inc(table=table, operation=operation)
+    usage = _request_db_usage.get()
+    if usage is not None:
+        usage[0] += 1
+        usage[1] += seconds
+
+
+class MetricsMiddleware:
+    """Times each HTTP request and labels it with the matched route template, not the raw path."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = 500
+        usage = [0, 0.0]
+        token = _request_db_usage.set(usage)
+
+        async def send_with_status(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        http_in_flight.inc(method=method)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            http_in_flight.dec(method=method)
+            _request_db_usage.reset(token)
+            # The router stores the matched route in the scope; unmatched paths share one label
+            route = getattr(scope.get("route"), "path", "unmatched")
+            http_request_seconds.observe(elapsed, method=method, route=route, status=str(status))
+            http_request_db_calls.observe(usage[0], method=method, route=route)
@@ -0,0 +1,43 @@
+"""
+Opaque cursors for keyset pagination
+
+A cursor is the sort key of the last row on a page, JSON-encoded and
+base64url-wrapped so clients treat it as an opaque token.
+"""
+
+import base64
+import json
+from typing import List, Optional
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(values: List) -> str:
+    raw = json.dumps(values, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str], size: int) -> Optional[List]:
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, UnicodeError):
+        raise InvalidCursor("Invalid cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise InvalidCursor("Invalid cursor")
+    # Sort keys are scalars; anything else would reach the query as a bound value
+    if not all(value is None or isinstance(value, (str, int, float)) for value in values):
+        raise InvalidCursor("Invalid cursor")
+    return values
+
+
+def next_cursor(rows: List[dict], limit: int, keys: List[str]) -> Optional[str]:
+    """Cursor for the page after rows, or None when rows was the last page."""
+    if len(rows) <= limit:
+        return None
+    last = rows[limit - 1]
+    return encode_cursor([last[key] for key in keys])
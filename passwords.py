@@ -0,0 +1,110 @@
+"""
+Password hashing off the event loop
+
+bcrypt is deliberately slow (100-300 ms of CPU per call), so hashing and
+verification run on a dedicated, size-limited worker pool. When more than
+PASSWORD_QUEUE_LIMIT jobs are waiting or running, new work is rejected with
+PasswordPoolBusy instead of queueing behind a login storm.
+"""
+
+import asyncio
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+
+import bcrypt
+
+from metrics import Counter, Histogram
+
+PASSWORD_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.2, 0.3, 0.5, 1.0, 2.5, 5.0)
+
+hash_seconds = Histogram(
+    "password_hash_seconds", "Time spent inside bcrypt", ["operation"], buckets=PASSWORD_BUCKETS
+)
+queue_wait_seconds = Histogram(
+    "password_queue_wait_seconds", "Time password jobs waited for a pool worker", ["operation"],
+    buckets=PASSWORD_BUCKETS,
+)
+rejected_total = Counter(
+    "password_rejected_total", "Password jobs rejected because the queue was full", ["operation"]
+)
+
+
+class PasswordPoolBusy(Exception):
+    """Raised when the password pool queue is full."""
+
+
+def _hashpw(password: str):
+    started = time.monotonic()
+    hashed = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    return hashed, started, time.monotonic()
+
+
+def _checkpw(password: str, hashed: str):
+    started = time.monotonic()
+    matches = bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+    return matches, started, time.monotonic()
+
+
+class PasswordPool:
+    def __init__(self, workers: int, queue_limit: int, kind: str = "thread"):
+        if kind not in ("thread", "process"):
+            raise ValueError("PASSWORD_POOL must be 'thread' or 'process'")
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.kind = kind
+        self.pending = 0
+        self._executor: Optional[Executor] = None
+
+    @property
+    def executor(self) -> Executor:
+        # Created on first use so importing the app never forks worker processes
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        return self._executor
+
+    async def _run(self, operation: str, func, *args):
+        if self.pending >= self.queue_limit:
+            rejected_total.inc(operation=operation)
+            raise PasswordPoolBusy("Password service is busy, please retry")
+
+        self.pending += 1
+        try:
+            submitted = time.monotonic()
+            result, started, finished = await asyncio.get_running_loop().run_in_executor(
+                self.executor, func, *args
+            )
+        finally:
+            self.pending -= 1
+
+        queue_wait_seconds.observe(max(0.0, started - submitted), operation=operation)
+        hash_seconds.observe(finished - started, operation=operation)
+        return result
+
+    async def hash(self, password: str) -> str:
+        return await self._run("hash", _hashpw, password)
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        return await self._run("verify", _checkpw, password, hashed)
+
+    async def warm_up(self):
+        """Start every worker now rather than on the first logins."""
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self.executor, int) for _ in range(self.workers)))
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+def create_password_pool() -> PasswordPool:
+    return PasswordPool(
+        workers=int(os.getenv("PASSWORD_WORKERS", str(min(4, os.cpu_count() or 1)))),
+        queue_limit=int(os.getenv("PASSWORD_QUEUE_LIMIT", "64")),
+        kind=os.getenv("PASSWORD_POOL", "thread"),
+    )
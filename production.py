@@ -2,30 +2,138 @@
 """
 Production startup script for Asset Validation API
 Use this for hosting/deployment
+
+Runs WEB_CONCURRENCY worker processes (default: one per CPU with
+CACHE_BACKEND=redis, otherwise one, since local caches and ETag versions
+cannot see another worker's writes) with uvloop and
+httptools when they are installed (`pip install "uvicorn[standard]"`). With
+gunicorn installed (SERVER=auto or gunicorn) workers are supervised by
+gunicorn, which restarts a worker gracefully after MAX_REQUESTS requests and
+can preload the app (PRELOAD_APP); plain uvicorn (SERVER=uvicorn) cannot
+replace recycled workers, so MAX_REQUESTS only applies there with a single
+worker. Everything is configured from the environment / .env.
 """
 
-import uvicorn
+import importlib.util
 import os
+import sys
+
+import uvicorn
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
-if __name__ == "__main__":
-    # Production configuration
-    host = os.getenv("HOST", "0.0.0.0")
-    port = int(os.getenv("PORT", 8000))
-    
-    print("🚀 Starting Asset Validation API in PRODUCTION mode...")
-    print(f"📡 Server will be available at: http://{host}:{port}")
-    print("🔒 Running with production settings")
-    print("\n" + "="*50)
-    
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", 8000))
+SERVER = os.getenv("SERVER", "auto")
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "local")
+WORKERS = int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1) if CACHE_BACKEND == "redis" else "1"))
+KEEPALIVE_SECONDS = int(os.getenv("KEEPALIVE_SECONDS", "5"))
+BACKLOG = int(os.getenv("BACKLOG", "2048"))
+MAX_REQUESTS = int(os.getenv("MAX_REQUESTS", "0"))
+MAX_REQUESTS_JITTER = int(os.getenv("MAX_REQUESTS_JITTER", "0"))
+GRACEFUL_TIMEOUT = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+PRELOAD_APP = os.getenv("PRELOAD_APP", "false").lower() in ("1", "true", "yes")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "info")
+
+
+def installed(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
+def pick_server() -> str:
+    if SERVER not in ("auto", "gunicorn", "uvicorn"):
+        raise ValueError("SERVER must be 'auto', 'gunicorn' or 'uvicorn'")
+    if SERVER == "gunicorn" and not installed("gunicorn"):
+        raise ValueError("SERVER=gunicorn requires the 'gunicorn' package")
+    if SERVER == "auto":
+        return "gunicorn" if installed("gunicorn") and sys.platform != "win32" else "uvicorn"
+    return SERVER
+
+
+def warn_about_per_worker_state():
+    if WORKERS > 1 and CACHE_BACKEND != "redis":
+        print("⚠️  CACHE_BACKEND is not 'redis': caches are per worker, so one worker can serve a stale")
+        print("   asset after another worker handled the write")
+        print("   ETags are disabled, since per-worker versions would answer 304 for changed data")
+    if WORKERS > 1 and os.getenv("DB_BACKEND", "supabase") == "memory":
+        print("⚠️  DB_BACKEND=memory gives every worker its own empty database")
+
+
+def run_gunicorn(loop: str, http: str):
+    from gunicorn.app.base import BaseApplication
+    from uvicorn.workers import UvicornWorker
+
+    class Worker(UvicornWorker):
+        CONFIG_KWARGS = {"loop": loop, "http": http}
+
+    class Application(BaseApplication):
+        def load_config(self):
+            options = {
+                "bind": f"{HOST}:{PORT}",
+                "workers": WORKERS,
+                "worker_class": Worker,
+                "backlog": BACKLOG,
+                "keepalive": KEEPALIVE_SECONDS,
+                "max_requests": MAX_REQUESTS,
+                "max_requests_jitter": MAX_REQUESTS_JITTER,
+                "graceful_timeout": GRACEFUL_TIMEOUT,
+                "preload_app": PRELOAD_APP,
+                "loglevel": LOG_LEVEL,
+                "accesslog": "-",
+            }
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            from main import app
+            return app
+
+    Application().run()
+
+
+def run_uvicorn(loop: str, http: str):
+    max_requests = MAX_REQUESTS or None
+    if max_requests and WORKERS > 1:
+        print("⚠️  MAX_REQUESTS needs gunicorn with more than one worker (uvicorn does not replace exited workers); ignoring it")
+        max_requests = None
+    if PRELOAD_APP:
+        print("⚠️  PRELOAD_APP needs gunicorn; ignoring it")
+
     uvicorn.run(
         "main:app",
-        host=host,
-        port=port,
+        host=HOST,
+        port=PORT,
+        workers=WORKERS,
+        loop=loop,
+        http=http,
+        backlog=BACKLOG,
+        timeout_keep_alive=KEEPALIVE_SECONDS,
+        timeout_graceful_shutdown=GRACEFUL_TIMEOUT,
+        limit_max_requests=max_requests,
         reload=False,  # Disable auto-reload in production
-        log_level="info",
+        log_level=LOG_LEVEL,
         access_log=True
-    )
\ No newline at end of file
+    )
+
+
+if __name__ == "__main__":
+    server = pick_server()
+    loop = "uvloop" if installed("uvloop") else "asyncio"
+    http = "httptools" if installed("httptools") else "h11"
+
+    print("🚀 Starting Asset Validation API in PRODUCTION mode...")
+    print(f"📡 Server will be available at: http://{HOST}:{PORT}")
+    print(f"⚙️  {server} with {WORKERS} worker(s), {loop} event loop, {http} HTTP parser")
+    print(f"   keep-alive {KEEPALIVE_SECONDS}s, backlog {BACKLOG}"
+          + (f", workers recycled after {MAX_REQUESTS} requests"
+             if MAX_REQUESTS and (server == "gunicorn" or WORKERS == 1) else ""))
+    print("🔒 Running with production settings")
+    warn_about_per_worker_state()
+    print("\n" + "="*50)
+
+    if server == "gunicorn":
+        run_gunicorn(loop, http)
+    else:
+        run_uvicorn(loop, http)
@@ -0,0 +1,299 @@
+"""
+Per-request sampling profiler
+
+An admin sends `X-Profile: 1` with a request (checked by the `authorize`
+callback, which main.py backs with require_admin) and that one request is
+profiled; PROFILE_SAMPLE_RATE additionally profiles a random fraction of all
+requests. While a profiled request runs, a background thread samples the
+event loop thread's stack every PROFILE_INTERVAL_MS and attributes each
+sample to the request when the loop is running one of its tasks (child tasks,
+such as a streaming response body, are followed through a task factory).
+
+Each profile splits wall time into Python CPU, serialization (JSON encoding,
+response rendering and compression), other requests' work on the event loop
+and waiting, reports database calls and time from the instrumented data layer,
+and keeps a call tree plus folded stacks for flame graph tools. Profiles are
+written as JSON files to PROFILE_DIR, keeping the newest PROFILE_MAX_FILES,
+and the response carries `X-Profile-Id`.
+"""
+
+import asyncio
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+import weakref
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+import metrics
+
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "2"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "200"))
+
+PROFILE_HEADER = "x-profile"
+PROFILE_ID = re.compile(r"^[0-9]{8}T[0-9]{6}-[0-9a-f]{8}$")
+
+# A sample whose stack passes through one of these functions (None: any function in the file) is counted
+# as serialization
+HERE = os.path.dirname(os.path.abspath(__file__))
+SERIALIZATION_FRAMES = (
+    (os.sep.join(("fastapi", "encoders.py")), None),
+    (os.sep.join(("fastapi", "routing.py")), {"serialize_response"}),
+    (os.sep.join(("fastapi", "responses.py")), {"render"}),
+    (os.sep.join(("starlette", "responses.py")), {"render", "init_headers"}),
+    (os.sep.join(("json", "encoder.py")), None),
+    (os.sep.join(("json", "__init__.py")), {"dumps"}),
+    (os.path.join(HERE, "compression.py"), {"compress", "flush", "finish"}),
+    (os.path.join(HERE, "responses.py"), {"json_response"}),
+)
+
+
+def is_serialization(filename: str, function: str) -> bool:
+    return any(filename.endswith(suffix) and (names is None or function in names)
+               for suffix, names in SERIALIZATION_FRAMES)
+
+
+# Returns True when the request may be profiled on demand
+Authorize = Callable[[Scope], Awaitable[bool]]
+
+
+def frame_label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class Profile:
+    def __init__(self, method: str, path: str, loop: asyncio.AbstractEventLoop, thread_id: int):
+        self.id = f"{time.strftime('%Y%m%dT%H%M%S', time.gmtime())}-{uuid.uuid4().hex[:8]}"
+        self.method = method
+        self.path = path
+        self.loop = loop
+        self.thread_id = thread_id
+        self.started_at = datetime.now(timezone.utc).isoformat()
+        self.seconds = {"python": 0.0, "serialization": 0.0, "other_tasks": 0.0, "waiting": 0.0}
+        self.samples = 0
+        self.stacks: Dict[tuple, float] = {}
+        self.status: Optional[int] = None
+        self.wall = 0.0
+        self.db_calls = 0
+        self.db_seconds = 0.0
+
+    def add(self, kind: str, elapsed: float, stack: Optional[tuple] = None):
+        self.samples += 1
+        self.seconds[kind] += elapsed
+        if stack:
+            self.stacks[stack] = self.stacks.get(stack, 0.0) + elapsed
+
+    def call_tree(self) -> dict:
+        root = {"name": "request", "ms": 0.0, "children": {}}
+        for stack, seconds in self.stacks.items():
+            node = root
+            node["ms"] += seconds * 1000
+            for label in stack:
+                node = node["children"].setdefault(label, {"name": label, "ms": 0.0, "children": {}})
+                node["ms"] += seconds * 1000
+
+        def finish(node):
+            children = sorted(node["children"].values(), key=lambda child: -child["ms"])
+            return {"name": node["name"], "ms": round(node["ms"], 2), "children": [finish(child) for child in children]}
+        return finish(root)
+
+    def folded(self) -> List[str]:
+        """Stacks in the folded format read by flamegraph.pl and speedscope, weighted in microseconds."""
+        return [f"{';'.join(stack)} {round(seconds * 1e6)}" for stack, seconds in self.stacks.items()]
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "status": self.status,
+            "started_at": self.started_at,
+            "wall_ms": round(self.wall * 1000, 2),
+            "breakdown_ms": {kind: round(seconds * 1000, 2) for kind, seconds in self.seconds.items()},
+            # Wall time inside database calls; overlaps "waiting" since the loop is free meanwhile
+            "database": {"calls": self.db_calls, "ms": round(self.db_seconds * 1000, 2)},
+            "samples": self.samples,
+            "interval_ms": PROFILE_INTERVAL_MS,
+            "call_tree": self.call_tree(),
+            "folded": self.folded(),
+        }
+
+
+class Sampler:
+    """One background thread sampling the event loop while any profile is active."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.profiles: Dict[Profile, None] = {}
+        self.tasks: "weakref.WeakKeyDictionary[asyncio.Task, Profile]" = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._loops: "weakref.WeakSet[asyncio.AbstractEventLoop]" = weakref.WeakSet()
+
+    def start(self, profile: Profile, task: asyncio.Task):
+        self._follow_child_tasks(profile.loop)
+        with self._lock:
+            self.profiles[profile] = None
+            self.tasks[task] = profile
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    def stop(self, profile: Profile):
+        with self._lock:
+            self.profiles.pop(profile, None)
+            for task in [task for task, owner in self.tasks.items() if owner is profile]:
+                del self.tasks[task]
+
+    def _follow_child_tasks(self, loop: asyncio.AbstractEventLoop):
+        """Install a task factory that hands tasks created by a profiled task to the same profile."""
+        if loop in self._loops:
+            return
+        previous = loop.get_task_factory()
+
+        def factory(loop, coro, **kwargs):
+            task = previous(loop, coro, **kwargs) if previous else asyncio.Task(coro, loop=loop, **kwargs)
+            if self.tasks:
+                parent = asyncio.current_task(loop)
+                owner = self.tasks.get(parent) if parent is not None else None
+                if owner is not None:
+                    self.tasks[task] = owner
+            return task
+
+        loop.set_task_factory(factory)
+        self._loops.add(loop)
+
+    def _run(self):
+        last = time.perf_counter()
+        while True:
+            self._wake.clear()
+            if not self.profiles:
+                self._wake.wait()
+                last = time.perf_counter()
+            time.sleep(self.interval)
+            now = time.perf_counter()
+            elapsed, last = now - last, now
+            with self._lock:
+                profiles = list(self.profiles)
+            frames = sys._current_frames()
+            for profile in profiles:
+                frame = frames.get(profile.thread_id)
+                if frame is None:
+                    continue
+                task = asyncio.current_task(profile.loop)
+                if profile not in self.profiles:
+                    continue
+                if task is None:
+                    profile.add("waiting", elapsed)
+                elif self.tasks.get(task) is not profile:
+                    profile.add("other_tasks", elapsed)
+                else:
+                    stack = self._stack(frame)
+                    serializing = any(is_serialization(file, function) for file, function, _ in stack)
+                    profile.add("serialization" if serializing else "python", elapsed,
+                                tuple(label for _, _, label in stack))
+
+    @staticmethod
+    def _stack(frame) -> list:
+        """(filename, function, label) from the task's outermost coroutine to the running frame."""
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            # Everything above the loop's Handle._run is event loop machinery
+            if code.co_filename.endswith(os.sep.join(("asyncio", "events.py"))):
+                break
+            stack.append((code.co_filename, code.co_name, frame_label(code)))
+            frame = frame.f_back
+        stack.reverse()
+        return stack
+
+
+class ProfileStore:
+    """Profiles as JSON files in one directory, keeping the newest max_files."""
+
+    def __init__(self, directory: str = PROFILE_DIR, max_files: int = PROFILE_MAX_FILES):
+        self.directory = directory
+        self.max_files = max_files
+
+    def _path(self, profile_id: str) -> str:
+        return os.path.join(self.directory, f"{profile_id}.json")
+
+    def save(self, profile: dict):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self._path(profile["id"]), "w") as f:
+            json.dump(profile, f)
+        for stale in self.ids()[self.max_files:]:
+            try:
+                os.remove(self._path(stale))
+            except FileNotFoundError:
+                pass
+
+    def ids(self) -> List[str]:
+        """Stored profile ids, newest first."""
+        if not os.path.isdir(self.directory):
+            return []
+        ids = [name[:-5] for name in os.listdir(self.directory) if name.endswith(".json")]
+        return sorted((profile_id for profile_id in ids if PROFILE_ID.match(profile_id)), reverse=True)
+
+    def load(self, profile_id: str) -> Optional[dict]:
+        if not PROFILE_ID.match(profile_id):
+            return None
+        try:
+            with open(self._path(profile_id)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+
+sampler = Sampler(PROFILE_INTERVAL_MS / 1000)
+
+
+class ProfilingMiddleware:
+    def __init__(self, app: ASGIApp, authorize: Authorize, store: ProfileStore,
+                 sample_rate: float = PROFILE_SAMPLE_RATE):
+        self.app = app
+        self.authorize = authorize
+        self.store = store
+        self.sample_rate = sample_rate
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        requested = Headers(scope=scope).get(PROFILE_HEADER) == "1" and await self.authorize(scope)
+        if not requested and not (self.sample_rate > 0 and random.random() < self.sample_rate):
+            await self.app(scope, receive, send)
+            return
+
+        profile = Profile(scope["method"], scope["path"], asyncio.get_running_loop(), threading.get_ident())
+
+        async def send_with_id(message: Message):
+            if message["type"] == "http.response.start":
+                profile.status = message["status"]
+                if requested:
+                    MutableHeaders(raw=message["headers"])["X-Profile-Id"] = profile.id
+            await send(message)
+
+        calls, seconds = metrics.request_db_usage()
+        sampler.start(profile, asyncio.current_task())
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            profile.wall = time.perf_counter() - started
+            sampler.stop(profile)
+            end_calls, end_seconds = metrics.request_db_usage()
+            profile.db_calls, profile.db_seconds = end_calls - calls, end_seconds - seconds
+            await asyncio.to_thread(self.store.save, profile.to_dict())
@@ -0,0 +1,38 @@
+"""
+JSON response encoding
+
+JSON_ENCODER=orjson switches the app's default response class to
+ORJSONResponse (requires the `orjson` package); the default `std` keeps
+FastAPI's JSONResponse. Large list endpoints also return json_response(...)
+directly, which skips FastAPI's jsonable_encoder pass: rows coming back from
+PostgREST are already plain JSON types, so walking them again only costs CPU.
+"""
+
+import os
+from typing import Any, Optional, Type
+
+from fastapi import Response
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+JSON_ENCODER = os.getenv("JSON_ENCODER", "std")
+
+
+def default_response_class() -> Type[JSONResponse]:
+    if JSON_ENCODER == "std":
+        return JSONResponse
+    if JSON_ENCODER == "orjson":
+        try:
+            import orjson  # noqa: F401
+        except ImportError:
+            raise ValueError("JSON_ENCODER=orjson requires the 'orjson' package")
+        return ORJSONResponse
+    raise ValueError("JSON_ENCODER must be 'std' or 'orjson'")
+
+
+ResponseClass = default_response_class()
+
+
+def json_response(content: Any, response: Optional[Response] = None, status_code: int = 200) -> Response:
+    """Serialize already JSON-compatible content, keeping headers set on the injected response."""
+    headers = dict(response.headers) if response is not None else None
+    return ResponseClass(content, status_code=status_code, headers=headers)
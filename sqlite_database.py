@@ -0,0 +1,299 @@
+"""
+Local SQLite implementation of the Database interface
+
+Keeps the `users`, `assets` and `audit_events` tables in a SQLite file
+(DB_BACKEND=sqlite, SQLITE_PATH) or in memory (DB_BACKEND=memory) with the
+indexes the API's lookups need, so the whole API can run, be load-tested and
+be benchmarked without a Supabase project. All statements run on one
+dedicated thread that owns the connection, keeping the event loop free and
+the connection single-threaded.
+"""
+
+import asyncio
+import re
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+from database import (
+    ASSET_LIST_ORDER, AUDIT_EVENT_ORDER, USER_PRINCIPAL_COLUMNS, USER_PUBLIC_COLUMNS, Database, UniqueViolation,
+)
+
+NOW = "(strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now'))"
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT NOT NULL,
+    email TEXT NOT NULL,
+    password_hash TEXT NOT NULL,
+    role TEXT DEFAULT 'auditor',
+    created_at TEXT DEFAULT {NOW},
+    updated_at TEXT DEFAULT {NOW}
+);
+CREATE UNIQUE INDEX IF NOT EXISTS users_username_idx ON users (username);
+CREATE UNIQUE INDEX IF NOT EXISTS users_email_idx ON users (email);
+
+CREATE TABLE IF NOT EXISTS assets (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    tag TEXT NOT NULL,
+    name TEXT NOT NULL,
+    category TEXT NOT NULL,
+    assigned_to TEXT,
+    location TEXT,
+    purchase_date TEXT,
+    purchase_cost REAL,
+    status TEXT DEFAULT 'Active',
+    last_audit TEXT,
+    last_auditor TEXT,
+    audit_status TEXT,
+    audit_notes TEXT,
+    created_at TEXT DEFAULT {NOW},
+    updated_at TEXT DEFAULT {NOW}
+);
+CREATE UNIQUE INDEX IF NOT EXISTS assets_tag_idx ON assets (tag);
+CREATE INDEX IF NOT EXISTS assets_category_idx ON assets (category, name, id);
+CREATE INDEX IF NOT EXISTS assets_last_audit_idx ON assets (last_audit);
+CREATE INDEX IF NOT EXISTS assets_name_id_idx ON assets (name, id);
+
+CREATE TABLE IF NOT EXISTS audit_events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    asset_id INTEGER NOT NULL,
+    tag TEXT,
+    auditor TEXT NOT NULL,
+    empcode TEXT,
+    audit_status TEXT NOT NULL,
+    audit_notes TEXT,
+    audited_at TEXT NOT NULL,
+    recorded_at TEXT DEFAULT {NOW}
+);
+CREATE INDEX IF NOT EXISTS audit_events_time_idx ON audit_events (audited_at, id);
+CREATE INDEX IF NOT EXISTS audit_events_asset_idx ON audit_events (asset_id, audited_at, id);
+CREATE INDEX IF NOT EXISTS audit_events_auditor_idx ON audit_events (auditor, audited_at, id);
+"""
+
+Statement = Tuple[str, Sequence[Any]]
+
+
+def placeholders(count: int) -> str:
+    return ", ".join("?" * count)
+
+
+class SQLiteDatabase(Database):
+    def __init__(self, path: str = ":memory:"):
+        self.path = path
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self.columns = {
+            table: {row["name"] for row in self._conn.execute(f"PRAGMA table_info({table})")}
+            for table in ("users", "assets", "audit_events")
+        }
+
+    async def _run(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, function, *args)
+
+    def _query(self, sql: str, params: Sequence[Any]) -> List[dict]:
+        return [dict(row) for row in self._conn.execute(sql, params)]
+
+    def _transaction(self, statements: List[Statement]) -> List[dict]:
+        rows = []
+        try:
+            with self._conn:
+                for sql, params in statements:
+                    rows.extend(dict(row) for row in self._conn.execute(sql, params))
+        except sqlite3.IntegrityError as e:
+            # "UNIQUE constraint failed: assets.tag"
+            match = re.match(r"UNIQUE constraint failed: \w+\.(\w+)", str(e))
+            if not match:
+                raise
+            raise UniqueViolation(match.group(1)) from e
+        return rows
+
+    async def _all(self, sql: str, *params: Any) -> List[dict]:
+        return await self._run(self._query, sql, params)
+
+    async def _one(self, sql: str, *params: Any) -> Optional[dict]:
+        rows = await self._all(sql, *params)
+        return rows[0] if rows else None
+
+    async def _write(self, statements: List[Statement]) -> List[dict]:
+        """Run statements in one transaction and return every row they return."""
+        return await self._run(self._transaction, statements)
+
+    async def aclose(self):
+        await self._run(self._conn.close)
+        self._executor.shutdown(wait=False)
+
+    # SQL building; column names are checked against the schema before use
+    def _select(self, table: str, columns: str) -> str:
+        if columns.strip() == "*":
+            return "*"
+        names = [name.strip() for name in columns.split(",")]
+        self._check(table, names)
+        return ", ".join(names)
+
+    def _check(self, table: str, names) -> None:
+        unknown = set(names) - self.columns[table]
+        if unknown:
+            raise ValueError(f"Unknown column(s) for {table}: {', '.join(sorted(unknown))}")
+
+    def _insert(self, table: str, row: Dict[str, Any], suffix: str = "") -> Statement:
+        names = list(row)
+        self._check(table, names)
+        return (f"INSERT INTO {table} ({', '.join(names)}) VALUES ({placeholders(len(names))}){suffix} RETURNING *",
+                list(row.values()))
+
+    def _update(self, table: str, row_id: Any, data: Dict[str, Any]) -> Statement:
+        if not data:
+            return f"SELECT * FROM {table} WHERE id = ?", [row_id]
+        self._check(table, data)
+        assignments = ", ".join(f"{name} = ?" for name in data)
+        return f"UPDATE {table} SET {assignments} WHERE id = ? RETURNING *", [*data.values(), row_id]
+
+    async def _insert_one(self, table: str, data: Dict[str, Any]) -> Optional[dict]:
+        rows = await self._write([self._insert(table, data)])
+        return rows[0] if rows else None
+
+    async def _update_one(self, table: str, row_id: Any, data: Dict[str, Any]) -> Optional[dict]:
+        rows = await self._write([self._update(table, row_id, data)])
+        return rows[0] if rows else None
+
+    # Users
+    async def get_user_by_username(self, username: str) -> Optional[dict]:
+        return await self._one("SELECT * FROM users WHERE username = ?", username)
+
+    async def get_principal(self, username: str) -> Optional[dict]:
+        return await self._one(f"SELECT {USER_PRINCIPAL_COLUMNS} FROM users WHERE username = ?", username)
+
+    async def get_user_by_email(self, email: str) -> Optional[dict]:
+        return await self._one("SELECT * FROM users WHERE email = ?", email)
+
+    async def get_user_by_id(self, user_id: int) -> Optional[dict]:
+        return await self._one("SELECT * FROM users WHERE id = ?", user_id)
+
+    async def list_users(self) -> List[dict]:
+        return await self._all(f"SELECT {USER_PUBLIC_COLUMNS} FROM users")
+
+    async def insert_user(self, data: Dict[str, Any]) -> Optional[dict]:
+        return await self._insert_one("users", data)
+
+    async def update_user(self, user_id: int, data: Dict[str, Any]) -> Optional[dict]:
+        return await self._update_one("users", user_id, data)
+
+    async def delete_user(self, user_id: int) -> List[dict]:
+        return await self._write([("DELETE FROM users WHERE id = ? RETURNING *", [user_id])])
+
+    # Assets
+    async def get_active_asset_by_tag(self, tag: str) -> Optional[dict]:
+        return await self._one("SELECT * FROM assets WHERE tag = ? AND status = 'Active'", tag)
+
+    async def get_asset_by_tag(self, tag: str) -> Optional[dict]:
+        return await self._one("SELECT * FROM assets WHERE tag = ?", tag)
+
+    async def get_asset_by_id(self, asset_id: int) -> Optional[dict]:
+        return await self._one("SELECT * FROM assets WHERE id = ?", asset_id)
+
+    async def get_assets_by_ids(self, asset_ids: List[int], columns: str = "*") -> List[dict]:
+        if not asset_ids:
+            return []
+        return await self._all(
+            f"SELECT {self._select('assets', columns)} FROM assets WHERE id IN ({placeholders(len(asset_ids))})",
+            *asset_ids,
+        )
+
+    async def get_assets_by_tags(self, tags: List[str], columns: str = "*") -> List[dict]:
+        if not tags:
+            return []
+        return await self._all(
+            f"SELECT {self._select('assets', columns)} FROM assets WHERE tag IN ({placeholders(len(tags))})", *tags
+        )
+
+    async def list_assets(self, filters: Dict[str, Any], *, columns: str = "*", limit: Optional[int] = None,
+                          after: Optional[List[Any]] = None) -> List[dict]:
+        filters = {column: value for column, value in filters.items() if value is not None}
+        self._check("assets", filters)
+        conditions = [f"{column} = ?" for column in filters]
+        params = list(filters.values())
+        order = ", ".join(ASSET_LIST_ORDER)
+        if after:
+            conditions.append(f"({order}) > ({placeholders(len(after))})")
+            params.extend(after)
+        sql = f"SELECT {self._select('assets', columns)} FROM assets"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += f" ORDER BY {order}"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return await self._all(sql, *params)
+
+    async def search_assets(self, q: str) -> List[dict]:
+        pattern = "%" + q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        return await self._all(
+            "SELECT * FROM assets WHERE name LIKE ?1 ESCAPE '\\' OR tag LIKE ?1 ESCAPE '\\' "
+            "OR category LIKE ?1 ESCAPE '\\'",
+            pattern,
+        )
+
+    async def insert_asset(self, data: Dict[str, Any]) -> Optional[dict]:
+        return await self._insert_one("assets", data)
+
+    async def find_existing_asset_tags(self, tags: List[str]) -> Set[str]:
+        if not tags:
+            return set()
+        rows = await self._all(f"SELECT tag FROM assets WHERE tag IN ({placeholders(len(tags))})", *tags)
+        return {row["tag"] for row in rows}
+
+    async def insert_assets(self, rows: List[Dict[str, Any]]) -> List[dict]:
+        return await self._write([self._insert("assets", row) for row in rows])
+
+    async def update_asset(self, asset_id: int, data: Dict[str, Any]) -> Optional[dict]:
+        return await self._update_one("assets", asset_id, data)
+
+    async def update_asset_audit(self, asset_id: int, data: Dict[str, Any]) -> Optional[dict]:
+        # The read of the old status and the update share a transaction
+        rows = await self._write([("SELECT audit_status FROM assets WHERE id = ?", [asset_id]),
+                                  self._update("assets", asset_id, data)])
+        if len(rows) < 2:
+            return None
+        return {**rows[1], "previous_audit_status": rows[0]["audit_status"]}
+
+    async def update_assets(self, rows: List[Dict[str, Any]]) -> List[dict]:
+        # One UPDATE per row in a single transaction; each sets only the row's own columns
+        return await self._write([
+            self._update("assets", row["id"], {name: value for name, value in row.items() if name != "id"})
+            for row in rows
+        ])
+
+    async def delete_asset(self, asset_id: int) -> List[dict]:
+        return await self._write([("DELETE FROM assets WHERE id = ? RETURNING *", [asset_id])])
+
+    # Audit events
+    async def insert_audit_events(self, rows: List[Dict[str, Any]]):
+        await self._write([self._insert("audit_events", row) for row in rows])
+
+    async def list_audit_events(self, *, asset_id: Optional[int] = None, auditor: Optional[str] = None,
+                                since: Optional[str] = None, until: Optional[str] = None,
+                                limit: Optional[int] = None, after: Optional[List[Any]] = None) -> List[dict]:
+        conditions, params = [], []
+        for condition, value in (("asset_id = ?", asset_id), ("auditor = ?", auditor),
+                                 ("audited_at >= ?", since), ("audited_at < ?", until)):
+            if value is not None:
+                conditions.append(condition)
+                params.append(value)
+        order = ", ".join(AUDIT_EVENT_ORDER)
+        if after:
+            conditions.append(f"({order}) < ({placeholders(len(after))})")
+            params.extend(after)
+        sql = "SELECT * FROM audit_events"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY " + ", ".join(f"{column} DESC" for column in AUDIT_EVENT_ORDER)
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return await self._all(sql, *params)
@@ -0,0 +1,80 @@
+"""
+Shared fixtures: the app from main.create_app() on the in-memory SQLite
+backend, driven in-process through httpx.ASGITransport.
+"""
+
+import itertools
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+# Read by main at import time, so set before it is imported
+os.environ["DB_BACKEND"] = "memory"
+os.environ["CACHE_BACKEND"] = "local"
+os.environ.setdefault("SECRET_KEY", "test-secret-key-test-secret-key-test")
+os.environ.setdefault("PASSWORD_WORKERS", "1")
+
+import httpx  # noqa: E402
+import pytest  # noqa: E402
+
+import main  # noqa: E402
+from sqlite_database import SQLiteDatabase  # noqa: E402
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def sqlite_db():
+    db = SQLiteDatabase()
+    yield db
+    await db.aclose()
+
+
+@pytest.fixture
+async def app():
+    app = main.create_app()
+    # ASGITransport does not send lifespan events; run startup and shutdown around the test
+    async with app.router.lifespan_context(app):
+        yield app
+
+
+@pytest.fixture
+async def client(app):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+
+
+async def add_user(username: str, role: str) -> dict:
+    user = await main.db.insert_user({"username": username, "email": f"{username}@example.com",
+                                      "role": role, "password_hash": "unused"})
+    return {"Authorization": "Bearer " + main.create_user_token(user)}
+
+
+@pytest.fixture
+async def admin(app):
+    return await add_user("admin", "admin")
+
+
+@pytest.fixture
+async def auditor(app):
+    return await add_user("auditor", "auditor")
+
+
+_tags = itertools.count(1)
+
+
+async def add_assets(client: httpx.AsyncClient, headers: dict, *names: str) -> list:
+    """Create one asset per name through the API, each with a new tag."""
+    assets = []
+    for name in names:
+        response = await client.post("/admin/assets", headers=headers,
+                                     json={"tag": f"AST-{next(_tags):05d}", "name": name, "category": "Laptop"})
+        assert response.status_code == 200, response.text
+        assets.append(response.json()["asset"])
+    return assets
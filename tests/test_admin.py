@@ -0,0 +1,44 @@
+import pytest
+from postgrest.exceptions import APIError
+
+from database import SupabaseDatabase, UniqueViolation
+
+pytestmark = pytest.mark.anyio
+
+
+class FailingQuery:
+    def __init__(self, error: dict):
+        self.error = error
+
+    async def execute(self):
+        raise APIError(self.error)
+
+
+async def test_postgrest_unique_violation():
+    query = FailingQuery({"code": "23505", "message": "duplicate key value violates unique constraint",
+                          "details": "Key (email)=(a@example.com) already exists.", "hint": None})
+    with pytest.raises(UniqueViolation) as error:
+        await SupabaseDatabase._write(query)
+    assert error.value.column == "email"
+
+
+async def test_postgrest_other_errors_pass_through():
+    query = FailingQuery({"code": "23503", "message": "foreign key violation", "details": None, "hint": None})
+    with pytest.raises(APIError):
+        await SupabaseDatabase._write(query)
+
+
+async def test_duplicate_tag_is_a_400(client, admin):
+    asset = {"tag": "AST-1", "name": "Laptop", "category": "IT"}
+    assert (await client.post("/admin/assets", headers=admin, json=asset)).status_code == 200
+    response = await client.post("/admin/assets", headers=admin, json=asset)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Asset tag already exists"
+
+
+async def test_renaming_onto_an_existing_tag_is_a_400(client, admin):
+    for tag in ("AST-1", "AST-2"):
+        await client.post("/admin/assets", headers=admin, json={"tag": tag, "name": "Laptop", "category": "IT"})
+    response = await client.put("/admin/assets/2", headers=admin, json={"tag": "AST-1"})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Asset tag already exists"
@@ -0,0 +1,50 @@
+import pytest
+
+from aggregates import SCAN_PAGE_SIZE, AssetAggregates
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_counts_follow_writes(sqlite_db):
+    aggregates = AssetAggregates(sqlite_db, ["category"], reconcile_interval=0, sum_columns=["purchase_cost"])
+    await aggregates.ensure_built()
+    aggregates.apply(None, {"id": 1, "category": "IT", "purchase_cost": 10})
+    aggregates.apply(None, {"id": 2, "category": "IT", "purchase_cost": 5})
+    aggregates.apply({"id": 1, "category": "IT", "purchase_cost": 10}, {"id": 1, "category": "Desk", "purchase_cost": 10})
+    aggregates.apply({"id": 2, "category": "IT", "purchase_cost": 5}, None)
+    assert aggregates.counts("category") == {"Desk": 1}
+    assert (aggregates.total, aggregates.sum("purchase_cost")) == (1, 10)
+
+
+async def test_writes_during_a_rebuild_are_kept(sqlite_db):
+    count = SCAN_PAGE_SIZE + 2
+    await sqlite_db.insert_assets([{"tag": f"T{i}", "name": f"Asset {i:05d}", "category": "IT"} for i in range(count)])
+    aggregates = AssetAggregates(sqlite_db, ["category"], reconcile_interval=0)
+    list_assets = sqlite_db.list_assets
+    pages = []
+
+    async def write(old, data):
+        new = await sqlite_db.update_asset(old["id"], data) if old and data else None
+        if old and not data:
+            await sqlite_db.delete_asset(old["id"])
+        aggregates.apply(old, new)
+
+    async def list_assets_with_writes(*args, **kwargs):
+        if len(pages) == 1:
+            # While the second page is being read: the first asset was scanned, the last was not
+            first, last = await sqlite_db.get_assets_by_ids([1, count])
+            await write(first, {"category": "Desk"})
+            await write(last, {"category": "Desk"})
+            await write((await sqlite_db.get_assets_by_ids([2]))[0], None)
+            for name in ("Aardvark", "Zebra"):
+                new = await sqlite_db.insert_asset({"tag": name, "name": name, "category": "Desk"})
+                aggregates.apply(None, new)
+        page = await list_assets(*args, **kwargs)
+        pages.append(page)
+        return page
+
+    sqlite_db.list_assets = list_assets_with_writes
+    await aggregates.rebuild()
+    assert len(pages) == 2
+    assert aggregates.counts("category") == {"IT": count - 3, "Desk": 4}
+    assert aggregates.total == count + 1
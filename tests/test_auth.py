@@ -0,0 +1,56 @@
+import pytest
+
+import main
+from conftest import add_user
+
+pytestmark = pytest.mark.anyio
+
+
+async def user_id(username: str) -> int:
+    return (await main.db.get_user_by_username(username))["id"]
+
+
+async def test_principals_are_cached(client, admin, monkeypatch):
+    loads = []
+    get_principal = main.db.get_principal
+
+    async def counted(username):
+        loads.append(username)
+        return await get_principal(username)
+
+    monkeypatch.setattr(main.db, "get_principal", counted)
+    for _ in range(3):
+        assert (await client.get("/admin/users", headers=admin)).status_code == 200
+    assert loads == ["admin"]
+
+
+async def test_a_role_change_applies_to_the_next_request(client, admin):
+    other = await add_user("other", "admin")
+    assert (await client.get("/admin/users", headers=other)).status_code == 200
+    response = await client.put(f"/admin/users/{await user_id('other')}", headers=admin, json={"role": "auditor"})
+    assert response.status_code == 200
+    assert (await client.get("/admin/users", headers=other)).status_code == 403
+
+
+async def test_a_token_does_not_carry_over_to_a_new_account_with_the_same_name(client, admin):
+    old = await add_user("other", "admin")
+    assert (await client.delete(f"/admin/users/{await user_id('other')}", headers=admin)).status_code == 200
+    assert (await client.get("/admin/users", headers=old)).status_code == 404
+
+    response = await client.post("/admin/users", headers=admin, json={
+        "username": "other", "email": "other@example.com", "password": "secret", "role": "admin"})
+    assert response.status_code == 200
+    assert (await client.get("/admin/users", headers=old)).status_code == 401
+
+
+async def test_a_renamed_user_needs_a_new_token(client, admin):
+    old = await add_user("other", "admin")
+    await client.get("/admin/users", headers=old)
+    response = await client.put(f"/admin/users/{await user_id('other')}", headers=admin, json={"username": "renamed"})
+    assert response.status_code == 200
+    assert (await client.get("/admin/users", headers=old)).status_code == 404
+
+
+async def test_invalid_tokens_are_rejected(client):
+    response = await client.get("/admin/users", headers={"Authorization": "Bearer not-a-jwt"})
+    assert response.status_code == 401
@@ -0,0 +1,68 @@
+import io
+
+import pytest
+
+import main
+from bulk_import import import_csv_file, iter_csv_batches
+
+HEADER = "tag,name,category,location\n"
+
+
+def test_batches_are_numbered_from_the_first_data_row():
+    data = (HEADER + "".join(f"T{i},Laptop,IT,HQ\n" for i in range(5))).encode()
+    batches = list(iter_csv_batches(io.BytesIO(data), batch_rows=2))
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+    assert [row_num for batch in batches for row_num, _ in batch] == [2, 3, 4, 5, 6]
+    assert batches[2][0][1] == {"tag": "T4", "name": "Laptop", "category": "IT", "location": "HQ"}
+
+
+def test_multibyte_characters_and_quoted_newlines_across_reads():
+    data = (HEADER + 'T1,"Écran 27""\nwide",IT,Zürich\nT2,Dock,IT,Malmö\n').encode()
+    # Every read splits a character or a quoted field somewhere
+    for read_chunk_size in (1, 2, 3, 7):
+        rows = [row for batch in iter_csv_batches(io.BytesIO(data), read_chunk_size=read_chunk_size)
+                for row in batch]
+        assert rows == [(2, {"tag": "T1", "name": 'Écran 27"\nwide', "category": "IT", "location": "Zürich"}),
+                        (3, {"tag": "T2", "name": "Dock", "category": "IT", "location": "Malmö"})]
+
+
+@pytest.mark.anyio
+async def test_error_rows_keep_their_file_row_numbers(app):
+    data = HEADER + "T1,Laptop,IT,HQ\nT2,,IT,HQ\nT1,Laptop,IT,HQ\nT3,Dock,IT,HQ\n"
+    report = await import_csv_file(main.db, io.BytesIO(data.encode()), batch_rows=2, read_chunk_size=5)
+    assert (report.success_count, report.error_count) == (2, 2)
+    assert [error["row"] for error in report.errors] == [3, 4]
+
+
+@pytest.mark.anyio
+async def test_upsert_only_counts_changed_rows(app):
+    first = HEADER + "T1,Laptop,IT,HQ\nT2,Dock,IT,HQ\n"
+    await import_csv_file(main.db, io.BytesIO(first.encode()))
+    report = await import_csv_file(main.db, io.BytesIO((HEADER + "T1,Laptop,IT,Lab\nT2,Dock,IT,HQ\nT3,Pen,IT,HQ\n")
+                                                       .encode()), mode="upsert")
+    assert (report.updated_count, report.unchanged_count, report.inserted_count) == (1, 1, 1)
+    assert (await main.db.get_assets_by_tags(["T1"]))[0]["location"] == "Lab"
+
+
+@pytest.mark.anyio
+async def test_on_batch_can_stop_the_import(app):
+    data = HEADER + "".join(f"T{i},Laptop,IT,HQ\n" for i in range(6))
+    seen = []
+
+    async def on_batch(report):
+        seen.append(report.success_count)
+        return len(seen) < 3
+
+    report = await import_csv_file(main.db, io.BytesIO(data.encode()), batch_rows=2, on_batch=on_batch)
+    assert seen == [0, 2, 4]
+    assert report.success_count == 4
+
+
+@pytest.mark.anyio
+async def test_bulk_import_endpoint(client, admin):
+    files = {"file": ("assets.csv", HEADER + "T1,Laptop,IT,HQ\nT1,Laptop,IT,HQ\n", "text/csv")}
+    response = await client.post("/admin/assets/bulk-import", headers=admin, files=files)
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["success_count"], body["error_count"]) == (1, 1)
+    assert body["errors"][0]["row"] == 3
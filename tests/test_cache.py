@@ -0,0 +1,114 @@
+import pytest
+
+import main
+from cache import LocalCache, MemoryKV, SharedCache, cache_backend, close_shared_clients, create_cache
+from conftest import add_assets
+from etags import LocalVersions, SharedVersions, create_versions
+from idempotency import LocalIdempotencyStore, SharedIdempotencyStore, create_idempotency_store
+from import_jobs import create_import_jobs
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(params=["local", "shared"])
+def cache(request):
+    if request.param == "local":
+        return LocalCache("test", maxsize=2, ttl=60, negative_ttl=60)
+    return SharedCache("test", MemoryKV(), ttl=60, negative_ttl=60)
+
+
+async def test_loads_once_until_deleted(cache):
+    loads = []
+
+    async def load(key):
+        loads.append(key)
+        return {"key": key} if key != "missing" else None
+
+    for _ in range(2):
+        assert await cache.get_or_load("a", load) == {"key": "a"}
+        assert await cache.get_or_load("missing", load) is None
+    assert loads == ["a", "missing"]
+    await cache.delete("a")
+    await cache.get_or_load("a", load)
+    assert loads == ["a", "missing", "a"]
+
+
+async def test_a_load_racing_an_invalidation_is_not_kept(cache):
+    async def load_then_invalidate(key):
+        # A write lands while the old row is on its way back
+        await cache.delete(key)
+        return "old"
+
+    assert await cache.get_or_load("a", load_then_invalidate) == "old"
+    assert (await cache.get("a"))[0] is False
+
+
+async def test_local_cache_evicts_the_least_recently_used():
+    cache = LocalCache("test", maxsize=2, ttl=60, negative_ttl=60)
+    for key in ("a", "b"):
+        await cache.set(key, key)
+    await cache.get("a")
+    await cache.set("c", "c")
+    assert [(await cache.get(key))[0] for key in ("a", "b", "c")] == [True, False, True]
+
+
+async def test_tag_lookups_follow_asset_writes(client, admin, auditor, monkeypatch):
+    asset, = await add_assets(client, admin, "Laptop")
+    tag = asset["tag"]
+    lookups = []
+    get_active_asset_by_tag = main.db.get_active_asset_by_tag
+
+    async def counted(tag):
+        lookups.append(tag)
+        return await get_active_asset_by_tag(tag)
+
+    monkeypatch.setattr(main.db, "get_active_asset_by_tag", counted)
+    for _ in range(2):
+        assert (await client.get(f"/assets/tag/{tag}", headers=auditor)).status_code == 200
+    assert lookups == [tag]
+
+    await client.post("/assets/validate", headers=auditor,
+                      json={"assetcode": asset["id"], "empcode": "E1", "auditby": "auditor", "auditstatus": "Valid"})
+    response = await client.get(f"/assets/tag/{tag}", headers=auditor)
+    assert response.json()["asset"]["audit_status"] == "Valid"
+
+    await client.put(f"/admin/assets/{asset['id']}", headers=admin, json={"tag": "RENAMED-1"})
+    assert (await client.get(f"/assets/tag/{tag}", headers=auditor)).status_code == 404
+    assert (await client.get("/assets/tag/RENAMED-1", headers=auditor)).status_code == 200
+
+    await client.put(f"/admin/assets/{asset['id']}", headers=admin, json={"status": "Retired"})
+    assert (await client.get("/assets/tag/RENAMED-1", headers=auditor)).status_code == 404
+
+
+async def test_a_cached_miss_is_dropped_when_the_asset_is_created(client, admin, auditor):
+    assert (await client.get("/assets/tag/NEW-1", headers=auditor)).status_code == 404
+    response = await client.post("/admin/assets", headers=admin, json={"tag": "NEW-1", "name": "Dock", "category": "IT"})
+    assert response.status_code == 200
+    assert (await client.get("/assets/tag/NEW-1", headers=auditor)).status_code == 200
+
+
+async def test_every_factory_follows_the_cache_backend(monkeypatch):
+    monkeypatch.setenv("CACHE_BACKEND", "memory")
+    try:
+        backend, client = cache_backend()
+        assert backend == "memory" and isinstance(client, MemoryKV)
+        assert isinstance(create_cache("test", maxsize=1, ttl=1, negative_ttl=1), SharedCache)
+        assert isinstance(create_versions(), SharedVersions)
+        assert isinstance(create_idempotency_store(), SharedIdempotencyStore)
+        assert create_import_jobs(None).client is client
+    finally:
+        await close_shared_clients()
+
+    monkeypatch.setenv("CACHE_BACKEND", "local")
+    assert cache_backend() == ("local", None)
+    assert isinstance(create_cache("test", maxsize=1, ttl=1, negative_ttl=1), LocalCache)
+    assert isinstance(create_versions(), LocalVersions)
+    assert isinstance(create_idempotency_store(), LocalIdempotencyStore)
+    assert create_import_jobs(None).client is None
+
+
+def test_unknown_cache_backend(monkeypatch):
+    monkeypatch.setenv("CACHE_BACKEND", "memcached")
+    for factory in (cache_backend, create_versions, create_idempotency_store):
+        with pytest.raises(ValueError, match="CACHE_BACKEND"):
+            factory()
@@ -0,0 +1,41 @@
+import pytest
+
+from compression import negotiate
+from conftest import add_assets
+
+ENCODINGS = ["br", "gzip"]
+
+
+@pytest.mark.parametrize("accept_encoding, expected", [
+    ("gzip, deflate, br", "br"),
+    ("gzip", "gzip"),
+    ("GZIP", "gzip"),
+    ("br;q=0, gzip;q=0.5", "gzip"),
+    ("*", "br"),
+    ("*, br;q=0", "gzip"),
+    ("identity", None),
+    ("gzip;q=0", None),
+    ("gzip;q=oops", None),
+    ("", None),
+])
+def test_negotiate(accept_encoding, expected):
+    assert negotiate(accept_encoding, ENCODINGS) == expected
+
+
+def test_negotiate_only_offers_what_is_available():
+    assert negotiate("br", ["gzip"]) is None
+    assert negotiate("br, gzip", ["gzip"]) == "gzip"
+
+
+@pytest.mark.anyio
+async def test_large_responses_are_compressed(client, admin):
+    await add_assets(client, admin, *[f"Laptop {i}" for i in range(40)])
+    response = await client.get("/dashboard/assets", headers={**admin, "Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert "accept-encoding" in response.headers["vary"].lower()
+    # httpx decodes the body; it must still be the full listing
+    assert len(response.json()["assets"]) == 40
+
+    raw = await client.get("/dashboard/assets", headers={**admin, "Accept-Encoding": "identity"})
+    assert "content-encoding" not in raw.headers
+    assert raw.json() == response.json()
@@ -0,0 +1,75 @@
+import io
+
+import pytest
+
+import main
+from bulk_import import import_csv_file
+
+pytestmark = pytest.mark.anyio
+
+
+async def create_asset(client, headers, tag: str, category: str, **fields) -> dict:
+    response = await client.post("/admin/assets", headers=headers,
+                                 json={"tag": tag, "name": f"Asset {tag}", "category": category, **fields})
+    assert response.status_code == 200, response.text
+    return response.json()["asset"]
+
+
+async def category_counts(client, headers) -> dict:
+    response = await client.get("/dashboard/categories", headers=headers, params={"counts": "true"})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["categories"] == sorted(body["counts"])
+    return body["counts"]
+
+
+async def test_categories_follow_asset_writes(client, admin):
+    assert await category_counts(client, admin) == {}
+    first = await create_asset(client, admin, "T1", "Laptop")
+    await create_asset(client, admin, "T2", "Laptop")
+    second = await create_asset(client, admin, "T3", "Monitor")
+    assert await category_counts(client, admin) == {"Laptop": 2, "Monitor": 1}
+
+    await client.put(f"/admin/assets/{first['id']}", headers=admin, json={"category": "Dock"})
+    await client.delete(f"/admin/assets/{second['id']}", headers=admin)
+    assert await category_counts(client, admin) == {"Dock": 1, "Laptop": 1}
+    response = await client.get("/dashboard/categories", headers=admin)
+    assert response.json() == {"categories": ["Dock", "Laptop"]}
+
+
+async def test_categories_follow_imports(client, admin):
+    await create_asset(client, admin, "T1", "Laptop")
+    csv = "tag,name,category\nT1,Laptop,Dock\nT2,Pen,Stationery\n"
+    await import_csv_file(main.db, io.BytesIO(csv.encode()), mode="upsert",
+                          on_insert=main.assets_inserted, on_update=main.assets_updated)
+    assert await category_counts(client, admin) == {"Dock": 1, "Stationery": 1}
+
+
+async def test_a_rebuild_matches_the_maintained_counts(client, admin):
+    asset = await create_asset(client, admin, "T1", "Laptop")
+    await create_asset(client, admin, "T2", "Monitor")
+    await client.put(f"/admin/assets/{asset['id']}", headers=admin, json={"category": "Monitor"})
+    maintained = await category_counts(client, admin)
+    await main.asset_aggregates.rebuild()
+    assert await category_counts(client, admin) == maintained == {"Monitor": 2}
+
+
+async def test_summary_rollups(client, admin, auditor):
+    first = await create_asset(client, admin, "T1", "Laptop", location="HQ", purchase_cost=1200.5)
+    await create_asset(client, admin, "T2", "Laptop", location="Lab", purchase_cost=99.25)
+    third = await create_asset(client, admin, "T3", "Monitor", location="HQ", status="Retired")
+    await client.post("/assets/validate", headers=auditor,
+                      json={"assetcode": first["id"], "empcode": "E1", "auditby": "auditor", "auditstatus": "Valid"})
+    await client.put(f"/admin/assets/{third['id']}", headers=admin, json={"purchase_cost": 10})
+
+    summary = (await client.get("/dashboard/summary", headers=admin)).json()
+    assert summary == {
+        "total_assets": 3,
+        "total_purchase_cost": 1309.75,
+        "by_status": {"Active": 2, "Retired": 1},
+        "by_category": {"Laptop": 2, "Monitor": 1},
+        "by_location": {"HQ": 2, "Lab": 1},
+        "by_audit_status": {"Valid": 1},
+    }
+    await main.asset_aggregates.rebuild()
+    assert (await client.get("/dashboard/summary", headers=admin)).json() == summary
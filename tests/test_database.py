@@ -0,0 +1,71 @@
+import pytest
+
+from aggregates import MaintainedView
+from database import ASSET_LIST_ORDER, DB_OPERATIONS, Database, InstrumentedDatabase, UniqueViolation
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_list_assets_keyset(sqlite_db):
+    for i, name in enumerate(["Laptop", "Dock", "Laptop", "Monitor", "Laptop"]):
+        await sqlite_db.insert_asset({"tag": f"T{i}", "name": name, "category": "IT"})
+    everything = await sqlite_db.list_assets({})
+    pages, after = [], None
+    while True:
+        page = await sqlite_db.list_assets({}, limit=2, after=after)
+        pages.extend(page)
+        if len(page) < 2:
+            break
+        after = [page[-1][column] for column in ASSET_LIST_ORDER]
+    assert [row["id"] for row in pages] == [row["id"] for row in everything]
+    assert [(row["name"], row["id"]) for row in everything] == sorted((row["name"], row["id"]) for row in everything)
+
+
+async def test_list_assets_keyset_with_filter(sqlite_db):
+    for i, category in enumerate(["IT", "Desk", "IT", "IT"]):
+        await sqlite_db.insert_asset({"tag": f"T{i}", "name": "Same", "category": category})
+    first = await sqlite_db.list_assets({"category": "IT"}, columns="id, name", limit=2)
+    rest = await sqlite_db.list_assets({"category": "IT"}, columns="id, name",
+                                       after=[first[-1][column] for column in ASSET_LIST_ORDER])
+    assert [row["id"] for row in first + rest] == [1, 3, 4]
+
+
+async def test_unknown_filter_columns_are_refused(sqlite_db):
+    with pytest.raises(ValueError):
+        await sqlite_db.list_assets({"bogus": "x"})
+
+
+async def test_sqlite_unique_violation(sqlite_db):
+    await sqlite_db.insert_asset({"tag": "T1", "name": "Laptop", "category": "IT"})
+    with pytest.raises(UniqueViolation) as error:
+        await sqlite_db.insert_asset({"tag": "T1", "name": "Other", "category": "IT"})
+    assert error.value.column == "tag"
+
+
+def test_a_backend_missing_a_query_fails_when_created():
+    class Partial(Database):
+        async def get_user_by_username(self, username):
+            return None
+
+    with pytest.raises(TypeError, match="list_users"):
+        Partial()
+
+
+def test_every_query_is_instrumented():
+    assert set(DB_OPERATIONS) == Database.__abstractmethods__
+    assert not InstrumentedDatabase.__abstractmethods__
+
+
+def test_a_view_without_a_state_fails_when_created():
+    class Stateless(MaintainedView):
+        pass
+
+    with pytest.raises(TypeError):
+        Stateless(None, reconcile_interval=0)
+
+
+async def test_instrumented_calls_reach_the_backend(sqlite_db):
+    db = InstrumentedDatabase(sqlite_db)
+    asset = await db.insert_asset({"tag": "T1", "name": "Laptop", "category": "IT"})
+    assert await db.get_asset_by_id(asset["id"]) == asset
+    assert db.get_asset_by_id.__name__ == "get_asset_by_id"
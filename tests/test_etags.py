@@ -0,0 +1,65 @@
+import pytest
+
+import main
+from conftest import add_assets
+from etags import etag_matches
+
+ETAG = '"abc123"'
+
+
+@pytest.mark.parametrize("if_none_match, expected", [
+    ('"abc123"', True),
+    ('W/"abc123"', True),
+    ('"other", "abc123"', True),
+    ('"abc123-gzip"', True),
+    ('W/"abc123-br"', True),
+    ("*", True),
+    ('"abc1234"', False),
+    ('"abc123-deflate"', False),
+    ("", False),
+    (None, False),
+])
+def test_etag_matches(if_none_match, expected):
+    assert etag_matches(if_none_match, ETAG) is expected
+
+
+@pytest.mark.anyio
+async def test_not_modified_until_an_asset_is_written(client, admin):
+    await add_assets(client, admin, "Laptop")
+    first = await client.get("/dashboard/assets", headers=admin)
+    etag = first.headers["etag"]
+
+    again = await client.get("/dashboard/assets", headers={**admin, "If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.headers["etag"] == etag
+
+    await add_assets(client, admin, "Dock")
+    changed = await client.get("/dashboard/assets", headers={**admin, "If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+
+
+@pytest.mark.anyio
+async def test_etag_depends_on_the_query(client, admin):
+    first = await client.get("/dashboard/assets", headers=admin, params={"category": "Laptop"})
+    other = await client.get("/dashboard/assets", headers=admin, params={"category": "Dock"})
+    assert first.headers["etag"] != other.headers["etag"]
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("path", ["/dashboard/summary", "/dashboard/categories"])
+async def test_rollup_etag_changes_when_a_rebuild_catches_up(client, admin, path):
+    await add_assets(client, admin, "Laptop")
+    etag = (await client.get(path, headers=admin)).headers["etag"]
+    # A write the aggregates did not see, such as one made by another worker
+    await main.db.insert_asset({"tag": "OTHER-1", "name": "Dock", "category": "Desk"})
+
+    await main.asset_aggregates.rebuild()
+    changed = await client.get(path, headers={**admin, "If-None-Match": etag})
+    assert changed.status_code == 200
+    assert "Desk" in changed.text
+
+    etag = changed.headers["etag"]
+    await main.asset_aggregates.rebuild()
+    again = await client.get(path, headers={**admin, "If-None-Match": etag})
+    assert again.status_code == 304
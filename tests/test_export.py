@@ -0,0 +1,43 @@
+import csv
+import io
+import json
+
+import pytest
+
+import main
+from conftest import add_assets
+from database import ASSET_COLUMNS
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_csv_export_has_every_asset_once(client, admin, monkeypatch):
+    monkeypatch.setattr(main, "EXPORT_PAGE_SIZE", 2)
+    assets = await add_assets(client, admin, "Monitor", "Laptop", "Dock", "Laptop", "Pen")
+    response = await client.get("/dashboard/assets/export", headers=admin)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    reader = csv.DictReader(io.StringIO(response.text))
+    assert reader.fieldnames == list(ASSET_COLUMNS)
+    rows = list(reader)
+    assert sorted(int(row["id"]) for row in rows) == sorted(asset["id"] for asset in assets)
+    assert [(row["name"], int(row["id"])) for row in rows] == sorted((row["name"], int(row["id"])) for row in rows)
+
+
+async def test_csv_export_holds_only_the_requested_fields(client, admin):
+    asset, = await add_assets(client, admin, "Laptop")
+    response = await client.get("/dashboard/assets/export", headers=admin, params={"fields": "tag,category"})
+    assert response.text.splitlines() == ["tag,category", f"{asset['tag']},Laptop"]
+
+
+async def test_ndjson_export(client, admin):
+    await add_assets(client, admin, "Laptop", "Dock")
+    response = await client.get("/dashboard/assets/export", headers=admin,
+                                params={"format": "ndjson", "fields": "name", "category": "Laptop"})
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert [json.loads(line) for line in response.text.splitlines()] == [{"name": "Dock"}, {"name": "Laptop"}]
+
+
+async def test_unknown_export_fields_are_a_400(client, admin):
+    response = await client.get("/dashboard/assets/export", headers=admin, params={"fields": "tag,password_hash"})
+    assert response.status_code == 400
@@ -0,0 +1,151 @@
+import asyncio
+
+import httpx
+import pytest
+
+from idempotency import Fingerprint, IdempotencyMiddleware, LocalIdempotencyStore
+
+pytestmark = pytest.mark.anyio
+
+
+class CountingApp:
+    """Answers each request with the next status in statuses and counts the calls."""
+
+    def __init__(self, *statuses: int, delay: float = 0):
+        self.statuses = list(statuses)
+        self.delay = delay
+        self.calls = 0
+
+    async def __call__(self, scope, receive, send):
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body", False):
+                break
+        self.calls += 1
+        status = self.statuses[min(self.calls, len(self.statuses)) - 1]
+        await asyncio.sleep(self.delay)
+        await send({"type": "http.response.start", "status": status, "headers": [(b"content-type", b"text/plain")]})
+        await send({"type": "http.response.body", "body": b"call %d: %d bytes" % (self.calls, len(body))})
+
+
+def middleware_client(app, caller="alice"):
+    store = LocalIdempotencyStore()
+    wrapped = IdempotencyMiddleware(app, paths=["/write"], get_store=lambda: store,
+                                    get_caller=lambda scope: caller)
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=wrapped), base_url="http://test")
+
+
+async def test_retry_is_replayed():
+    app = CountingApp(201)
+    async with middleware_client(app) as client:
+        first = await client.post("/write", content=b"x" * 200_000, headers={"Idempotency-Key": "k1"})
+        retry = await client.post("/write", content=b"x" * 200_000, headers={"Idempotency-Key": "k1"})
+    assert app.calls == 1
+    assert (first.status_code, retry.status_code) == (201, 201)
+    assert first.text == retry.text == "call 1: 200000 bytes"
+    assert retry.headers["idempotent-replayed"] == "true"
+    assert "idempotent-replayed" not in first.headers
+
+
+async def test_key_reused_with_another_body_is_refused():
+    app = CountingApp(200)
+    async with middleware_client(app) as client:
+        await client.post("/write", content=b"first", headers={"Idempotency-Key": "k1"})
+        response = await client.post("/write", content=b"second", headers={"Idempotency-Key": "k1"})
+    assert response.status_code == 422
+    assert app.calls == 1
+
+
+async def test_requests_without_a_key_or_on_other_paths_always_run():
+    app = CountingApp(200)
+    async with middleware_client(app) as client:
+        await client.post("/write", content=b"a")
+        await client.post("/write", content=b"a")
+        await client.post("/other", content=b"a", headers={"Idempotency-Key": "k1"})
+        await client.post("/other", content=b"a", headers={"Idempotency-Key": "k1"})
+    assert app.calls == 4
+
+
+async def test_requests_without_a_caller_pass_through():
+    app = CountingApp(401)
+    async with middleware_client(app, caller=None) as client:
+        for _ in range(2):
+            response = await client.post("/write", content=b"a", headers={"Idempotency-Key": "k1"})
+            assert "idempotent-replayed" not in response.headers
+    assert app.calls == 2
+
+
+@pytest.mark.parametrize("status", [401, 403, 409, 429, 500, 503])
+async def test_refusals_and_server_errors_are_not_stored(status):
+    app = CountingApp(status, 200)
+    async with middleware_client(app) as client:
+        first = await client.post("/write", content=b"a", headers={"Idempotency-Key": "k1"})
+        retry = await client.post("/write", content=b"a", headers={"Idempotency-Key": "k1"})
+    assert (first.status_code, retry.status_code) == (status, 200)
+    assert app.calls == 2
+
+
+async def test_client_errors_are_stored():
+    app = CountingApp(400, 200)
+    async with middleware_client(app) as client:
+        await client.post("/write", content=b"a", headers={"Idempotency-Key": "k1"})
+        retry = await client.post("/write", content=b"a", headers={"Idempotency-Key": "k1"})
+    assert retry.status_code == 400
+    assert app.calls == 1
+
+
+async def test_concurrent_retry_waits_for_the_first_request():
+    app = CountingApp(200, delay=0.05)
+    async with middleware_client(app) as client:
+        responses = await asyncio.gather(*[
+            client.post("/write", content=b"a", headers={"Idempotency-Key": "k1"}) for _ in range(3)
+        ])
+    assert app.calls == 1
+    assert sorted(response.headers.get("idempotent-replayed", "") for response in responses) == ["", "true", "true"]
+
+
+async def test_overlong_key_is_a_400():
+    async with middleware_client(CountingApp(200)) as client:
+        response = await client.post("/write", content=b"a", headers={"Idempotency-Key": "k" * 256})
+    assert response.status_code == 400
+
+
+def multipart_scope(boundary: str) -> dict:
+    return {"type": "http", "method": "POST", "path": "/write", "query_string": b"",
+            "headers": [(b"content-type", f"multipart/form-data; boundary={boundary}".encode())]}
+
+
+def fingerprint(boundary: str, body: bytes, chunk_size: int) -> str:
+    result = Fingerprint(multipart_scope(boundary))
+    for start in range(0, len(body), chunk_size):
+        result.update(body[start:start + chunk_size])
+    return result.hexdigest()
+
+
+def multipart_body(boundary: str, content: bytes) -> bytes:
+    return (f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"a.csv\"\r\n\r\n".encode()
+            + content + f"\r\n--{boundary}--\r\n".encode())
+
+
+def test_fingerprint_ignores_the_multipart_boundary_in_any_chunking():
+    content = b"tag,name,category\n" * 50
+    expected = fingerprint("aaaa1111", multipart_body("aaaa1111", content), 1 << 20)
+    for chunk_size in (1, 3, 7, 64):
+        assert fingerprint("bbbb2222", multipart_body("bbbb2222", content), chunk_size) == expected
+    assert fingerprint("bbbb2222", multipart_body("bbbb2222", content + b"x"), 7) != expected
+
+
+async def test_keys_are_scoped_to_the_token_subject(client, admin, auditor):
+    validation = {"assetcode": 1, "empcode": "E1", "auditby": "auditor", "auditstatus": "Valid"}
+    await client.post("/admin/assets", headers=admin, json={"tag": "AST-1", "name": "Laptop", "category": "IT"})
+    first = await client.post("/assets/validate", headers={**auditor, "Idempotency-Key": "scan-1"}, json=validation)
+    retry = await client.post("/assets/validate", headers={**auditor, "Idempotency-Key": "scan-1"}, json=validation)
+    other_user = await client.post("/assets/validate", headers={**admin, "Idempotency-Key": "scan-1"},
+                                   json=validation)
+    assert first.status_code == retry.status_code == other_user.status_code == 200
+    assert retry.headers["idempotent-replayed"] == "true"
+    assert "idempotent-replayed" not in other_user.headers
+    history = (await client.get("/dashboard/audit-history", headers=admin)).json()["audit_history"]
+    assert len(history) == 2
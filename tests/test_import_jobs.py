@@ -0,0 +1,112 @@
+import asyncio
+import io
+
+import pytest
+
+from bulk_import import BATCH_ROWS
+from import_jobs import ImportJobs, ImportLimitExceeded
+from sqlite_database import SQLiteDatabase
+
+pytestmark = pytest.mark.anyio
+
+
+def csv_file(rows: int, prefix: str = "T") -> io.BytesIO:
+    return io.BytesIO(("tag,name,category\n" + "".join(f"{prefix}{i},Laptop,IT\n" for i in range(rows))).encode())
+
+
+class Gate:
+    """Insert hook that holds every batch until opened."""
+
+    def __init__(self):
+        self.entered = asyncio.Event()
+        self.opened = asyncio.Event()
+
+    async def __call__(self, assets):
+        self.entered.set()
+        await self.opened.wait()
+
+
+@pytest.fixture
+async def sqlite_db():
+    db = SQLiteDatabase()
+    yield db
+    await db.aclose()
+
+
+async def finished(jobs: ImportJobs, job_id: str) -> dict:
+    job = jobs.jobs[job_id]
+    await asyncio.wait_for(asyncio.gather(job.task, return_exceptions=True), 5)
+    return job.snapshot()
+
+
+async def test_completed_job_reports_its_rows(sqlite_db):
+    jobs = ImportJobs(sqlite_db)
+    job = await jobs.submit(csv_file(3), "assets.csv", "admin")
+    assert job.total_rows == 3
+    snapshot = await finished(jobs, job.id)
+    assert (snapshot["status"], snapshot["success_count"], snapshot["progress"]) == ("completed", 3, 1.0)
+
+
+async def test_per_admin_and_queue_limits(sqlite_db):
+    gate = Gate()
+    jobs = ImportJobs(sqlite_db, on_insert=gate, max_running=1, max_queued=2, per_admin=1)
+    first = await jobs.submit(csv_file(1, "A"), "a.csv", "alice")
+    with pytest.raises(ImportLimitExceeded):
+        await jobs.submit(csv_file(1, "A"), "a.csv", "alice")
+    second = await jobs.submit(csv_file(1, "B"), "b.csv", "bob")
+    with pytest.raises(ImportLimitExceeded):
+        await jobs.submit(csv_file(1, "C"), "c.csv", "carol")
+    await gate.entered.wait()
+    assert (jobs.jobs[first.id].status, jobs.jobs[second.id].status) == ("running", "queued")
+    assert jobs.stats()["running"] == 1 and jobs.stats()["queued"] == 1
+    gate.opened.set()
+    assert (await finished(jobs, first.id))["status"] == "completed"
+    assert (await finished(jobs, second.id))["status"] == "completed"
+    # Finished jobs no longer count towards the limits
+    third = await jobs.submit(csv_file(1, "C"), "c.csv", "carol")
+    assert (await finished(jobs, third.id))["status"] == "completed"
+
+
+async def test_cancelling_a_queued_job_drops_it(sqlite_db):
+    gate = Gate()
+    jobs = ImportJobs(sqlite_db, on_insert=gate, max_running=1)
+    running = await jobs.submit(csv_file(1, "A"), "a.csv", "alice")
+    queued = await jobs.submit(csv_file(5, "B"), "b.csv", "bob")
+    await gate.entered.wait()
+    snapshot = await jobs.cancel(queued.id)
+    assert (snapshot["status"], snapshot["rows_processed"]) == ("cancelled", 0)
+    gate.opened.set()
+    assert (await finished(jobs, running.id))["status"] == "completed"
+    assert await sqlite_db.get_assets_by_tags(["B0"]) == []
+
+
+async def test_cancelling_a_running_job_keeps_the_imported_batches(sqlite_db):
+    gate = Gate()
+    jobs = ImportJobs(sqlite_db, on_insert=gate)
+    job = await jobs.submit(csv_file(BATCH_ROWS + 10), "big.csv", "alice")
+    await gate.entered.wait()
+    assert (await jobs.cancel(job.id))["cancel_requested"] is True
+    gate.opened.set()
+    snapshot = await finished(jobs, job.id)
+    assert (snapshot["status"], snapshot["success_count"]) == ("cancelled", BATCH_ROWS)
+    assert len(await sqlite_db.list_assets({})) == BATCH_ROWS
+
+
+async def test_cancel_unknown_job(sqlite_db):
+    assert await ImportJobs(sqlite_db).cancel("missing") is None
+
+
+async def test_import_endpoint(client, admin, auditor):
+    files = {"file": ("assets.csv", "tag,name,category\nT1,Laptop,IT\nT2,,IT\n", "text/csv")}
+    assert (await client.post("/admin/imports", headers=auditor, files=files)).status_code == 403
+    response = await client.post("/admin/imports", headers=admin, files=files)
+    assert response.status_code == 202
+    job_id = response.json()["job_id"]
+    for _ in range(100):
+        status = (await client.get(f"/admin/imports/{job_id}", headers=admin)).json()
+        if status["status"] == "completed":
+            break
+        await asyncio.sleep(0.01)
+    assert (status["status"], status["success_count"], status["error_count"]) == ("completed", 1, 1)
+    assert status["errors"][0]["row"] == 3
+    assert (await client.post(f"/admin/imports/{job_id}/cancel", headers=admin)).status_code == 409
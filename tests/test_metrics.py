@@ -0,0 +1,52 @@
+import re
+
+import pytest
+
+import main
+from metrics import Histogram, _registry, render
+
+pytestmark = pytest.mark.anyio
+
+
+def sample(text: str, name: str, **labels) -> float:
+    """The value of one sample in the exposition text, 0 when it is absent."""
+    label_text = ",".join(f'{key}="{value}"' for key, value in labels.items())
+    match = re.search(rf"^{re.escape(name)}\{{{re.escape(label_text)}\}} (\S+)$", text, re.MULTILINE)
+    return float(match.group(1)) if match else 0
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("test_latency_seconds", "Test", ["route"], buckets=(0.1, 1))
+    try:
+        for value in (0.05, 0.5, 5):
+            histogram.observe(value, route="/x")
+        text = render()
+    finally:
+        _registry.remove(histogram)
+    assert sample(text, "test_latency_seconds_bucket", route="/x", le="0.1") == 1
+    assert sample(text, "test_latency_seconds_bucket", route="/x", le="1") == 2
+    assert sample(text, "test_latency_seconds_bucket", route="/x", le="+Inf") == 3
+    assert sample(text, "test_latency_seconds_sum", route="/x") == 5.55
+
+
+async def test_requests_are_labelled_by_route_template(client, auditor):
+    before = (await client.get("/metrics")).text
+    await client.get("/assets/tag/METRICS-1", headers=auditor)
+    await client.get("/no/such/path")
+    text = (await client.get("/metrics")).text
+
+    route = {"method": "GET", "route": "/assets/tag/{tag}"}
+    assert (sample(text, "http_request_duration_seconds_count", **route, status="404")
+            == sample(before, "http_request_duration_seconds_count", **route, status="404") + 1)
+    assert sample(text, "http_request_db_calls_count", **route) > 0
+    assert sample(text, "http_request_duration_seconds_count", method="GET", route="unmatched", status="404") > 0
+    assert sample(text, "db_call_duration_seconds_count", table="assets", operation="select") > 0
+    assert "METRICS-1" not in text and "/no/such/path" not in text
+
+
+async def test_metrics_token(client, monkeypatch):
+    monkeypatch.setattr(main, "METRICS_TOKEN", "scrape-token")
+    assert (await client.get("/metrics")).status_code == 401
+    response = await client.get("/metrics", headers={"Authorization": "Bearer scrape-token"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
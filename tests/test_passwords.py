@@ -0,0 +1,38 @@
+import pytest
+
+import main
+from conftest import add_user
+from passwords import PasswordPool, PasswordPoolBusy
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_hash_and_verify_on_the_pool():
+    pool = PasswordPool(workers=1, queue_limit=4)
+    try:
+        hashed = await pool.hash("secret")
+        assert await pool.verify("secret", hashed)
+        assert not await pool.verify("wrong", hashed)
+        assert pool.pending == 0
+    finally:
+        pool.shutdown()
+
+
+async def test_a_full_queue_is_refused():
+    pool = PasswordPool(workers=1, queue_limit=0)
+    with pytest.raises(PasswordPoolBusy):
+        await pool.hash("secret")
+    assert pool._executor is None
+
+
+def test_unknown_pool_kind():
+    with pytest.raises(ValueError):
+        PasswordPool(workers=1, queue_limit=1, kind="fiber")
+
+
+async def test_login_is_a_503_while_the_pool_is_busy(client, monkeypatch):
+    await add_user("someone", "auditor")
+    monkeypatch.setattr(main.password_pool, "queue_limit", 0)
+    response = await client.post("/auth/login", json={"username": "someone", "password": "secret"})
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
@@ -0,0 +1,48 @@
+import pytest
+
+import main
+from profiling import ProfileStore
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def profiles(tmp_path, monkeypatch):
+    monkeypatch.setattr(main.profile_store, "directory", str(tmp_path))
+    return main.profile_store
+
+
+async def test_an_admin_can_profile_a_request(client, admin, profiles):
+    response = await client.get("/dashboard/assets", headers={**admin, "X-Profile": "1"})
+    assert response.status_code == 200
+    profile_id = response.headers["x-profile-id"]
+    assert profiles.ids() == [profile_id]
+
+    listed = await client.get("/admin/profiles", headers=admin)
+    assert listed.json() == {"profiles": [profile_id]}
+    profile = (await client.get(f"/admin/profiles/{profile_id}", headers=admin)).json()
+    assert (profile["method"], profile["path"], profile["status"]) == ("GET", "/dashboard/assets", 200)
+    assert profile["database"]["calls"] >= 1
+    folded = await client.get(f"/admin/profiles/{profile_id}", headers=admin, params={"format": "folded"})
+    assert folded.headers["content-type"].startswith("text/plain")
+
+
+async def test_other_users_cannot_profile(client, auditor, profiles):
+    response = await client.get("/dashboard/assets", headers={**auditor, "X-Profile": "1"})
+    assert response.status_code == 200
+    assert "x-profile-id" not in response.headers
+    assert profiles.ids() == []
+    assert (await client.get("/admin/profiles", headers=auditor)).status_code == 403
+
+
+async def test_unknown_or_malformed_profile_ids(client, admin, profiles):
+    for profile_id in ("20260101T000000-deadbeef", "..%2Fsecrets"):
+        assert (await client.get(f"/admin/profiles/{profile_id}", headers=admin)).status_code == 404
+
+
+def test_the_store_keeps_the_newest_files(tmp_path):
+    store = ProfileStore(str(tmp_path), max_files=2)
+    for second in range(3):
+        store.save({"id": f"20260101T00000{second}-00000000"})
+    assert store.ids() == ["20260101T000002-00000000", "20260101T000001-00000000"]
+    assert store.load("../etc/passwd") is None
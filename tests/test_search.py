@@ -0,0 +1,48 @@
+import pytest
+
+from search import SearchIndex
+
+
+@pytest.fixture
+def index():
+    index = SearchIndex(None, reconcile_interval=0)
+    rows = [
+        {"id": 1, "tag": "AST-1", "name": "Dell Latitude Laptop", "category": "IT", "location": "HQ"},
+        {"id": 2, "tag": "AST-2", "name": "Laptop stand", "category": "Furniture", "location": "Lab"},
+        {"id": 3, "tag": "LAPTOP-3", "name": "Spare", "category": "IT", "location": "HQ"},
+        {"id": 4, "tag": "AST-4", "name": "Dock", "category": "Laptops", "location": "HQ"},
+        {"id": 5, "tag": "AST-5", "name": "Monitor", "category": "IT", "location": "Laplace"},
+    ]
+    for row in rows:
+        index.terms.add(row)
+    return index
+
+
+def test_ranked_by_field_then_match(index):
+    # Exact tag word, then exact name words, then a prefix of a category word, then a prefix elsewhere
+    assert index.search("laptop", 10) == ([3, 1, 2, 4], 4)
+
+
+def test_pages_and_total(index):
+    assert index.search("laptop", 2) == ([3, 1], 4)
+    assert index.search("laptop", 2, offset=2) == ([2, 4], 4)
+    assert index.search("laptop", 2, offset=4) == ([], 4)
+
+
+def test_short_terms_match_word_starts(index):
+    assert index.search("la", 10) == ([3, 1, 2, 4, 5], 5)
+    assert index.search("op", 10) == ([], 0)
+
+
+def test_every_term_must_match(index):
+    assert index.search("laptop hq", 10) == ([3, 1, 4], 3)
+    assert index.search("laptop nowhere", 10) == ([], 0)
+
+
+def test_writes_update_the_index(index):
+    index.apply({"id": 3}, {"id": 3, "tag": "AST-3", "name": "Spare", "category": "IT"})
+    index.apply({"id": 2}, None)
+    assert index.search("laptop", 10) == ([1, 4], 2)
+    index.apply(None, {"id": 2, "tag": "AST-2", "name": "Laptop stand", "category": "Furniture"})
+    assert index.search("laptop", 10) == ([1, 2, 4], 3)
+    assert list(index.terms.postings["laptop"]) == sorted(index.terms.postings["laptop"])
@@ -0,0 +1,40 @@
+import asyncio
+
+import pytest
+
+import main
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_ready_once_warmed_up(client):
+    for _ in range(200):
+        response = await client.get("/ready")
+        if response.status_code == 200:
+            break
+        assert response.json()["status"] == "warming_up"
+        await asyncio.sleep(0.01)
+    body = response.json()
+    assert (response.status_code, body["status"]) == (200, "ready")
+    assert body["warmup_seconds"] is not None
+    assert main.asset_aggregates.ready and main.search_index.ready
+
+
+async def test_not_ready_is_a_503(client, monkeypatch):
+    monkeypatch.setitem(main.startup, "ready", False)
+    response = await client.get("/ready")
+    assert response.status_code == 503
+    assert response.json()["status"] == "warming_up"
+
+
+async def test_health_does_not_wait_for_warm_up(client, monkeypatch):
+    monkeypatch.setitem(main.startup, "ready", False)
+    assert (await client.get("/health")).status_code == 200
+
+
+async def test_shutdown_releases_resources():
+    app = main.create_app()
+    async with app.router.lifespan_context(app):
+        assert main.db is not None
+    assert main.db is None
+    assert main.startup["ready"] is False
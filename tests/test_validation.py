@@ -0,0 +1,91 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import main
+from conftest import add_assets
+
+pytestmark = pytest.mark.anyio
+
+
+def validation(asset_id: int, status: str = "Valid", **extra) -> dict:
+    return {"assetcode": asset_id, "empcode": "E1", "auditby": "auditor", "auditstatus": status, **extra}
+
+
+async def test_single_validation_updates_the_summary_at_once(client, admin, auditor):
+    asset, = await add_assets(client, admin, "Laptop")
+    for status, expected in (("Valid", {"Valid": 1}), ("Invalid", {"Invalid": 1})):
+        response = await client.post("/assets/validate", headers=auditor, json=validation(asset["id"], status))
+        assert response.status_code == 200
+        assert "previous_audit_status" not in response.json()["data"]
+        summary = await client.get("/dashboard/summary", headers=admin)
+        assert summary.json()["by_audit_status"] == expected
+
+
+async def test_validating_a_missing_asset_records_nothing(client, admin, auditor):
+    response = await client.post("/assets/validate", headers=auditor, json=validation(999))
+    assert response.status_code == 200
+    assert response.json()["data"] is None
+
+
+async def validate_batch(client, headers, *validations) -> list:
+    response = await client.post("/assets/validate/batch", headers=headers, json={"validations": list(validations)})
+    assert response.status_code == 200, response.text
+    return response.json()["results"]
+
+
+async def audit_events_of(asset_id: int) -> list:
+    await main.audit_log.flush()
+    return await main.db.list_audit_events(asset_id=asset_id)
+
+
+def hours_ago(hours: float) -> str:
+    return (datetime.now(timezone.utc) - timedelta(hours=hours)).isoformat()
+
+
+async def test_batch_outcomes(client, admin, auditor):
+    first, second = await add_assets(client, admin, "Laptop", "Dock")
+    await client.post("/assets/validate", headers=auditor, json=validation(second["id"]))
+    results = await validate_batch(client, auditor, validation(first["id"], "Invalid"), validation(first["id"]),
+                                   validation(second["id"], scanned_at=hours_ago(1)), validation(999))
+    assert [result["status"] for result in results] == ["superseded", "recorded", "stale", "not_found"]
+    asset = await main.db.get_asset_by_id(first["id"])
+    assert (asset["audit_status"], asset["last_audit"]) == ("Valid", results[1]["last_audit"])
+    summary = await client.get("/dashboard/summary", headers=admin)
+    assert summary.json()["by_audit_status"] == {"Valid": 2}
+
+
+async def test_the_latest_scan_wins_whatever_the_order(client, admin, auditor):
+    asset, = await add_assets(client, admin, "Laptop")
+    results = await validate_batch(client, auditor, validation(asset["id"], "Valid", scanned_at=hours_ago(1)),
+                                   validation(asset["id"], "Invalid", scanned_at=hours_ago(2)))
+    assert [result["status"] for result in results] == ["recorded", "superseded"]
+    assert (await main.db.get_asset_by_id(asset["id"]))["audit_status"] == "Valid"
+    # Superseded scans still go to the audit log
+    assert len(await audit_events_of(asset["id"])) == 2
+
+
+async def test_scans_dated_in_the_future_are_clamped(client, admin, auditor):
+    asset, = await add_assets(client, admin, "Laptop")
+    before = datetime.now(timezone.utc)
+    results = await validate_batch(client, auditor, validation(asset["id"], scanned_at="2099-01-01T00:00:00Z"))
+    assert results[0]["status"] == "recorded"
+    assert before <= datetime.fromisoformat(results[0]["last_audit"]) <= datetime.now(timezone.utc)
+
+
+async def test_failed_chunks_record_no_audit_events(client, admin, auditor, monkeypatch):
+    ok, broken = await add_assets(client, admin, "Laptop", "Dock")
+    update_assets = main.db.update_assets
+
+    async def fail_for_broken(rows):
+        if any(row["id"] == broken["id"] for row in rows):
+            raise RuntimeError("database unavailable")
+        return await update_assets(rows)
+
+    monkeypatch.setattr(main, "VALIDATE_BATCH_CHUNK", 1)
+    monkeypatch.setattr(main.db, "update_assets", fail_for_broken)
+    results = await validate_batch(client, auditor, validation(ok["id"]), validation(broken["id"]))
+    assert [result["status"] for result in results] == ["recorded", "failed"]
+    assert results[1]["detail"] == "database unavailable"
+    assert len(await audit_events_of(ok["id"])) == 1
+    assert await audit_events_of(broken["id"]) == []